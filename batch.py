@@ -0,0 +1,114 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from lib import read_datalog, get_pulls, get_pull_info
+
+"""
+Headless batch processing of datalogs, i.e.
+    python batch.py "G:/Cobb/Logs/*.csv" -o pulls.csv --throttle 60 --time-filter 1
+Every log is read and split into pulls in a process pool and one row per pull is written to a
+csv or json summary table. Exit code is 0 on success, 1 if any log failed or any file or pattern
+matched nothing and 2 if no logs matched.
+"""
+
+SUMMARY_COLUMNS = ['file', 'pull', 'start', 'duration', 'rows', 'ap_info']
+
+
+def expand_paths(patterns: list) -> list:
+    """Expand files and glob patterns, returns [files, unmatched]
+
+    files is a sorted, de-duplicated list per pattern and unmatched lists the patterns that matched no file
+    """
+    result = []
+    unmatched = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        matches = sorted(x for x in matches if os.path.isfile(x))
+        if not matches:
+            unmatched.append(pattern)
+        result.extend(matches)
+    return [list(dict.fromkeys(result)), unmatched]
+
+
+def summarize_log(filepath: str, min_throttle: float, time_filter: float, use_cache: bool = True) -> list:
+    """Read one datalog and return a list of summary rows, one per pull"""
+    df, ap_info = read_datalog(filepath, use_cache=use_cache)
+    pulls = get_pulls(df, min_throttle, time_filter)
+    pull_info = get_pull_info(pulls)
+    return [{
+        'file': filepath,
+        'pull': i,
+        'start': float(info['start']),
+        'duration': float(info['duration']),
+        'rows': len(pulls[i - 1]),
+        'ap_info': ap_info
+    } for i, info in pull_info.items()]
+
+
+def write_summary(summary: pd.DataFrame, output: str, fmt: str):
+    """Write summary table to output path, or stdout when output is '-'"""
+    target = sys.stdout if output == '-' else output
+    if fmt == 'json':
+        summary.to_json(target, orient='records', indent=2)
+        if output == '-':
+            sys.stdout.write('\n')
+    else:
+        summary.to_csv(target, index=False, lineterminator='\n')
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Find the pulls in datalogs and write one summary table')
+    parser.add_argument('logs', nargs='+', help='datalog csv files or glob patterns')
+    parser.add_argument('-o', '--output', default='-', help='output file, defaults to stdout')
+    parser.add_argument('-f', '--format', choices=['csv', 'json'], help='output format, defaults to output file extension or csv')
+    parser.add_argument('-t', '--throttle', type=float, default=50.0, help='identify pulls when throttle pos >= this value')
+    parser.add_argument('--time-filter', type=float, default=0.5, help='omit pulls whose duration <= this number')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes, defaults to cpu count')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write the sidecar column cache')
+    args = parser.parse_args(argv)
+    if not 1.0 <= args.throttle <= 100.0:
+        parser.error('throttle must be between 1 and 100')
+    if args.time_filter < 0:
+        parser.error('time filter must not be negative')
+    if args.format is None:
+        args.format = 'json' if args.output.lower().endswith('.json') else 'csv'
+    return args
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(argv)
+    files, unmatched = expand_paths(args.logs)
+    for pattern in unmatched:
+        print(f'{pattern}: no such datalog', file=sys.stderr)
+    if not files:
+        print('No datalogs matched', file=sys.stderr)
+        return 2
+    results = {}
+    failed = len(unmatched)
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(summarize_log, x, args.throttle, args.time_filter, not args.no_cache): x
+            for x in files
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            filepath = futures[future]
+            try:
+                results[filepath] = future.result()
+            except Exception as e:
+                failed += 1
+                print(f'[{done}/{len(files)}] {filepath}: failed, {e!r}', file=sys.stderr)
+            else:
+                print(f'[{done}/{len(files)}] {filepath}: {len(results[filepath])} pulls', file=sys.stderr)
+    rows = [row for x in files for row in results.get(x, [])]
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    write_summary(summary, args.output, args.format)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+"""
+Repeatable benchmarks of the datalog pipeline on synthetic logs, run from the repo root i.e.
+    python -m benchmarks.bench --rows 10000 1000000 --channels 20 300 --save before
+    python -m benchmarks.bench --rows 10000 1000000 --channels 20 300 --compare before
+Each stage runs in a fresh process so peak RSS is measured per stage. Synthetic logs are written
+to benchmarks/data once per size and baselines are saved as json in benchmarks/baselines.
+"""
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+STAGES = ['read_datalog', 'read_datalog_compact', 'read_datalog_cached', 'load_datalog', 'stream_pulls', 'get_pulls', 'get_pull_info', 'PullPlot',
+          'plot_index']
+QT_STAGES = ['PullPlot', 'plot_index']
+# QApplication of the worker, held here so Qt stages can create widgets
+_qt_app = None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB, None when it can't be measured"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def log_path(rows: int, channels: int, pulls: int) -> str:
+    """Return the synthetic log for a size, writing it on first use"""
+    from benchmarks.synth_log import write_log
+    path = os.path.join(DATA_DIR, f'synth_{rows}r_{channels}c_{pulls}p.csv')
+    if not os.path.isfile(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        write_log(path + '.tmp', rows, channels, pulls)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def stage_setup(stage: str, path: str):
+    """Prepare state a stage needs, returns the callable to time"""
+    from datalog_cache import clear_cache
+    from lib import get_pull_info, get_pulls, load_datalog, read_datalog
+    if stage == 'read_datalog':
+        clear_cache(path)
+        return lambda: read_datalog(path, use_cache=False)
+    if stage == 'read_datalog_compact':
+        clear_cache(path)
+        return lambda: read_datalog(path, use_cache=False, compact=True)
+    if stage == 'read_datalog_cached':
+        read_datalog(path)
+        return lambda: read_datalog(path)
+    if stage == 'load_datalog':
+        clear_cache(path)
+        return lambda: load_datalog(path, 50, 0.5)
+    if stage == 'stream_pulls':
+        from pull_stream import stream_pulls
+        out_dir = os.path.join(DATA_DIR, 'stream_pulls')
+        return lambda: stream_pulls([path], out_dir, 50, 0.5)
+    df, ap_info = read_datalog(path, use_cache=False)
+    if stage == 'get_pulls':
+        return lambda: get_pulls(df, 50, 0.5)
+    pulls = get_pulls(df, 50, 0.5)
+    if stage == 'get_pull_info':
+        return lambda: get_pull_info(pulls)
+    from plot_window import MultiPlotFigure, PullPlot
+    if stage == 'PullPlot':
+        longest = max(pulls, key=len)
+        return lambda: PullPlot(longest, 'Pull 1')
+    if stage == 'plot_index':
+        x_values = df['Time (sec)']
+        y_values = df['RPM (RPM)'] if 'RPM (RPM)' in df.columns else df['Throttle Pos (%)']
+
+        def plot_full_log():
+            figure = MultiPlotFigure(title='Full log')
+            figure.plot_index(x_values, y_values, 0, y_text='RPM', legend_text='RPM')
+            figure.draw()
+        return plot_full_log
+    raise ValueError(f'Unknown stage {stage}')
+
+
+def run_stage(stage: str, path: str, repeat: int) -> dict:
+    """Time a stage in the current process, meant to run in a fresh worker"""
+    global _qt_app
+    if stage in QT_STAGES:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        _qt_app = QApplication.instance() or QApplication([])
+    fn = stage_setup(stage, path)
+    rss_before = peak_rss_mb()
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    rss_after = peak_rss_mb()
+    return {
+        'times': times,
+        'peak_rss_mb': rss_after,
+        'stage_rss_mb': None if rss_after is None else max(rss_after - rss_before, 0.0)
+    }
+
+
+def run_benchmarks(rows_list: list, channels_list: list, pulls: int, stages: list, repeat: int) -> list:
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for rows in rows_list:
+        for channels in channels_list:
+            path = log_path(rows, channels, pulls)
+            size_mb = os.path.getsize(path) / 2 ** 20
+            for stage in stages:
+                with ctx.Pool(1) as pool:
+                    measured = pool.apply(run_stage, (stage, path, repeat))
+                median = statistics.median(measured['times'])
+                results.append({
+                    'stage': stage,
+                    'rows': rows,
+                    'channels': channels,
+                    'pulls': pulls,
+                    'median_s': median,
+                    'min_s': min(measured['times']),
+                    'peak_rss_mb': measured['peak_rss_mb'],
+                    'stage_rss_mb': measured['stage_rss_mb'],
+                    'rows_per_s': rows / median if median > 0 else None,
+                    'mb_per_s': size_mb / median if median > 0 else None
+                })
+                print_result(results[-1])
+    return results
+
+
+def fmt(value, spec: str) -> str:
+    return '-' if value is None else format(value, spec)
+
+
+def print_result(result: dict, baseline: dict = None):
+    line = (f"{result['stage']:<20} {result['rows']:>9} rows {result['channels']:>4} ch  "
+            f"{fmt(result['median_s'], '9.4f')} s  {fmt(result['rows_per_s'], '12,.0f')} rows/s  "
+            f"{fmt(result['mb_per_s'], '8.1f')} MB/s  peak {fmt(result['peak_rss_mb'], '8.1f')} MB  "
+            f"stage {fmt(result['stage_rss_mb'], '8.1f')} MB")
+    if baseline is not None:
+        line += f"  x{result['median_s'] / baseline['median_s']:.2f} vs baseline"
+    print(line, flush=True)
+
+
+def result_key(result: dict) -> tuple:
+    return (result['stage'], result['rows'], result['channels'], result['pulls'])
+
+
+def compare(results: list, baseline: list, tolerance: float) -> int:
+    """Print results against a baseline, returns the number of regressions beyond tolerance"""
+    by_key = {result_key(x): x for x in baseline}
+    regressions = 0
+    print('\nCompared to baseline:')
+    for result in results:
+        base = by_key.get(result_key(result))
+        print_result(result, base)
+        if base is not None and result['median_s'] > base['median_s'] * (1 + tolerance):
+            regressions += 1
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the datalog pipeline on synthetic logs')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000], help='log sizes in rows')
+    parser.add_argument('--channels', type=int, nargs='+', default=[20, 100], help='log widths in channels')
+    parser.add_argument('--pulls', type=int, default=10, help='pulls per log')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='stages to run')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage, the median is reported')
+    parser.add_argument('--save', metavar='NAME', help='save results as baseline NAME')
+    parser.add_argument('--compare', metavar='NAME', help='compare results to baseline NAME')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='slowdown vs baseline counted as a regression')
+    args = parser.parse_args(argv)
+    if min(args.channels) < 2:
+        parser.error('at least 2 channels are needed for Time and Throttle')
+    results = run_benchmarks(args.rows, args.channels, args.pulls, args.stages, args.repeat)
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f'{args.save}.json'), 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json'), 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{regressions} stages regressed by more than {args.tolerance:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+
+"""
+Synthetic Accessport style datalog generator for benchmarks, i.e.
+    python -m benchmarks.synth_log synth.csv --rows 1000000 --channels 100 --pulls 20
+Logs have a Windows-1252 header, the Accessport info as the last header column with an empty
+trailing field on every row, and throttle/RPM/boost traces with the requested number of pulls.
+"""
+
+AP_INFO = 'AP Info:[AP3-SUB-004 v1.7.4.0-17987][Reflash: 22.03.14 Stage2+FMIC93 °]'
+SAMPLE_PERIOD = 0.05
+WRITE_CHUNK_ROWS = 100000
+FILLER_CYCLE = 997
+SHAPED_CHANNELS = [
+    'Time (sec)', 'Throttle Pos (%)', 'RPM (RPM)', 'Boost (psi)', 'Target Boost (psi)', 'AF Ratio 1 (AFR)',
+    'Feedback Knock (°)', 'Gear Position (Gear)', 'Vehicle Speed (mph)'
+]
+FILLER_CHANNELS = [
+    'AF Correction 1 (%)', 'AF Learning 1 (%)', 'Calc Load (g/rev)', 'Dyn Adv Mult (DAM)', 'Fine Knock Learn (°)',
+    'Ignition Timing (°)', 'Inj Duty Cycle (%)', 'MAF Volt (V)', 'Wastegate Duty (%)', 'Coolant Temp (F)',
+    'Intake Temp (F)', 'Load (%)'
+]
+
+
+def channel_names(channels: int) -> list:
+    """Names of the first channels channels, generic channels pad out the Accessport ones"""
+    names = (SHAPED_CHANNELS + FILLER_CHANNELS)[:channels]
+    return names + [f'Channel {i} (V)' for i in range(len(names), channels)]
+
+
+def shaped_chunk(start: int, stop: int, rows: int, pulls: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Build rows [start, stop) of the channels that carry pulls"""
+    row = np.arange(start, stop)
+    n = len(row)
+    # pulls are evenly spaced, each covering the middle third of its slot
+    slot = max(rows // max(pulls, 1), 3)
+    pos = (row % slot) / slot
+    in_pull = (pos >= 1 / 3) & (pos < 2 / 3) & (row // slot < pulls)
+    ramp = np.where(in_pull, (pos - 1 / 3) * 3, 0.0)
+    rpm = np.where(in_pull, 3000 + 3800 * ramp, 2200 + 300 * np.sin(row / 50))
+    return pd.DataFrame({
+        'Time (sec)': row * SAMPLE_PERIOD,
+        'Throttle Pos (%)': np.where(in_pull, 100.0, 12 + 8 * rng.random(n)),
+        'RPM (RPM)': rpm.round(0),
+        'Boost (psi)': np.where(in_pull, 18 * np.minimum(ramp * 4, 1), -8.0) + rng.normal(0, 0.3, n),
+        'Target Boost (psi)': np.where(in_pull, 18.5, 0.0),
+        'AF Ratio 1 (AFR)': np.where(in_pull, 11.2, 14.7) + rng.normal(0, 0.1, n),
+        'Feedback Knock (°)': np.where(in_pull & (rng.random(n) < 0.01), -1.4, 0.0),
+        'Gear Position (Gear)': np.where(in_pull, 3, 4 + (row // 5000) % 3),
+        'Vehicle Speed (mph)': rpm / 100,
+    })
+
+
+def to_lines(frame: pd.DataFrame) -> list:
+    """Format a frame as csv lines without header or line endings"""
+    return frame.to_csv(header=False, index=False, float_format='%.2f', lineterminator='\n').split('\n')[:-1]
+
+
+def write_log(path: str, rows: int, channels: int = 20, pulls: int = 10, seed: int = 0) -> str:
+    """Write a synthetic datalog with the given size to path
+
+    Channels past the shaped ones are random values repeating every FILLER_CYCLE rows, so formatting
+    cost stays flat with the channel count and large logs are written in reasonable time
+    """
+    names = channel_names(channels)
+    shaped = names[:len(SHAPED_CHANNELS)]
+    filler = names[len(SHAPED_CHANNELS):]
+    rng = np.random.default_rng(seed)
+    filler_lines = None
+    if filler:
+        filler_frame = pd.DataFrame(rng.random((FILLER_CYCLE, len(filler))) * 100, columns=filler)
+        filler_lines = [',' + x for x in to_lines(filler_frame)]
+    with open(path, 'w', encoding='Windows-1252', newline='') as f:
+        f.write(','.join(names + [AP_INFO]) + '\n')
+        for start in range(0, rows, WRITE_CHUNK_ROWS):
+            stop = min(start + WRITE_CHUNK_ROWS, rows)
+            lines = to_lines(shaped_chunk(start, stop, rows, pulls, rng)[shaped])
+            if filler_lines is not None:
+                lines = [x + filler_lines[i % FILLER_CYCLE] for i, x in enumerate(lines, start)]
+            # empty trailing field under the AP info column
+            f.write(',\n'.join(lines) + ',\n')
+    return path
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Write a synthetic Accessport style datalog')
+    parser.add_argument('path', help='output csv file')
+    parser.add_argument('--rows', type=int, default=100000, help='number of data rows')
+    parser.add_argument('--channels', type=int, default=20, help='number of channels, not counting the AP info column')
+    parser.add_argument('--pulls', type=int, default=10, help='number of pulls')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args(argv)
+    if args.channels < 2:
+        parser.error('at least 2 channels are needed for Time and Throttle')
+    write_log(args.path, args.rows, args.channels, args.pulls, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
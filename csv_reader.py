@@ -1,331 +1,220 @@
+import time
+STARTUP_START = time.perf_counter()
+import argparse
+import multiprocessing
+import os
 import sys
-from typing import Iterable, Union
-import matplotlib
-matplotlib.use('Qt5Agg')
-import pandas as pd
-from PyQt5.QtCore import Qt, QSettings, QSize
-from PyQt5.QtGui import QDoubleValidator
-from PyQt5.QtWidgets import (QApplication, QCheckBox, QComboBox, QDialog, QFileDialog, QFormLayout, QGroupBox,
-        QHBoxLayout, QLabel, QLineEdit, QMessageBox, QPushButton, QSizePolicy, QScrollArea, QTabWidget, QToolTip, QVBoxLayout, QWidget)
+from PyQt5.QtCore import QObject, QSettings, Qt, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QApplication, QCheckBox, QComboBox, QDialog, QDialogButtonBox, QFileDialog, QFormLayout, QGroupBox,
+        QHBoxLayout, QLabel, QLineEdit, QListWidget, QListWidgetItem, QMessageBox, QPlainTextEdit, QProgressBar, QPushButton, QSlider, QStatusBar, QTabWidget, QTableView, QVBoxLayout, QWidget)
 #import pyqtgraph as pg
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
-from matplotlib.figure import Figure
-from lib import read_datalog, get_pulls, get_pull_info
-
-
-class MultiPlotFigure(FigureCanvasQTAgg):
-    """Extension of FigureCanvasQTAgg with shorthand methods to ease dynamic plotting"""
-    def __init__(self, title: str = '', parent=None):
-        fig = Figure()
-        self.title = title
-        self.axes = fig.add_subplot(111)
-        self.axes2 = self.axes.twinx()
-        self.axes_refs = [self.axes, self.axes2]
-        super().__init__(fig)
-        self.axes.set_xlabel('Time (sec)')
-        if bool(title):
-            self.axes.set_title(title)
-        fig.tight_layout(pad=3)
-        self._plot_refs = [None, None]
-        self.colors = ['b', 'r']
-
-    def plot_index(self, xdata: Iterable[float], ydata: Iterable[float], fig_num: int, y_text: str = '', legend_text: str = ''):
-        """Add curve to figure by index
-        Arguments:
-        xdata -- x values to plot
-        ydata -- y values to ploy
-        fig_num -- index of axis to plot on
-        Keyword Arguments:
-        y_text -- y axis title, defaults to empty string
-        legend_text -- nomenclature of curve in the legend, defaults to empty str
-        """
-        current_ax = self.axes_refs[fig_num]
-        if self._plot_refs[fig_num] is None:
-            self._plot_refs[fig_num] = current_ax.plot(xdata.values, ydata.values, self.colors[fig_num])[0]
-        else:
-            self._plot_refs[fig_num].set_ydata(ydata.values)
-        if bool(y_text):
-            current_ax.set_ylabel(y_text)
-        if bool(legend_text):
-            self._plot_refs[fig_num].set_label(legend_text)
-            lines1, labels1 = self.axes.get_legend_handles_labels()
-            lines2, labels2 = self.axes2.get_legend_handles_labels()
-            self.axes.legend(lines1 + lines2, labels1 + labels2, loc=0)
-        if (fig_num == 1) and (current_ax.yaxis.get_label_position() != 'right'):
-            current_ax.yaxis.set_label_position('right')
-        self.draw()
-        # # testing
-        # if fig_num == 1:
-        #     print(current_ax.yaxis.get_label_position())
-        #     print(current_ax.yaxis.label.get_position())
-
-    def clear_plot(self, fig_num: int):
-        """Remove curve from figure at given index"""
-        if fig_num != -1:
-            # Clear one plot
-            self.axes_refs[fig_num].cla()
-            self._plot_refs[fig_num] = None
-        else:
-            # Clear all plots
-            for i in range(2):
-                self.axes_refs[i].cla()
-                self._plot_refs[i] = None
-        self.axes.set_xlabel('Time (sec)')
-        if bool(self.title):
-            self.axes.set_title(self.title)
-        self.draw()
-
-
-class DoubleLineEdit(QLineEdit):
-    """Extends QLineEdit to make it more aesthetic and easier to retreive data"""
-    def __init__(self, lower: float, upper: float, decimals: int, parent=None):
-        """Initialize instance
-        Arguments:
-        lower -- float, min acceptible value
-        upper -- float, max acceptible value
-        decimals -- int, number of decimals to allow
-        """
+from file_opener import QtRunner
+from error_dialog import BetterExceptionDialog
+from widgets import DoubleLineEdit, ErrorMsg
+from session import DEFAULT_BUDGET_MB, LogSession, SessionLog
+import profiling
+
+# pandas, matplotlib and the modules built on them (lib, plot_window, figure_export) are imported
+# on first use or by preload_modules once the window is up, so the Start tab shows right away
+TAIL_INTERVAL_MS = 1000
+# time filter slider steps in sec
+TIME_FILTER_STEP = 0.1
+# pulls are found again once the sliders rest this long
+REDETECT_DELAY_MS = 150
+
+
+def preload_modules(process_callback=None, cancel_check=None):
+    """Import the heavy modules in the background so the first load and plot do not wait on them"""
+    with profiling.stage('deferred imports'):
+        import lib  # noqa: F401
+        import figure_export  # noqa: F401
+        import plot_window  # noqa: F401
+        import stats_table  # noqa: F401
+        import derived  # noqa: F401
+        import library_window  # noqa: F401
+        import pull_export  # noqa: F401
+
+
+class ExportDialog(QDialog):
+    """Dialog to pick the channels, format and directory used to export a figure of every pull"""
+    def __init__(self, columns: list, out_dir: str = '', parent=None):
+        from figure_export import EXPORT_FORMATS
         super().__init__(parent)
-        self.double_validator = QDoubleValidator(lower, upper, decimals)
-        self.setValidator(self.double_validator)
-
-    def validate_input(self):
-        """Validate input and update displayed value"""
-        if self.text() != '':
-            try:
-                value = float(self.text())
-            except ValueError:
-                value = 0
-            finally:
-                # Update extremas to int if no decimal is required
-                lower = self.double_validator.bottom()
-                if lower.is_integer():
-                    lower = int(lower)
-                upper = self.double_validator.top()
-                if upper.is_integer():
-                    upper = int(upper)
-                # Update displayed value to respective limit if input is out of bounds
-                if value > upper:
-                    self.setText(str(upper))
-                elif value < lower:
-                    self.setText(str(lower))
-
-    def value(self) -> float:
-        """Return user input as float"""
-        try:
-            return float(self.text())
-        except ValueError:
-            return 0
-
-
-class ErrorMsg(QMessageBox):
-    """Extends QMessageBox to make error message display easier"""
-    def __init__(self, msgtext: str, infotext: str = '', parent=None):
-        """Initialize
-        Arguments:
-        msgtext -- str, error message title
-        Keyword arguments:
-        infotext -- str, informative text to display, defaults to empty str
-        """
+        self.setWindowTitle('Export All Pulls')
+        layout = QFormLayout()
+        self.channel_list = QListWidget()
+        for i, col in enumerate(x for x in columns if x != 'Time (sec)'):
+            item = QListWidgetItem(col)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if i == 0 else Qt.Unchecked)
+            self.channel_list.addItem(item)
+        self.channel_list.setToolTip('Channels sharing a unit share a y axis, as in pull plots')
+        self.format_picker = QComboBox()
+        self.format_picker.addItems(EXPORT_FORMATS)
+        self.dir_input = QLineEdit(out_dir)
+        dir_button = QPushButton('Browse')
+        dir_button.clicked.connect(self.dir_button_pressed)
+        dir_layout = QHBoxLayout()
+        dir_layout.addWidget(self.dir_input)
+        dir_layout.addWidget(dir_button)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow('Channels', self.channel_list)
+        layout.addRow('Format', self.format_picker)
+        layout.addRow('Directory', dir_layout)
+        layout.addRow(buttons)
+        self.setLayout(layout)
+
+    def dir_button_pressed(self):
+        out_dir = QFileDialog.getExistingDirectory(self, 'Export Directory', self.dir_input.text())
+        if bool(out_dir):
+            self.dir_input.setText(out_dir)
+
+    def channels(self) -> list:
+        """Return checked channels in log order, the first unit goes on the LH axis"""
+        items = [self.channel_list.item(i) for i in range(self.channel_list.count())]
+        return [x.text() for x in items if x.checkState() == Qt.Checked]
+
+
+class PullDataDialog(QDialog):
+    """Dialog to pick the pulls, channels, format and file used to export pull data"""
+    def __init__(self, columns: list, pull_count: int, out_path: str = '', parent=None):
+        from lib import KEY_COLUMNS
+        from pull_export import DATA_FORMATS, available_data_formats
         super().__init__(parent)
-        self.setIcon(QMessageBox.Critical)
-        self.setWindowTitle('Error')
-        self.setText(msgtext)
-        if bool(infotext):
-            self.setInformativeText(infotext)
-        self.setStandardButtons(QMessageBox.Ok)
-
-
-class BetterScrollArea(QScrollArea):
-    """Override QScrollArea size hint to make it not suck"""
-    def sizeHint(self) -> QSize:
-        """Provide a size hint that accounts for vertical scroll bar width"""
-        hint = super().sizeHint()
-        bar_width = self.verticalScrollBar().sizeHint().width()
-        return QSize(hint.width() + bar_width, hint.height())
-
-
-class PullPlot(QDialog):
-    """Dialog with a figure canvas and list of selectable curves to plot"""
-    # fig_title: str
-    # x_values: pd.Series
-    # df: pd.DataFrame
-    # col_names: dict
-    # active_plots: list
-    # axis_selector: QComboBox
-    # ymin_input: DoubleLineEdit
-    # ymax_input: DoubleLineEdit
-    # col_checkboxes: list[QCheckBox]
-    # plot_widget: MultiPlotFigure
-
-    def __init__(self, df: pd.DataFrame, fig_title: str, parent=None):
+        self.setWindowTitle('Export Pull Data')
+        self.suffixes = DATA_FORMATS
+        layout = QFormLayout()
+        self.pulls_input = QLineEdit()
+        self.pulls_input.setPlaceholderText(f'all, or i.e. 1-3, 7 of {pull_count}')
+        self.channel_list = QListWidget()
+        for col in columns:
+            if col in KEY_COLUMNS:
+                continue
+            item = QListWidgetItem(col)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            self.channel_list.addItem(item)
+        self.channel_list.setToolTip('Time (sec) and Throttle Pos (%) are always exported')
+        self.format_picker = QComboBox()
+        self.format_picker.addItems(available_data_formats())
+        self.format_picker.setToolTip('parquet and arrow are smallest and quickest to load and need pyarrow')
+        self.format_picker.activated.connect(self.format_changed)
+        self.file_input = QLineEdit(out_path)
+        file_button = QPushButton('Browse')
+        file_button.clicked.connect(self.file_button_pressed)
+        file_layout = QHBoxLayout()
+        file_layout.addWidget(self.file_input)
+        file_layout.addWidget(file_button)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow('Pulls', self.pulls_input)
+        layout.addRow('Channels', self.channel_list)
+        layout.addRow('Format', self.format_picker)
+        layout.addRow('File', file_layout)
+        layout.addRow(buttons)
+        self.setLayout(layout)
+        self.format_changed()
+
+    def format_changed(self):
+        """Swap the suffix of the file for the one of the picked format"""
+        path = self.file_input.text()
+        for suffix in self.suffixes.values():
+            if path.lower().endswith(suffix):
+                path = path[:-len(suffix)]
+                break
+        else:
+            path = path.rpartition('.')[0] if path.lower().endswith('.csv') else path
+        if bool(path):
+            self.file_input.setText(path + self.suffixes[self.format_picker.currentText()])
+
+    def file_button_pressed(self):
+        suffix = self.suffixes[self.format_picker.currentText()]
+        path, _ = QFileDialog.getSaveFileName(self, 'Export Pull Data', self.file_input.text(), f'Pull data (*{suffix})')
+        if bool(path):
+            self.file_input.setText(path)
+            self.format_changed()
+
+    def channels(self) -> list:
+        items = [self.channel_list.item(i) for i in range(self.channel_list.count())]
+        return [x.text() for x in items if x.checkState() == Qt.Checked]
+
+
+class DerivedChannelsDialog(QDialog):
+    """Dialog to edit derived channel definitions, one name = expression per line"""
+    def __init__(self, definitions: str, parent=None):
+        from derived import FUNCTIONS
         super().__init__(parent)
-        self.fig_title = fig_title
-        self.setWindowTitle(fig_title)
-        self.x_values = df['Time (sec)']
-        self.df = df.drop('Time (sec)', axis=1)
-        #print(self.df)
-        col_names = {}
-        for col in self.df.columns:
-            if col.endswith(')'):
-                unit_start = col.index('(')
-                col_names[col] = {
-                    'name': col[:(unit_start - 1)],
-                    'unit': col[unit_start:].strip('()')
-                }
-            else:
-                col_names[col] = {
-                    'name': col,
-                    'unit': None
-                }
-        self.col_names = col_names
-        self.active_plots = [None, None]
-        self.create_main_layout()
+        self.setWindowTitle('Derived Channels')
+        self.channels = []
+        layout = QVBoxLayout()
+        help_label = QLabel('One channel per line as Name (unit) = expression, reference channels as [Boost] or [Boost (psi)].\n'
+                            f'Functions: {", ".join(FUNCTIONS)}. Lines starting with # are ignored.')
+        help_label.setWordWrap(True)
+        self.definitions_input = QPlainTextEdit(definitions)
+        self.definitions_input.setPlaceholderText('Boost Error (psi) = [Boost] - [Target Boost]\n'
+                                                  'Knock Smoothed (°) = smooth([Feedback Knock], 10)')
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(help_label)
+        layout.addWidget(self.definitions_input)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+        self.resize(600, 300)
+
+    def accept(self):
+        """Close only when every definition parses"""
+        from derived import parse_definitions
+        try:
+            self.channels = parse_definitions(self.definitions_input.toPlainText())
+        except ValueError as e:
+            ErrorMsg('Invalid derived channel.', infotext=str(e), parent=self).exec_()
+            return
+        super().accept()
+
+
+class TimingSignals(QObject):
+    """Carries stage timings from any thread to the status bar"""
+    stage_timed = pyqtSignal(str, float, int)
 
-    def create_main_layout(self):
-        """Populate dialog with widgets"""
-        # higher level layout 
-        main_layout = QHBoxLayout()
-        left_highlevel_widget = QWidget()
-        left_highlevel_layout = QVBoxLayout()
-        left_layout = QGroupBox('Curves')
-        left_layout.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Preferred)
-        left_wrap_layout = QVBoxLayout()
-        # scroll area content
-        left_scrollbox_layout = QVBoxLayout()
-        left_scrollbox = BetterScrollArea()
-        scroll_content = QWidget()
-        # populate scroll area content
-        self.col_checkboxes = [QCheckBox(col) for col in self.col_names.keys()]
-        [x.stateChanged.connect(self.curve_checkbox_changed) for x in self.col_checkboxes]
-        [left_scrollbox_layout.addWidget(x) for x in self.col_checkboxes]
-        # finish scroll area setup
-        scroll_content.setLayout(left_scrollbox_layout)
-        left_scrollbox.setWidget(scroll_content)
-        left_wrap_layout.addWidget(left_scrollbox)
-        # left axes options
-        left_opts_widget = QGroupBox('Options')
-        left_opts_layout = QFormLayout()
-        # axis selector
-        self.axis_selector = QComboBox()
-        self.axis_selector.addItems(['LH Axis', 'RH Axis'])
-        left_opts_layout.addRow('Axis', self.axis_selector)
-        # y max input
-        self.ymax_input = DoubleLineEdit(-1000000, 1000000, 3)
-        self.ymax_input.setText('1')
-        left_opts_layout.addRow('Y Max', self.ymax_input)
-        # y min input
-        self.ymin_input = DoubleLineEdit(-1000000, 1000000, 3)
-        self.ymin_input.setText('0')
-        left_opts_layout.addRow('Y Min', self.ymin_input)
-        # finalize left layout
-        left_opts_widget.setLayout(left_opts_layout)
-        left_opts_widget.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
-        left_layout.setLayout(left_wrap_layout)
-        left_layout.updateGeometry()
-        left_highlevel_layout.addWidget(left_layout)
-        left_highlevel_layout.addWidget(left_opts_widget)
-        left_highlevel_widget.setLayout(left_highlevel_layout)
-        left_highlevel_widget.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Preferred)
-        # right plot area
-        right_widget = QWidget()
-        right_layout = QVBoxLayout()
-        self.plot_widget = MultiPlotFigure(title=self.fig_title)
-        toolbar = NavigationToolbar(self.plot_widget, self)
-        unwanted_btns = ['Subplots']
-        for x in toolbar.actions():
-            if x.text() in unwanted_btns:
-                toolbar.removeAction(x)
-        right_layout.addWidget(toolbar)
-        right_layout.addWidget(self.plot_widget)
-        right_widget.setLayout(right_layout)
-        # finish setting up high level layout
-        main_layout.addWidget(left_highlevel_widget)
-        main_layout.addWidget(right_widget)
-        self.setLayout(main_layout)
-        self.updateGeometry()
-        # bind functions
-        self.axis_selector.activated.connect(self.axis_selector_changed)
-        self.ymin_input.editingFinished.connect(self.ylim_input_changed)
-        self.ymax_input.editingFinished.connect(self.ylim_input_changed)
-        self.plot_widget.mpl_connect('draw_event', self.draw_event_called)
-
-    def axis_selector_changed(self):
-        """Update displayed y axis min/max values"""
-        formspec = '{:.2f}'
-        i = self.axis_selector.currentIndex()
-        if i == 0:
-            axes_ref = self.plot_widget.axes
-        else:
-            axes_ref = self.plot_widget.axes2
-        axis_limits = axes_ref.get_ylim()
-        self.ymax_input.setText(formspec.format(axis_limits[1]))
-        self.ymin_input.setText(formspec.format(axis_limits[0]))
-
-    def ylim_input_changed(self, input_text: str = ''):
-        """Update y axis limits per user input"""
-        # pull user input values
-        self.ymax_input.validate_input()
-        self.ymin_input.validate_input()
-        new_ymax = self.ymax_input.value()
-        new_ymin = self.ymin_input.value()
-        # get axis reference and update limits
-        i = self.axis_selector.currentIndex()
-        if i == 0:
-            self.plot_widget.axes.set_ylim(bottom=new_ymin, top=new_ymax)
-        else:
-            self.plot_widget.axes2.set_ylim(bottom=new_ymin, top=new_ymax)
-        # honestly idk wtf this if statement is for
-        # if input_text != 'draw':
-        self.plot_widget.draw()
-
-    def draw_event_called(self, *arg):
-        """Call axis_selector_changed to update displayed axis limits when graph is altered"""
-        self.axis_selector_changed()
-
-    def curve_checkbox_changed(self):
-        """Update figure when user selects/deselects a variable"""
-        current_widget = self.sender()
-        requested_plot = current_widget.text()
-        widget_states = [x.isChecked() for x in self.col_checkboxes]
-        # disable other check boxes when 2 are selected
-        if widget_states.count(True) > 1:
-            # Two boxes checked, disable others
-            [x.setDisabled(True) for x in self.col_checkboxes if not x.isChecked()]
-        else:
-            # Enable all checkboxes
-            [x.setDisabled(False) for x in self.col_checkboxes]
-        # draw stuff
-        last_plots = self.active_plots
-        requested_plots = [x for x in self.col_checkboxes if x.isChecked()]
-        if len(requested_plots) == 0:
-            # Removing all plots
-            self.plot_widget.clear_plot(-1)
-            self.active_plots = [None, None]
-        elif len(requested_plots) > len(list(filter(bool, last_plots))):
-            # Add an additional plot
-            plot_index = last_plots.index(None)
-            self.active_plots[plot_index] = requested_plot
-            self.plot_widget.plot_index(self.x_values, self.df[requested_plot], plot_index,\
-                                        y_text=requested_plot, legend_text=self.col_names[requested_plot]['name'])
-        else:
-            # Removing a plot
-            plot_index = last_plots.index(requested_plot)
-            self.active_plots[plot_index] = None
-            if plot_index == 0:
-                self.active_plots = [self.active_plots[1], None]
-            remaining_plot = self.active_plots[0]
-            self.plot_widget.clear_plot(-1)
-            self.plot_widget.plot_index(self.x_values, self.df[remaining_plot], 0, y_text=remaining_plot,\
-                                        legend_text = self.col_names[remaining_plot]['name'])
-        self.axis_selector_changed()  # update axis limits on change
 
 class WidgetGallery(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profile_dir: str = None, budget_mb: float = DEFAULT_BUDGET_MB, compact: bool = False):
         super().__init__(parent)
+        self.profile_dir = profile_dir
+        self.compact = compact
+        self.session = LogSession(budget_mb)
+        self.stage_timings = {}
+        self.redetect_timer = QTimer(self)
+        self.redetect_timer.setSingleShot(True)
+        self.redetect_timer.setInterval(REDETECT_DELAY_MS)
+        self.redetect_timer.timeout.connect(self.redetect_pulls)
         self.create_main_layout()
+        self.timing_signals = TimingSignals()
+        self.timing_signals.stage_timed.connect(self.stage_timed)
+        profiling.add_listener(self.timing_signals.stage_timed.emit)
         self.presscount = 0
         self.datalogfile = ''
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+        self.pulls = []
+        self.pull_stats = None
+        self.datalog = None
+        self.detector = None
+        self.open_plots = []
+        self.plot_store = None
+        self.tracker = None
+        self.tail_timer = QTimer(self)
+        self.tail_timer.setInterval(TAIL_INTERVAL_MS)
+        self.tail_timer.timeout.connect(self.tail_timer_fired)
+        self.stats_worker = None
+        self.export_worker = None
+        self.stats_stale = False
+        self.derived_channels = None
+        self.library_window = None
         self.settings = QSettings('nwgruber', 'Datalog Reader')
         if self.settings.contains('last_log_dir'):
             self.last_log_dir = self.settings.value('last_log_dir')
@@ -337,7 +226,10 @@ class WidgetGallery(QWidget):
         self.main_widget = QTabWidget()
 
         self.create_start_tab()
+        self.status_bar = QStatusBar()
+        self.status_bar.setSizeGripEnabled(False)
         main_layout.addWidget(self.main_widget)
+        main_layout.addWidget(self.status_bar)
         self.setLayout(main_layout)
 
     def create_start_tab(self):
@@ -352,9 +244,24 @@ class WidgetGallery(QWidget):
 
         self.file_button.clicked.connect(self.file_button_pressed)
 
+        self.library_button = QPushButton('Pull Library')
+        self.library_button.setToolTip('Search the pulls of every log added to the library')
+        self.library_button.clicked.connect(self.library_button_pressed)
+
         start_box_layout.addWidget(self.file_label)
         start_box_layout.addWidget(self.file_button)
+        start_box_layout.addWidget(self.library_button)
         start_box.setLayout(start_box_layout)
+        # Open logs box
+        logs_box = QGroupBox('Open Logs')
+        logs_box_layout = QVBoxLayout()
+        self.log_list = QListWidget()
+        self.log_list.setToolTip('Logs loaded this session, click one to switch to it')
+        self.log_list.itemClicked.connect(self.log_selected)
+        self.session_label = QLabel()
+        logs_box_layout.addWidget(self.log_list)
+        logs_box_layout.addWidget(self.session_label)
+        logs_box.setLayout(logs_box_layout)
         # Options box
         opts_box = QGroupBox('Options')
         opts_box_layout = QFormLayout()
@@ -367,17 +274,60 @@ class WidgetGallery(QWidget):
         self.time_filter_input.setToolTip('Omit pulls whose duration is less than this number')
         self.time_filter_input.setText('0.5')
 
+        # sliders re-detect pulls of the loaded log from memory
+        self.throttle_slider = QSlider(Qt.Horizontal)
+        self.throttle_slider.setRange(1, 100)
+        self.throttle_slider.setValue(50)
+        self.time_filter_slider = QSlider(Qt.Horizontal)
+        self.time_filter_slider.setRange(1, int(round(10.0 / TIME_FILTER_STEP)))
+        self.time_filter_slider.setValue(int(round(0.5 / TIME_FILTER_STEP)))
+        self.throttle_slider.valueChanged.connect(lambda x: self.slider_moved(self.throttle_input, x))
+        self.time_filter_slider.valueChanged.connect(
+            lambda x: self.slider_moved(self.time_filter_input, round(x * TIME_FILTER_STEP, 3)))
+        # keyboard, wheel and page steps only change the value, drags re-detect once released
+        self.throttle_slider.valueChanged.connect(self.slider_value_changed)
+        self.time_filter_slider.valueChanged.connect(self.slider_value_changed)
+        self.throttle_slider.sliderReleased.connect(self.redetect_timer.start)
+        self.time_filter_slider.sliderReleased.connect(self.redetect_timer.start)
+        self.throttle_input.textEdited.connect(self.input_edited)
+        self.time_filter_input.textEdited.connect(self.input_edited)
+        self.preview_label = QLabel()
+        self.preview_label.setToolTip('Pulls found with these settings in the loaded log')
+        throttle_layout = QHBoxLayout()
+        throttle_layout.addWidget(self.throttle_input)
+        throttle_layout.addWidget(self.throttle_slider)
+        time_filter_layout = QHBoxLayout()
+        time_filter_layout.addWidget(self.time_filter_input)
+        time_filter_layout.addWidget(self.time_filter_slider)
+
+        self.tail_checkbox = QCheckBox('Watch for new rows')
+        self.tail_checkbox.setToolTip('Keep reading rows appended to a log that is still being written')
+
         self.start_button = QPushButton('Start')
         self.start_button.clicked.connect(self.start_button_pressed)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_button_pressed)
+        self.cancel_button.setDisabled(True)
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+
         self.opts_box_disabled(True)
-        opts_box_layout.addRow('Throttle Threshold:', self.throttle_input)
-        opts_box_layout.addRow('Time Filter:', self.time_filter_input)
+        opts_box_layout.addRow('Throttle Threshold:', throttle_layout)
+        opts_box_layout.addRow('Time Filter:', time_filter_layout)
+        opts_box_layout.addRow(self.preview_label)
+        opts_box_layout.addRow(self.tail_checkbox)
         opts_box_layout.addRow(self.start_button)
+        opts_box_layout.addRow(progress_layout)
         opts_box.setLayout(opts_box_layout)
 
         self.start_tab_layout.addWidget(start_box)
         self.start_tab_layout.addWidget(opts_box)
+        self.start_tab_layout.addWidget(logs_box)
         start_tab.setLayout(self.start_tab_layout)
 
         self.main_widget.addTab(start_tab, 'Start')
@@ -385,7 +335,7 @@ class WidgetGallery(QWidget):
     def file_button_pressed(self):
         dialog = QFileDialog()
         dialog.setFileMode(QFileDialog.ExistingFile)
-        dialog.setNameFilter('Datalogs (*.csv)')
+        dialog.setNameFilter('Datalogs and pull exports (*.csv *.parquet *.arrow)')
         if bool(self.last_log_dir):
             dialog.setDirectory(self.last_log_dir)
 
@@ -394,32 +344,354 @@ class WidgetGallery(QWidget):
             self.file_label.setText('File: ' + self.datalogfile.rpartition('/')[2])
             self.settings.setValue('last_log_dir', self.datalogfile.rpartition('/')[0])
             self.opts_box_disabled(False)
+            self.update_preview()
+
+    def library_button_pressed(self):
+        """Open the pull library window, logs are added with the current pull settings"""
+        from library_window import LibraryWindow
+        if self.library_window is not None:
+            self.library_window.close()
+        self.library_window = LibraryWindow(self.throttle_input.value(), self.time_filter_input.value(),
+                                            log_dir=self.last_log_dir, derived=self.get_derived_channels(),
+                                            backend=self.settings.value('plot_backend', 'matplotlib'),
+                                            plot_store=self.get_plot_store(), parent=self)
+        self.library_window.show()
 
     def start_button_pressed(self):
-        [self.datalog, self.ap_info] = read_datalog(self.datalogfile)
+        from lib import load_datalog
+        from pull_export import is_pull_export, load_pull_export
         self.throttle_input.validate_input()
         self.time_filter_input.validate_input()
-        # Get pulls
-        self.pulls = get_pulls(self.datalog, self.throttle_input.value(), self.time_filter_input.value())
+        if self.detector_valid():
+            # log already in memory, only the pulls change
+            self.redetect_pulls(show_graph_tab=True)
+            return
+        # Read log and get pulls on a worker thread
+        self.tail_timer.stop()
+        self.tracker = None
+        self.stage_timings = {}
+        # pull exports hold the pulls they were written with, they are not detected again
+        export = is_pull_export(self.datalogfile)
+        load_fn = load_pull_export if export else load_datalog
+        if self.profile_dir:
+            # profile a single load
+            load_fn = profiling.profiled(load_fn, self.profile_dir)
+            self.profile_dir = None
+        if export:
+            self.worker = QtRunner(load_fn, self.datalogfile, compact=self.compact)
+        else:
+            self.worker = QtRunner(load_fn, self.datalogfile, self.throttle_input.value(), self.time_filter_input.value(),
+                                   tail=self.tail_checkbox.isChecked(), compact=self.compact)
+        self.worker.signals.progress.connect(self.progress_bar.setValue)
+        self.worker.signals.result.connect(self.load_finished)
+        self.worker.signals.error.connect(self.load_failed)
+        self.worker.signals.finished.connect(self.load_done)
+        self.progress_bar.setValue(0)
+        self.file_button.setDisabled(True)
+        self.opts_box_disabled(True)
+        self.cancel_button.setDisabled(False)
+        self.thread_pool.start(self.worker)
+
+    def cancel_button_pressed(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_button.setDisabled(True)
+
+    def load_failed(self, error: tuple):
+        from lib import LoadCancelled
+        e, tb = error
+        if isinstance(e, LoadCancelled):
+            self.progress_bar.setValue(0)
+            return
+        msg = BetterExceptionDialog(e, tb, parent=self)
+        msg.exec_()
+
+    def load_done(self):
+        self.worker = None
+        self.file_button.setDisabled(False)
+        self.opts_box_disabled(False)
+        self.cancel_button.setDisabled(True)
+
+    def load_finished(self, result: list):
+        from lib import PullDetector, PullTracker
+        from pull_export import is_pull_export
+        [self.datalog, self.ap_info, self.pulls, self.pull_info] = result
+        self.datalog.set_derived(self.get_derived_channels())
+        self.pull_stats = None
+        self.detector = None
+        if is_pull_export(self.datalog.filepath):
+            # rows between the exported pulls are gone, so the pulls can't be found again with other settings
+            pass
+        elif self.tail_checkbox.isChecked():
+            self.tracker = PullTracker(self.throttle_input.value(), self.time_filter_input.value())
+            self.tracker.feed(self.datalog.time, self.datalog.throttle)
+            self.tail_timer.start()
+        else:
+            self.detector = PullDetector(self.datalog.time, self.datalog.throttle)
+        self.update_preview()
+        self.remember_log()
+        if self.tracker is not None and not bool(self.pulls):
+            # pulls show up once they are logged
+            return
+        self.show_pulls(show_graph_tab=True)
+
+    def get_derived_channels(self) -> list:
+        """Derived channels saved in settings, parsed on first use"""
+        from derived import parse_definitions
+        if self.derived_channels is None:
+            try:
+                self.derived_channels = parse_definitions(self.settings.value('derived_channels', ''))
+            except ValueError:
+                self.derived_channels = []
+        return self.derived_channels
+
+    def derived_button_pressed(self):
+        """Edit the derived channels and apply them to every loaded log"""
+        definitions = '\n'.join(x.definition() for x in self.get_derived_channels())
+        dialog = DerivedChannelsDialog(definitions, parent=self)
+        if not dialog.exec_():
+            return
+        self.derived_channels = dialog.channels
+        self.settings.setValue('derived_channels', '\n'.join(x.definition() for x in self.derived_channels))
+        self.remember_log()
+        for log in self.session.logs():
+            if log.loaded:
+                log.datalog.set_derived(self.derived_channels)
+                log.pull_stats = None
+        self.pull_stats = None
+        self.start_pull_stats()
+
+    def remember_log(self):
+        """Store the shown log in the session, unloading least recently used logs past the memory budget"""
+        if self.datalog is None:
+            return
+        log = self.session.get(self.datalog.filepath)
+        if log is None:
+            log = SessionLog(self.datalog.filepath, 0, 0)
+        log.min_throttle = self.throttle_input.value()
+        log.time_filter = self.time_filter_input.value()
+        log.tail = self.tracker is not None
+        log.datalog = self.datalog
+        log.ap_info = self.ap_info
+        log.pulls = self.pulls
+        log.pull_info = self.pull_info
+        log.pull_stats = self.pull_stats
+        log.detector = self.detector
+        log.tracker = self.tracker
+        self.session.add(log)
+        self.update_log_list()
+
+    def update_log_list(self):
+        current = None if self.datalog is None else self.datalog.filepath
+        self.log_list.clear()
+        for log in self.session.logs():
+            name = log.filepath.rpartition('/')[2]
+            item = QListWidgetItem(name if log.loaded else f'{name} (unloaded)')
+            item.setData(Qt.UserRole, log.filepath)
+            item.setToolTip(log.filepath)
+            self.log_list.addItem(item)
+            if log.filepath == current:
+                self.log_list.setCurrentItem(item)
+        text = f'{self.session.nbytes() / 2 ** 20:.1f} of {self.session.budget / 2 ** 20:.0f} MB in memory'
+        if self.compact:
+            saved = sum(log.datalog.memory_saved for log in self.session.logs() if log.loaded)
+            text += f', {saved / 2 ** 20:.1f} MB saved by compact mode'
+        self.session_label.setText(text)
+
+    def log_selected(self, item: QListWidgetItem):
+        """Switch to another open log, unloaded logs are loaded again with their settings"""
+        filepath = item.data(Qt.UserRole)
+        if self.worker is not None or (self.datalog is not None and filepath == self.datalog.filepath):
+            return
+        self.remember_log()
+        log = self.session.get(filepath)
+        self.datalogfile = filepath
+        self.file_label.setText('File: ' + filepath.rpartition('/')[2])
+        self.throttle_input.setText(f'{log.min_throttle:g}')
+        self.time_filter_input.setText(f'{log.time_filter:g}')
+        self.input_edited()
+        self.tail_checkbox.setChecked(log.tail)
+        if not log.loaded or not log.datalog.is_current() and not log.tail:
+            self.start_button_pressed()
+            return
+        self.tail_timer.stop()
+        self.datalog = log.datalog
+        self.ap_info = log.ap_info
+        self.pulls = log.pulls
+        self.pull_info = log.pull_info
+        self.pull_stats = log.pull_stats
+        self.detector = log.detector
+        self.tracker = log.tracker
+        if self.tracker is not None:
+            self.tail_timer.start()
+        self.session.touch(filepath)
+        self.update_log_list()
+        self.update_preview()
+        self.show_pulls(show_graph_tab=False)
+
+    def show_pulls(self, show_graph_tab: bool):
+        """Fill the Graph tab with the current pulls, show_graph_tab switches to it and reports a log without pulls"""
         if bool(self.pulls):
             # create second tab
-            self.pull_info = get_pull_info(self.pulls)
             if self.main_widget.count() == 1:
                 self.create_graph_tab()
             else:
                 self.update_graph_tab()
-            self.main_widget.setCurrentIndex(1)
+            if show_graph_tab:
+                self.main_widget.setCurrentIndex(1)
+            self.start_pull_stats()
         else:
-            msg = ErrorMsg('No pulls found in datalog.', infotext = 'Your throttle threshold is too low or time filter too high.')
-            msg.exec_()
-
+            if self.main_widget.count() > 1:
+                self.main_widget.removeTab(1)
+                self.graph_tab.deleteLater()
+            if show_graph_tab:
+                msg = ErrorMsg('No pulls found in datalog.', infotext = 'Your throttle threshold is too low or time filter too high.')
+                msg.exec_()
+
+    def detector_valid(self) -> bool:
+        """True when the selected log is in memory and unchanged, so pulls can be found without reading it"""
+        return (self.detector is not None and not self.tail_checkbox.isChecked()
+                and self.datalog.filepath == self.datalogfile and self.datalog.is_current())
+
+    def slider_moved(self, line_edit: DoubleLineEdit, value: float):
+        line_edit.setText(f'{value:g}')
+        self.update_preview()
+
+    def slider_value_changed(self):
+        """Re-detect pulls once the sliders rest, the preview follows every step"""
+        if not (self.throttle_slider.isSliderDown() or self.time_filter_slider.isSliderDown()):
+            self.redetect_timer.start()
+
+    def input_edited(self):
+        """Move the sliders to typed values without rounding the text"""
+        for slider, value in ((self.throttle_slider, self.throttle_input.value()),
+                              (self.time_filter_slider, self.time_filter_input.value() / TIME_FILTER_STEP)):
+            slider.blockSignals(True)
+            slider.setValue(int(round(value)))
+            slider.blockSignals(False)
+        self.update_preview()
+
+    def update_preview(self):
+        """Show how many pulls the current settings give in the loaded log"""
+        if not self.detector_valid():
+            self.preview_label.setText('')
+            return
+        count, total = self.detector.preview(self.throttle_input.value(), self.time_filter_input.value())
+        self.preview_label.setText(f'{count} pulls, {total:.2f} sec total')
+
+    def redetect_pulls(self, show_graph_tab: bool = False):
+        """Find pulls of the loaded log for the current settings without reading it again"""
+        from lib import Pull, get_pull_info
+        if not self.detector_valid() or self.worker is not None:
+            return
+        with profiling.stage('pull re-detection'):
+            bounds = self.detector.bounds(self.throttle_input.value(), self.time_filter_input.value())
+            self.pulls = [Pull(self.datalog, start, stop) for start, stop in bounds]
+            self.pull_info = get_pull_info(self.pulls)
+            self.pull_stats = None
+        self.update_preview()
+        self.remember_log()
+        self.show_pulls(show_graph_tab)
+
+
+    def window_shown(self):
+        """Report time from process start to the window being up, then preload the heavy modules"""
+        profiling.record('startup', time.perf_counter() - STARTUP_START)
+        self.preload_worker = QtRunner(preload_modules)
+        self.thread_pool.start(self.preload_worker)
+
+    def stage_timed(self, name: str, seconds: float, blocks: int):
+        """Show the latest timing of each stage in the status bar"""
+        self.stage_timings[name] = seconds
+        self.status_bar.showMessage('  |  '.join(f'{k} {v:.3f} s' for k, v in self.stage_timings.items()))
+        self.status_bar.setToolTip(f'Last stage: {name} {seconds:.4f} s, {blocks:+d} allocated blocks')
+
+    def tail_timer_fired(self):
+        """Read rows appended to the watched log and add or grow pulls"""
+        from lib import Pull, get_pull_info
+        try:
+            new_rows = self.datalog.refresh()
+        except (OSError, ValueError) as e:
+            self.tail_timer.stop()
+            ErrorMsg('Stopped watching datalog.', infotext=str(e)).exec_()
+            return
+        if not new_rows:
+            return
+        self.tracker.feed(self.datalog.time, self.datalog.throttle)
+        bounds = self.tracker.bounds()
+        grown = []
+        for pull, (start, stop) in zip(self.pulls, bounds):
+            if stop != pull.stop:
+                pull.extend(stop)
+                grown.append(pull)
+        new_pulls = [Pull(self.datalog, start, stop) for start, stop in bounds[len(self.pulls):]]
+        if not (grown or new_pulls):
+            return
+        self.pulls += new_pulls
+        self.pull_info = get_pull_info(self.pulls)
+        self.pull_stats = None
+        for plot in self.open_plots:
+            if any(plot.df is x for x in grown):
+                plot.refresh_pull()
+        if self.main_widget.count() == 1:
+            self.create_graph_tab()
+        else:
+            first_new = self.pull_picker.count() + 1
+            self.pull_picker.addItems([str(x) for x in range(first_new, len(self.pulls) + 1)])
+            self.pull_picker_changed()
+        self.start_pull_stats()
+
+    def start_pull_stats(self):
+        """Compute the statistics table on a worker thread, reruns once the current job ends if pulls changed meanwhile"""
+        from stats_table import compute_pull_stats
+        if self.pull_stats is not None:
+            # computed before for these pulls
+            self.pull_stats_finished(list(self.pulls), self.pull_stats)
+            return
+        if self.stats_worker is not None:
+            self.stats_stale = True
+            return
+        self.stats_stale = False
+        pulls = list(self.pulls)
+        self.stats_worker = QtRunner(compute_pull_stats, pulls)
+        self.stats_worker.signals.result.connect(lambda stats: self.pull_stats_finished(pulls, stats))
+        self.stats_worker.signals.error.connect(self.load_failed)
+        self.stats_worker.signals.finished.connect(self.pull_stats_done)
+        self.thread_pool.start(self.stats_worker)
+
+    def pull_stats_finished(self, pulls: list, stats):
+        from lib import get_pull_info
+        from stats_table import PullStatsModel
+        if pulls != self.pulls[:len(pulls)] or self.main_widget.count() == 1:
+            # a new log was loaded meanwhile
+            return
+        if len(pulls) == len(self.pulls) and not self.stats_stale:
+            self.pull_stats = stats
+        model = PullStatsModel(get_pull_info(pulls), stats, parent=self.stats_view)
+        self.stats_view.setModel(model)
+        header = self.stats_view.horizontalHeader()
+        model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+    def pull_stats_done(self):
+        self.stats_worker = None
+        if self.stats_stale:
+            self.start_pull_stats()
+
+    def stats_row_activated(self, index):
+        """Select the double clicked pull in the pull picker"""
+        pull_number = self.stats_view.model().pull_number(index.row())
+        self.pull_picker.setCurrentIndex(pull_number - 1)
+        self.pull_picker_changed()
 
     def opts_box_disabled(self, disabled):
         self.throttle_input.setDisabled(disabled)
         self.time_filter_input.setDisabled(disabled)
+        self.throttle_slider.setDisabled(disabled)
+        self.time_filter_slider.setDisabled(disabled)
         self.start_button.setDisabled(disabled)
 
     def create_graph_tab(self):
+        from plot_window import available_backends
         self.graph_tab = QWidget()
         graph_tab_layout = QVBoxLayout()
         graph_tab_box = QGroupBox('Create Plot')
@@ -430,15 +702,62 @@ class WidgetGallery(QWidget):
         self.pull_duration_label = QLabel()
         self.plot_button = QPushButton('Plot')
         self.plot_button.clicked.connect(self.plot_button_pressed)
+        self.overlay_button = QPushButton('Overlay Pulls')
+        self.overlay_button.setToolTip('Overlay a channel of pulls from every loaded log')
+        self.overlay_button.clicked.connect(self.overlay_button_pressed)
+        self.backend_picker = QComboBox()
+        self.backend_picker.addItems(available_backends())
+        self.backend_picker.setToolTip('matplotlib for publication quality figures, pyqtgraph for smooth pan and zoom on dense logs')
+        self.backend_picker.setCurrentText(self.settings.value('plot_backend', 'matplotlib'))
+        self.backend_picker.activated.connect(
+            lambda: self.settings.setValue('plot_backend', self.backend_picker.currentText()))
+        self.derived_button = QPushButton('Derived Channels')
+        self.derived_button.setToolTip('Define channels computed from other channels, i.e. boost error or smoothed knock')
+        self.derived_button.clicked.connect(self.derived_button_pressed)
+        self.export_button = QPushButton('Export All Pulls')
+        self.export_button.clicked.connect(self.export_button_pressed)
+        self.data_export_button = QPushButton('Export Pull Data')
+        self.data_export_button.setToolTip('Write the rows of pulls to parquet, arrow or csv, the file opens here like a log')
+        self.data_export_button.clicked.connect(self.data_export_button_pressed)
+        self.export_progress = QProgressBar()
+        self.export_progress.setRange(0, 100)
+        self.export_progress.setValue(0)
+        self.export_cancel_button = QPushButton('Cancel')
+        self.export_cancel_button.clicked.connect(self.export_cancel_button_pressed)
+        self.export_cancel_button.setDisabled(True)
+        export_progress_layout = QHBoxLayout()
+        export_progress_layout.addWidget(self.export_progress)
+        export_progress_layout.addWidget(self.export_cancel_button)
         self.update_graph_tab()
         self.pull_picker.activated.connect(self.pull_picker_changed)
 
         graph_tab_box_layout.addRow('Pull:', self.pull_picker)
         graph_tab_box_layout.addRow(self.pull_start_label)
         graph_tab_box_layout.addRow(self.pull_duration_label)
+        graph_tab_box_layout.addRow('Backend:', self.backend_picker)
         graph_tab_box_layout.addRow(self.plot_button)
+        graph_tab_box_layout.addRow(self.overlay_button)
+        graph_tab_box_layout.addRow(self.derived_button)
         graph_tab_box.setLayout(graph_tab_box_layout)
+        export_box = QGroupBox('Export')
+        export_box_layout = QFormLayout()
+        export_box_layout.addRow(self.export_button)
+        export_box_layout.addRow(self.data_export_button)
+        export_box_layout.addRow(export_progress_layout)
+        export_box.setLayout(export_box_layout)
+        stats_box = QGroupBox('Pull Statistics')
+        stats_box_layout = QVBoxLayout()
+        self.stats_view = QTableView()
+        self.stats_view.setSortingEnabled(True)
+        self.stats_view.setSelectionBehavior(QTableView.SelectRows)
+        self.stats_view.verticalHeader().setVisible(False)
+        self.stats_view.setToolTip('Double click a pull to select it for plotting')
+        self.stats_view.doubleClicked.connect(self.stats_row_activated)
+        stats_box_layout.addWidget(self.stats_view)
+        stats_box.setLayout(stats_box_layout)
         graph_tab_layout.addWidget(graph_tab_box)
+        graph_tab_layout.addWidget(export_box)
+        graph_tab_layout.addWidget(stats_box)
         self.graph_tab.setLayout(graph_tab_layout)
         self.main_widget.addTab(self.graph_tab, 'Graph')
 
@@ -461,20 +780,147 @@ class WidgetGallery(QWidget):
         self.pull_start_label.setText(f'Start: {start} sec')
         self.pull_duration_label.setText(f'Duration: {duration} sec')
 
+    def get_plot_store(self):
+        """plot_window.PullPlotStore shared by every pull window, made on first use"""
+        from plot_window import PullPlotStore
+        if self.plot_store is None:
+            self.plot_store = PullPlotStore()
+        return self.plot_store
+
     def plot_button_pressed(self):
+        """Open the selected pull in a non modal window, every window shares plot_store"""
+        from plot_window import PullPlot
         selected_pull = self.pull_picker.currentIndex()
         pull_df = self.pulls[selected_pull]
         fig_title = 'Pull ' + str(selected_pull + 1)
-        testplot = PullPlot(pull_df, fig_title)
-        testplot.exec_()
+        with profiling.stage('PullPlot construction'):
+            plot = PullPlot(pull_df, fig_title, parent=self, backend=self.backend_picker.currentText(),
+                            store=self.get_plot_store())
+        plot.setAttribute(Qt.WA_DeleteOnClose)
+        plot.finished.connect(lambda result, plot=plot: self.plot_closed(plot))
+        self.open_plots.append(plot)
+        plot.show()
+
+    def plot_closed(self, plot):
+        if plot in self.open_plots:
+            self.open_plots.remove(plot)
+        # channels read for the plot count toward the session memory
+        self.update_log_list()
+
+    def overlay_button_pressed(self):
+        from plot_window import OverlayPlot
+        self.remember_log()
+        logs = [(log.filepath.rpartition('/')[2], log.pulls) for log in self.session.logs() if log.loaded and log.pulls]
+        with profiling.stage('OverlayPlot construction'):
+            overlay = OverlayPlot(logs)
+        overlay.exec_()
+
+    def export_button_pressed(self):
+        from figure_export import export_pulls
+        out_dir = self.settings.value('last_export_dir', self.last_log_dir)
+        dialog = ExportDialog(self.datalog.columns, out_dir, parent=self)
+        if not dialog.exec_():
+            return
+        out_dir = dialog.dir_input.text()
+        if not bool(out_dir) or not dialog.channels():
+            ErrorMsg('No export directory or channels selected.').exec_()
+            return
+        self.settings.setValue('last_export_dir', out_dir)
+        name = self.datalogfile.rpartition('/')[2].rpartition('.')[0]
+        self.export_worker = QtRunner(export_pulls, self.pulls, dialog.channels(), out_dir,
+                                      fmt=dialog.format_picker.currentText(), name=name)
+        self.export_worker.signals.progress.connect(self.export_progress.setValue)
+        self.export_worker.signals.result.connect(self.export_finished)
+        self.export_worker.signals.error.connect(self.export_failed)
+        self.export_worker.signals.finished.connect(self.export_done)
+        self.export_progress.setValue(0)
+        self.export_button.setDisabled(True)
+        self.export_cancel_button.setDisabled(False)
+        self.thread_pool.start(self.export_worker)
+
+    def export_cancel_button_pressed(self):
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.export_cancel_button.setDisabled(True)
+
+    def export_failed(self, error: tuple):
+        from lib import LoadCancelled
+        if isinstance(error[0], LoadCancelled):
+            self.export_progress.setValue(0)
+            return
+        self.load_failed(error)
+
+    def export_done(self):
+        self.export_worker = None
+        self.export_button.setDisabled(False)
+        self.export_cancel_button.setDisabled(True)
+
+    def export_finished(self, written: list):
+        msg = QMessageBox(self)
+        msg.setWindowTitle('Export')
+        msg.setText(f'Exported {len(written)} figures.')
+        msg.exec_()
+
+    def data_export_button_pressed(self):
+        """Write the rows of the chosen pulls and channels to a file on a worker thread"""
+        from pull_export import export_pull_data, parse_pull_selection
+        out_dir = self.settings.value('last_export_dir', self.last_log_dir)
+        name = self.datalogfile.rpartition('/')[2].rpartition('.')[0]
+        dialog = PullDataDialog(self.datalog.columns, len(self.pulls), f'{out_dir}/{name}' if out_dir else name,
+                                parent=self)
+        if not dialog.exec_():
+            return
+        out_path = dialog.file_input.text()
+        try:
+            selected = parse_pull_selection(dialog.pulls_input.text(), len(self.pulls))
+        except ValueError as e:
+            ErrorMsg('Invalid pull selection.', infotext=str(e)).exec_()
+            return
+        if not bool(out_path) or not selected:
+            ErrorMsg('No export file or pulls selected.').exec_()
+            return
+        self.settings.setValue('last_export_dir', out_path.rpartition('/')[0])
+        self.data_export_worker = QtRunner(export_pull_data, [self.pulls[i] for i in selected], dialog.channels(), out_path,
+                                           fmt=dialog.format_picker.currentText(), ap_info=self.ap_info,
+                                           numbers=[i + 1 for i in selected], source=self.datalogfile,
+                                           min_throttle=self.throttle_input.value(),
+                                           time_filter=self.time_filter_input.value())
+        self.data_export_worker.signals.progress.connect(self.export_progress.setValue)
+        self.data_export_worker.signals.result.connect(self.data_export_finished)
+        self.data_export_worker.signals.error.connect(self.load_failed)
+        self.data_export_worker.signals.finished.connect(lambda: self.data_export_button.setDisabled(False))
+        self.export_progress.setValue(0)
+        self.data_export_button.setDisabled(True)
+        self.thread_pool.start(self.data_export_worker)
+
+    def data_export_finished(self, out_path: str):
+        msg = QMessageBox(self)
+        msg.setWindowTitle('Export')
+        msg.setText(f'Exported pull data to {out_path.rpartition("/")[2]} ({os.path.getsize(out_path) / 2 ** 20:.1f} MB), '
+                    'select it on the start tab to load its pulls.')
+        msg.exec_()
 
 def main():
-    app = QApplication([])
+    parser = argparse.ArgumentParser(description='Datalog Plotter')
+    parser.add_argument('--timing', action='store_true',
+                        help='time pipeline stages, shown in the status bar and logged to stage_timings.log')
+    parser.add_argument('--memory-budget', type=float, default=DEFAULT_BUDGET_MB, metavar='MB',
+                        help='memory open logs may use before the least recently used are unloaded')
+    parser.add_argument('--compact', action='store_true',
+                        help='keep channels in the narrowest dtype that holds their logged precision to save memory')
+    parser.add_argument('--profile-dir', help='dump cProfile and tracemalloc snapshots of the next load to this directory')
+    args, qt_args = parser.parse_known_args()
+    if args.timing:
+        profiling.enable()
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle('Fusion')
-    window = WidgetGallery()
+    window = WidgetGallery(profile_dir=args.profile_dir, budget_mb=args.memory_budget, compact=args.compact)
     window.setWindowTitle('Datalog Plotter')
     window.show()
+    # fires once the event loop has painted the window
+    QTimer.singleShot(0, window.window_shown)
     app.exec_()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
@@ -3,17 +3,31 @@
 
 block_cipher = None
 
+# modules csv_reader never uses, keeps the one-file archive small so it unpacks faster
+excluded_modules = [
+    'tkinter', '_tkinter', 'IPython', 'jupyter_client', 'jupyter_core', 'notebook', 'pytest', 'sphinx',
+    'scipy', 'PyQt6', 'PySide2', 'PySide6', 'wx', 'gi', 'lib2to3',
+    'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_tkcairo', 'matplotlib.backends._backend_tk',
+    'matplotlib.backends.backend_gtk3agg', 'matplotlib.backends.backend_gtk3cairo', 'matplotlib.backends.backend_gtk4agg',
+    'matplotlib.backends.backend_gtk4cairo', 'matplotlib.backends.backend_wxagg', 'matplotlib.backends.backend_wxcairo',
+    'matplotlib.backends.backend_macosx', 'matplotlib.backends.backend_webagg', 'matplotlib.backends.backend_webagg_core',
+    'matplotlib.backends.backend_nbagg', 'matplotlib.backends.backend_qtcairo', 'matplotlib.backends.backend_qt5cairo',
+    'matplotlib.backends.backend_cairo', 'matplotlib.backends.backend_template', 'matplotlib.tests', 'numpy.tests',
+    'pandas.tests',
+]
+
 
 a = Analysis(
     ['csv_reader.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # imported lazily after the window is shown
+    hiddenimports=['lib', 'plot_window', 'figure_export', 'stats_table', 'pg_figure', 'derived', 'pull_library', 'library_window', 'pull_export'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excluded_modules,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -33,7 +47,9 @@ exe = EXE(
     bootloader_ignore_signals=False,
     strip=False,
     upx=True,
-    upx_exclude=[],
+    # UPX compressed Qt and python dlls have to be decompressed on every start
+    upx_exclude=['Qt5Core.dll', 'Qt5Gui.dll', 'Qt5Widgets.dll', 'qwindows.dll', 'python3.dll', 'python310.dll',
+                 'vcruntime140.dll', 'msvcp140.dll'],
     runtime_tmpdir=None,
     console=False,
     disable_windowed_traceback=False,
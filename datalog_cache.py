@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+"""
+Sidecar cache of parsed datalogs stored as one .npy file per column next to the log:
+    <log dir>/.csv_reader_cache/<log name>/manifest.json
+    <log dir>/.csv_reader_cache/<log name>/c0000.npy ...
+Text columns are stored as strings with a c0000_na.npy mask of their blank cells.
+Entries are keyed by absolute path, size, mtime and a sampled content hash. Columns are
+memory mapped on load so reopening a log skips the csv parse entirely.
+Logs read lazily by lib.Datalog store a compact index instead, the header, key channels and
+line offsets in <log dir>/.csv_reader_cache/<log name>/index.npz, so reopening them skips the parse too.
+"""
+
+CACHE_VERSION = 2
+INDEX_FILE = 'index.npz'
+CACHE_DIRNAME = '.csv_reader_cache'
+HASH_BLOCK = 1 << 20
+
+
+def cache_dir(filepath: str) -> str:
+    """Return the sidecar cache directory for a datalog"""
+    head, tail = os.path.split(os.path.abspath(filepath))
+    return os.path.join(head, CACHE_DIRNAME, tail)
+
+
+def file_identity(filepath: str) -> dict:
+    """Return path, size, mtime and content hash of a file
+
+    The hash covers the size plus the first and last HASH_BLOCK bytes so it stays cheap on large logs
+    """
+    stat = os.stat(filepath)
+    digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+    with open(filepath, 'rb') as f:
+        digest.update(f.read(HASH_BLOCK))
+        if stat.st_size > HASH_BLOCK:
+            f.seek(max(HASH_BLOCK, stat.st_size - HASH_BLOCK))
+            digest.update(f.read(HASH_BLOCK))
+    return {
+        'path': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': digest.hexdigest()
+    }
+
+
+def load_cached(filepath: str):
+    """Return [df, ap_info] from the cache, or None if there is no valid entry
+
+    Stale or unreadable entries are removed so they get rebuilt on the next store
+    """
+    directory = cache_dir(filepath)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != CACHE_VERSION or manifest.get('identity') != file_identity(filepath):
+            raise ValueError('stale cache entry')
+        data = {}
+        for col in manifest['columns']:
+            values = np.load(os.path.join(directory, col['file']), mmap_mode='r', allow_pickle=False)
+            if len(values) != manifest['rows']:
+                raise ValueError('truncated cache column')
+            if 'na_file' in col:
+                # blank text cells come back as missing values, as a fresh parse gives them
+                values = values.astype(object)
+                values[np.load(os.path.join(directory, col['na_file']), allow_pickle=False)] = np.nan
+            data[col['name']] = values
+        df = pd.DataFrame(data, copy=False)
+        return [df, manifest['ap_info']]
+    except (OSError, ValueError, KeyError, TypeError):
+        clear_cache(filepath)
+        return None
+
+
+def store_cached(filepath: str, df: pd.DataFrame, ap_info: str) -> bool:
+    """Write df and ap_info to the cache, returns False if the cache could not be written"""
+    directory = cache_dir(filepath)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    try:
+        clear_cache(filepath)
+        os.makedirs(directory, exist_ok=True)
+        # manifest goes last so a half written entry is never treated as valid
+        columns = []
+        for i, name in enumerate(df.columns):
+            values = df[name].to_numpy()
+            col_file = f'c{i:04d}.npy'
+            column = {'name': name, 'file': col_file}
+            if values.dtype == object:
+                na_mask = pd.isna(values)
+                values = np.where(na_mask, '', values).astype(str)
+                if na_mask.any():
+                    column['na_file'] = f'c{i:04d}_na.npy'
+                    np.save(os.path.join(directory, column['na_file']), na_mask, allow_pickle=False)
+            np.save(os.path.join(directory, col_file), values, allow_pickle=False)
+            columns.append(column)
+        manifest = {
+            'version': CACHE_VERSION,
+            'identity': file_identity(filepath),
+            'ap_info': ap_info,
+            'rows': len(df),
+            'columns': columns
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+    except OSError:
+        return False
+    return True
+
+
+def load_index(filepath: str):
+    """Return [header, keys, line_starts] from the index, or None if there is no valid index
+
+    header is the raw csv header line and keys maps each key channel to its values
+    """
+    index_path = os.path.join(cache_dir(filepath), INDEX_FILE)
+    if not os.path.isfile(index_path):
+        return None
+    try:
+        with np.load(index_path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != CACHE_VERSION or meta.get('identity') != file_identity(filepath):
+                raise ValueError('stale index')
+            keys = {name: data[f'k{i}'] for i, name in enumerate(meta['keys'])}
+            line_starts = data['line_starts'].astype(np.int64)
+            header = data['header'].tobytes()
+        if any(len(x) != len(line_starts) - 2 for x in keys.values()):
+            raise ValueError('truncated index')
+        return [header, keys, line_starts]
+    except (OSError, ValueError, KeyError, TypeError):
+        try:
+            os.remove(index_path)
+        except OSError:
+            pass
+        return None
+
+
+def store_index(filepath: str, header: bytes, keys: dict, line_starts: np.ndarray) -> bool:
+    """Write the index of a lazily read log, returns False if it could not be written"""
+    directory = cache_dir(filepath)
+    index_path = os.path.join(directory, INDEX_FILE)
+    meta = {'version': CACHE_VERSION, 'identity': file_identity(filepath), 'keys': list(keys)}
+    # offsets fit in 32 bits for any log under 4 GB, halving the index
+    offset_type = np.uint32 if line_starts[-1] < 2 ** 32 else np.int64
+    arrays = {f'k{i}': np.asarray(values) for i, values in enumerate(keys.values())}
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # written under a temporary name so a half written index is never read
+        with open(index_path + '.tmp', 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), header=np.frombuffer(header, dtype=np.uint8),
+                     line_starts=line_starts.astype(offset_type), **arrays)
+        os.replace(index_path + '.tmp', index_path)
+    except OSError:
+        return False
+    return True
+
+
+def clear_cache(filepath: str):
+    """Remove the cache entry of a datalog if there is one"""
+    shutil.rmtree(cache_dir(filepath), ignore_errors=True)
@@ -0,0 +1,141 @@
+import ast
+import re
+from typing import Callable
+import numpy as np
+from lib import parse_column_name
+
+"""
+Derived channels computed from other channels of a log with a vectorized expression, i.e.
+    Boost Error (psi) = [Boost] - [Target Boost]
+    AFR Deviation (AFR) = [AF Ratio 1] - 14.7
+    Knock Smoothed (°) = smooth([Feedback Knock] + [Fine Knock Learn], 10)
+Channels are referenced in square brackets by full name or by name without the unit when that is unique.
+Expressions are parsed and compiled once, only arithmetic, comparisons and the FUNCTIONS below are allowed,
+and each evaluation runs on whole numpy arrays.
+"""
+
+COLUMN_REF = re.compile(r'\[([^\[\]]+)\]')
+
+
+def smooth(values: np.ndarray, n: float) -> np.ndarray:
+    """Trailing moving average over n rows, shorter at the start, missing samples are left out of the average"""
+    n = max(int(n), 1)
+    missing = np.isnan(values)
+    sums = np.cumsum(np.concatenate(([0.0], np.where(missing, 0.0, values))))
+    counts = np.cumsum(np.concatenate(([0], ~missing)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - n, 0)
+    window_counts = counts[ends] - counts[starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, (sums[ends] - sums[starts]) / window_counts, np.nan)
+
+
+def diff(values: np.ndarray) -> np.ndarray:
+    """Change from the previous row, 0 for the first"""
+    return np.diff(values, prepend=values[:1])
+
+
+FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'log': np.log,
+    'exp': np.exp,
+    'min': np.minimum,
+    'max': np.maximum,
+    'clip': np.clip,
+    'where': np.where,
+    'smooth': smooth,
+    'diff': diff,
+    'cumsum': np.cumsum
+}
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd, ast.BitAnd, ast.BitOr,
+                 ast.Invert, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+
+class DerivedChannel:
+    """A named expression over other channels, parsed and compiled once
+
+    Arguments:\n
+    name : str -- channel name, a '(unit)' suffix sets its unit like any other channel\n
+    expression : str -- expression over channels referenced as [channel]
+    """
+    def __init__(self, name: str, expression: str):
+        self.name = name.strip()
+        self.expression = expression.strip()
+        if not self.name:
+            raise ValueError('Derived channel needs a name')
+        self.refs = []
+
+        def placeholder(match) -> str:
+            ref = match.group(1).strip()
+            if ref not in self.refs:
+                self.refs.append(ref)
+            return f'_c{self.refs.index(ref)}'
+
+        source = COLUMN_REF.sub(placeholder, self.expression)
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f'{self.name}: invalid expression {self.expression}') from e
+        for node in ast.walk(tree):
+            if not isinstance(node, ALLOWED_NODES):
+                raise ValueError(f'{self.name}: {type(node).__name__} is not allowed in expressions')
+            if isinstance(node, ast.Name) and node.id not in FUNCTIONS and not re.fullmatch(r'_c\d+', node.id):
+                raise ValueError(f'{self.name}: unknown name {node.id}, reference channels as [channel]')
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+                raise ValueError(f'{self.name}: only {", ".join(FUNCTIONS)} can be called')
+            if isinstance(node, ast.Compare) and len(node.ops) > 1:
+                raise ValueError(f'{self.name}: chained comparisons are not allowed, join them with & i.e. (0 < [A]) & ([A] < 5)')
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError(f'{self.name}: only numbers are allowed as constants')
+        if not self.refs:
+            raise ValueError(f'{self.name}: expression does not reference any channel')
+        self._code = compile(tree, f'<{self.name}>', 'eval')
+
+    @classmethod
+    def from_definition(cls, line: str):
+        """Parse 'name = expression'"""
+        name, sep, expression = line.partition('=')
+        if not sep:
+            raise ValueError(f'Expected name = expression, got {line.strip()}')
+        return cls(name, expression)
+
+    def definition(self) -> str:
+        return f'{self.name} = {self.expression}'
+
+    def bind(self, columns: list):
+        """Returns the channel of columns each reference resolves to, None when one is missing or ambiguous"""
+        bound = []
+        for ref in self.refs:
+            if ref in columns:
+                bound.append(ref)
+                continue
+            matches = [x for x in columns if parse_column_name(x)['name'] == ref]
+            if len(matches) != 1:
+                return None
+            bound.append(matches[0])
+        return bound
+
+    def evaluate(self, sources: list, column: Callable) -> np.ndarray:
+        """Evaluate over the channels bound to the references, column(name) returns a channel's values"""
+        namespace = dict(FUNCTIONS)
+        for i, name in enumerate(sources):
+            namespace[f'_c{i}'] = np.asarray(column(name), dtype=float)
+        with np.errstate(all='ignore'):
+            result = eval(self._code, {'__builtins__': {}}, namespace)
+        length = len(namespace['_c0'])
+        return np.broadcast_to(np.asarray(result, dtype=float), (length,)).copy()
+
+
+def parse_definitions(text: str) -> list:
+    """Returns a DerivedChannel per non empty line of name = expression, raises ValueError on the first bad line"""
+    channels = []
+    for line in text.splitlines():
+        if line.strip() and not line.strip().startswith('#'):
+            channels.append(DerivedChannel.from_definition(line))
+    names = [x.name for x in channels]
+    duplicates = sorted(set(x for x in names if names.count(x) > 1))
+    if duplicates:
+        raise ValueError(f'Derived channels defined twice: {", ".join(duplicates)}')
+    return channels
@@ -0,0 +1,198 @@
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable
+import numpy as np
+from matplotlib.figure import Figure
+from derived import parse_definitions
+from lib import LoadCancelled, Pull, load_datalog, parse_column_name, read_pull_channels
+
+"""
+Figure styling shared by MultiPlotFigure and bulk export of pull figures.
+Export renders with the Agg backend in worker processes so this module must not import Qt, i.e.
+    python figure_export.py datalog.csv -c "Boost (psi)" -c "RPM (RPM)" -o figures --format svg
+"""
+
+PLOT_COLORS = ['b', 'r', 'g', 'm', 'c', 'tab:orange', 'k', 'tab:brown', 'tab:pink', 'tab:olive', 'tab:purple']
+# up to this many curves the legend finds the best spot, past it that gets slow
+LEGEND_BEST_CURVES = 2
+# points each extra RH axis is offset past the previous one
+EXTRA_AXIS_OFFSET = 60
+EXPORT_FORMATS = ['png', 'svg', 'pdf']
+
+
+def setup_axes(fig: Figure, title: str = '') -> list:
+    """Add the LH and RH axes to fig with the standard labels, returns [axes, axes2]"""
+    axes = fig.add_subplot(111)
+    axes2 = axes.twinx()
+    style_axes(axes, title)
+    fig.tight_layout(pad=3)
+    return [axes, axes2]
+
+
+def add_offset_axis(axes_refs: list):
+    """Add a RH axis offset outward past the last one to axes_refs, returns the axis"""
+    ax = axes_refs[0].twinx()
+    ax.spines['right'].set_position(('outward', EXTRA_AXIS_OFFSET * (len(axes_refs) - 1)))
+    ax.yaxis.set_label_position('right')
+    axes_refs.append(ax)
+    return ax
+
+
+def fit_extra_axes(fig: Figure, axes_refs: list, base_right: float):
+    """Make room on the right for the offset RH axes, base_right is the right edge without them"""
+    extra = len(axes_refs) - 2
+    width = fig.get_figwidth() * fig.dpi
+    right = base_right - extra * (EXTRA_AXIS_OFFSET * fig.dpi / 72) / max(width, 1)
+    fig.subplots_adjust(right=max(right, 0.3))
+
+
+def style_axes(axes, title: str = ''):
+    """Apply x label and title to the LH axis, used again after it is cleared"""
+    axes.set_xlabel('Time (sec)')
+    if bool(title):
+        axes.set_title(title)
+
+
+def legend_axes(axes_refs: list, loc=0):
+    """Draw one legend on the LH axis covering the curves of every axis, returns the legend"""
+    lines, labels = [], []
+    for ax in axes_refs:
+        ax_lines, ax_labels = ax.get_legend_handles_labels()
+        lines += ax_lines
+        labels += ax_labels
+    return axes_refs[0].legend(lines, labels, loc=loc)
+
+
+def plot_curves(fig: Figure, title: str, x_values: np.ndarray, curves: list) -> list:
+    """Plot curves against x_values on fig, returns its axes
+
+    curves is a list of (column, values) tuples laid out as MultiPlotFigure does, curves sharing a unit
+    share a y axis, the first unit goes on the LH axis, the second on the RH axis and further units on offset RH axes
+    """
+    axes_refs = setup_axes(fig, title)
+    axes_refs[1].yaxis.set_label_position('right')
+    base_right = fig.subplotpars.right
+    unit_curves = {}
+    for i, (col, values) in enumerate(curves):
+        unit = parse_column_name(col)['unit'] or col
+        if unit not in unit_curves:
+            used = len(unit_curves)
+            unit_curves[unit] = (axes_refs[used] if used < len(axes_refs) else add_offset_axis(axes_refs), [])
+        ax, cols = unit_curves[unit]
+        ax.plot(x_values, values, PLOT_COLORS[i % len(PLOT_COLORS)], label=parse_column_name(col)['name'])
+        cols.append(col)
+    for unit, (ax, cols) in unit_curves.items():
+        # the channel name for a single curve and the unit when curves share the axis
+        ax.set_ylabel(cols[0] if len(cols) == 1 else unit)
+    fit_extra_axes(fig, axes_refs, base_right)
+    if curves:
+        legend_axes(axes_refs, loc=0 if len(curves) <= LEGEND_BEST_CURVES else 'upper left')
+    return axes_refs
+
+
+def render_figure(out_path: str, title: str, x_values: np.ndarray, curves: list, dpi: int = 100):
+    """Render curves against x_values and save to out_path, format follows the file extension, see plot_curves"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    plot_curves(fig, title, x_values, curves)
+    fig.savefig(out_path, dpi=dpi)
+    return out_path
+
+
+def export_pulls(pulls: list, channels: list, out_dir: str, fmt: str = 'png', name: str = 'pull',
+                 indices: list = None, jobs: int = None, process_callback: Callable = None,
+                 cancel_check: Callable = None) -> list:
+    """Render a figure of the chosen channels for each pull in a process pool, returns the written paths
+
+    Arguments:\n
+    pulls : list -- pull DataFrames or Pulls\n
+    channels : list -- channel names, curves sharing a unit share a y axis, see plot_curves\n
+    out_dir : str -- directory figures are written to, files are named <name>_pull<N>.<fmt>\n
+    Keyword Arguments:\n
+    indices : list -- 0 based indices of the pulls to export, defaults to every pull\n
+    process_callback, cancel_check -- see file_opener.QtRunner
+    """
+    if not channels:
+        raise ValueError('Select at least one channel to export')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported figure format {fmt}')
+    if indices is None:
+        indices = range(len(pulls))
+    os.makedirs(out_dir, exist_ok=True)
+    # one parse per datalog for every pull, rather than one per pull and channel
+    read_pull_channels([pulls[i] for i in indices if isinstance(pulls[i], Pull)], channels + ['Time (sec)'])
+    written = []
+    # Agg only, workers never touch Qt
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+        for i in indices:
+            pull = pulls[i]
+            out_path = os.path.join(out_dir, f'{name}_pull{i + 1}.{fmt}')
+            curves = [(col, pull[col].to_numpy()) for col in channels]
+            futures.append(executor.submit(render_figure, out_path, f'Pull {i + 1}', pull['Time (sec)'].to_numpy(), curves))
+        pending = set(futures)
+        while pending:
+            # wake up regularly so a cancel does not wait for the next figure
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if cancel_check is not None and cancel_check():
+                for x in pending:
+                    x.cancel()
+                raise LoadCancelled('Figure export cancelled')
+            written.extend(x.result() for x in done)
+            if process_callback is not None and done:
+                process_callback(int(100 * len(written) / len(futures)))
+    return sorted(written)
+
+
+def export_log(filepath: str, min_throttle: float, time_filter: float, channels: list, out_dir: str,
+               fmt: str = 'png', jobs: int = None, derived: list = None, process_callback: Callable = None,
+               cancel_check: Callable = None) -> list:
+    """Find the pulls of a datalog and export a figure for each, see export_pulls
+
+    derived is a list of derived.DerivedChannels that can be exported like any other channel
+    """
+    datalog, ap_info, pulls, pull_info = load_datalog(filepath, min_throttle, time_filter)
+    datalog.set_derived(derived or [])
+    missing = [x for x in channels if x not in datalog.columns]
+    if missing:
+        raise KeyError(f'Channels not in datalog: {", ".join(missing)}')
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return export_pulls(pulls, channels, out_dir, fmt=fmt, name=name, jobs=jobs,
+                        process_callback=process_callback, cancel_check=cancel_check)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Export a figure of the chosen channels for every pull in a datalog')
+    parser.add_argument('log', help='datalog csv file')
+    parser.add_argument('-c', '--channel', action='append', required=True,
+                        help='channel to plot, may repeat, curves sharing a unit share a y axis')
+    parser.add_argument('-o', '--output', default='.', help='output directory, defaults to the current directory')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='png', help='figure format, defaults to png')
+    parser.add_argument('-t', '--throttle', type=float, default=50.0, help='identify pulls when throttle pos >= this value')
+    parser.add_argument('--time-filter', type=float, default=0.5, help='omit pulls whose duration <= this number')
+    parser.add_argument('-d', '--derived', action='append', default=[],
+                        help='derived channel as "name = expression" i.e. "Boost Error (psi) = [Boost] - 18", may repeat')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes, defaults to cpu count')
+    args = parser.parse_args(argv)
+
+    def report(percent: int):
+        print(f'\r{percent}%', end='', file=sys.stderr, flush=True)
+
+    try:
+        derived = parse_definitions('\n'.join(args.derived))
+        written = export_log(args.log, args.throttle, args.time_filter, args.channel, args.output,
+                             fmt=args.format, jobs=args.jobs, derived=derived, process_callback=report)
+    except (OSError, KeyError, ValueError) as e:
+        print(f'\nExport failed: {e}', file=sys.stderr)
+        return 1
+    print(f'\nWrote {len(written)} figures to {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import traceback
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QRunnable, Qt, QThreadPool
+from typing import Callable
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QRunnable
 
 """
 1) To use, first instantiate thread pool as QThreadPool.globalInstance()
@@ -7,6 +8,8 @@ from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QRunnable, Qt, QThreadPo
 3) Connect each signal to a function as desired, i.e.
     worker.signals.result.connect(fn)
 4) Finally pass worker to thread pool like thread_pool.start(worker)
+5) fn must accept process_callback and cancel_check kwargs. Call process_callback(int)
+   to report progress and poll cancel_check() to stop early after worker.cancel()
 """
 
 class WorkerSignals(QObject):
@@ -19,15 +22,25 @@ class WorkerSignals(QObject):
 
 class QtRunner(QRunnable):
     """Allows arbitrary functions to be execute the proper Qt way with arg/kwarg supprt"""
-    def __init__(self, fn: function, *args, **kwargs):
+    def __init__(self, fn: Callable, *args, **kwargs):
         """Create instance for function fn"""
         super().__init__()
         self.fn = fn
         self.args = args
         self.kwargs = kwargs
         self.signals = WorkerSignals()
-        self.kwargs['process_callback'] = self.signals.progress
-    
+        self._cancelled = False
+        self.kwargs['process_callback'] = self.signals.progress.emit
+        self.kwargs['cancel_check'] = self.is_cancelled
+
+    def cancel(self):
+        """Request the running function to stop at its next cancel_check"""
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        """Return True once cancel has been requested"""
+        return self._cancelled
+
     @pyqtSlot()
     def run(self):
         """Run the function assigned to the working and emit applicable signals"""
@@ -1,65 +1,739 @@
+import io
+import os
+from typing import Callable
 import pandas as pd
 import numpy as np
-import time
+from datalog_cache import load_cached, load_index, store_cached, store_index
+from profiling import stage
 # datalogfile = 'G:/Cobb/Logs/datalog4.csv'
 
-def read_datalog(filepath: str):
+CHUNK_ROWS = 50000
+LINE_SCAN_BYTES = 1 << 24
+KEY_COLUMNS = ['Time (sec)', 'Throttle Pos (%)']
+PULL_STATS = ['min', 'max', 'mean', 'at peak RPM']
+# logged precision past which compact mode keeps float64
+COMPACT_MAX_DECIMALS = 6
+COMPACT_SAMPLE = 1000
+
+
+class LoadCancelled(Exception):
+    """Raised when a datalog load is cancelled by the user"""
+
+
+def read_datalog(filepath: str, process_callback: Callable = None, cancel_check: Callable = None,
+                 use_cache: bool = True, compact: bool = False):
     """Opens a datalog csv file and returns a list of the datalog as a DataFrame followed by a string of the accessport info
+
+    Keyword Arguments:\n
+    process_callback : Callable -- called with percent of file read (0-100) after each chunk\n
+    cancel_check : Callable -- polled after each chunk, raises LoadCancelled when it returns True\n
+    use_cache : bool -- load from and store to the sidecar column cache, see datalog_cache\n
+    compact : bool -- store channels in the narrowest dtype that keeps their logged precision, see compact_frame.
+    Each chunk is compacted as it is parsed so the full size log is never held, the bytes saved are in
+    df.attrs['memory_saved']. Cached logs are memory mapped and left as they are, compacted logs are not cached
     """
-    f = open(filepath, 'r', encoding='Windows-1252')
-    df = pd.read_csv(f)
-    cols = list(df.columns)
-    df = df.iloc[:, 0:(len(cols) - 1)]
-    ap_info = cols[len(cols) - 1]
-    f.close()
+    if use_cache:
+        with stage('cache load'):
+            cached = load_cached(filepath)
+        if cached is not None:
+            if process_callback is not None:
+                process_callback(100)
+            return cached
+    with stage('csv parse'):
+        df = _read_csv_chunks(filepath, process_callback=process_callback, cancel_check=cancel_check, compact=compact)
+    with stage('column trim'):
+        cols = list(df.columns)
+        df = df.iloc[:, 0:(len(cols) - 1)]
+        ap_info = cols[len(cols) - 1]
+    # the cache keeps the exact logged values
+    if use_cache and not compact:
+        with stage('cache store'):
+            store_cached(filepath, df, ap_info)
     return [df, ap_info]
 
+def _logged_decimals(values: np.ndarray):
+    """Fewest decimals every finite value was logged with, None past COMPACT_MAX_DECIMALS"""
+    # a sample rules out most decimal counts before the full check
+    sample = values[::max(len(values) // COMPACT_SAMPLE, 1)]
+    for decimals in range(COMPACT_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(sample, decimals), sample) and np.array_equal(np.round(values, decimals), values):
+            return decimals
+    return None
+
+def compact_values(values: np.ndarray):
+    """Returns a channel in the narrowest dtype that keeps every value to the precision it was logged with
+
+    Whole numbers become int8, int16 or int32, other numbers float32 when rounding the float32 values to
+    the logged decimals gives back the logged values, and text with few distinct values a Categorical
+    """
+    if values.dtype == object:
+        uniques = pd.unique(values)
+        if len(values) and len(uniques) <= len(values) // 2:
+            # blank cells stay missing values, they can't be a category
+            return pd.Categorical(values, categories=uniques[~pd.isna(uniques)])
+        return values
+    if values.dtype.kind not in 'iuf':
+        return values
+    finite_mask = np.isfinite(values) if values.dtype.kind == 'f' else np.ones(len(values), dtype=bool)
+    finite = values[finite_mask]
+    if not len(finite):
+        return values.astype(np.float32)
+    if values.dtype.kind in 'iu' or (len(finite) == len(values) and np.array_equal(np.round(finite), finite)):
+        low, high = finite.min(), finite.max()
+        for dtype in (np.int8, np.int16, np.int32):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return values.astype(dtype)
+        return values
+    decimals = _logged_decimals(finite)
+    if decimals is None:
+        return values
+    narrow = values.astype(np.float32)
+    if np.array_equal(np.round(narrow[finite_mask].astype(np.float64), decimals), finite):
+        return narrow
+    return values
+
+def compact_frame(df: pd.DataFrame, keep: list = KEY_COLUMNS) -> tuple:
+    """Returns (df, bytes saved) with every channel but keep in the dtype from compact_values
+
+    The key channels are kept as they are by default so pull detection sees the exact logged values
+    """
+    before = int(df.memory_usage(index=False, deep=True).sum())
+    df = df.assign(**{x: compact_values(df[x].to_numpy()) for x in df.columns if x not in keep})
+    return df, before - int(df.memory_usage(index=False, deep=True).sum())
+
+def _read_csv_chunks(filepath: str, usecols: list = None, process_callback: Callable = None,
+                     cancel_check: Callable = None, compact: bool = False) -> pd.DataFrame:
+    """Reads a datalog csv in chunks of CHUNK_ROWS rows, reporting progress and polling for cancellation
+
+    compact runs compact_frame on every chunk and sets df.attrs['memory_saved']
+    """
+    file_size = os.path.getsize(filepath)
+    chunks = []
+    parsed_bytes = 0
+    # binary handle so tell() reports how far the parser has read
+    with open(filepath, 'rb') as f:
+        for chunk in pd.read_csv(f, encoding='Windows-1252', usecols=usecols, chunksize=CHUNK_ROWS):
+            if compact:
+                parsed_bytes += int(chunk.memory_usage(index=False, deep=True).sum())
+                chunk = compact_frame(chunk)[0]
+            chunks.append(chunk)
+            if cancel_check is not None and cancel_check():
+                raise LoadCancelled('Datalog load cancelled')
+            if process_callback is not None and file_size > 0:
+                process_callback(int(100 * f.tell() / file_size))
+    if not chunks:
+        return pd.read_csv(filepath, encoding='Windows-1252', usecols=usecols, nrows=0)
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    if compact:
+        # concat widens a channel to the widest dtype any chunk needed, text categories differ per chunk
+        text_columns = [x for x, dtype in df.dtypes.items() if dtype == object]
+        df = df.assign(**{x: compact_values(df[x].to_numpy()) for x in text_columns})
+        df.attrs['memory_saved'] = parsed_bytes - int(df.memory_usage(index=False, deep=True).sum())
+    return df
+
+def _line_starts(filepath: str, cancel_check: Callable = None) -> np.ndarray:
+    """Returns the byte offset of every line in a file followed by the offset of the end of the file"""
+    starts = [np.zeros(1, dtype=np.int64)]
+    pos = 0
+    with open(filepath, 'rb') as f:
+        while True:
+            block = f.read(LINE_SCAN_BYTES)
+            if not block:
+                break
+            starts.append(np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n')) + (pos + 1))
+            pos += len(block)
+            if cancel_check is not None and cancel_check():
+                raise LoadCancelled('Datalog load cancelled')
+    starts = np.concatenate(starts)
+    if starts[-1] != pos:
+        starts = np.append(starts, pos)
+    return starts
+
+
+class Datalog:
+    """Datalog whose channels are read on demand
+
+    Only the header, Time (sec) and Throttle Pos (%) are read up front so pulls can be found right away.
+    Any other channel is read the first time it is requested and only for the requested rows.
+    Logs with a valid sidecar cache are served from the memory mapped columns instead, logs with a valid
+    index skip straight to reading channels on demand.
+    """
+    def __init__(self, filepath: str, process_callback: Callable = None, cancel_check: Callable = None,
+                 use_cache: bool = True, complete_lines_only: bool = False, compact: bool = False, loaded: tuple = None):
+        """complete_lines_only drops a partially written last line, for logs that are still being written
+
+        compact stores channels read from the csv as compact_frame does and adds the bytes saved to memory_saved.
+        loaded is (frame, ap_info) already read from filepath, i.e. a pull_export file, used like the cache
+        """
+        self.filepath = filepath
+        self.compact = compact
+        self.memory_saved = 0
+        self._stat = self._file_stat()
+        self._frame = None
+        self._frame_held = set()
+        self._frame_bytes = 0
+        self._line_starts = None
+        self._end = None
+        self.derived = {}
+        self._derived_values = {}
+        with stage('cache load'):
+            cached = loaded if loaded is not None else load_cached(filepath) if use_cache else None
+            index = load_index(filepath) if use_cache and cached is None else None
+        if index is not None:
+            self._header, keys, self._line_starts = index
+            header = pd.read_csv(io.BytesIO(self._header), encoding='Windows-1252').columns
+            self.columns = list(header[:-1])
+            self.ap_info = header[-1]
+            self._end = int(self._line_starts[-1])
+            if process_callback is not None:
+                process_callback(100)
+        elif cached is not None:
+            self._frame, self.ap_info = cached
+            self.columns = list(self._frame.columns)
+            # numeric cache columns stay memory mapped, text columns and loaded frames are held in memory
+            self._frame_held = set(self.columns) if loaded is not None else {
+                x for x in self.columns if not pd.api.types.is_numeric_dtype(self._frame[x])}
+            self._frame_bytes = int(self._frame[list(self._frame_held)].memory_usage(index=False, deep=True).sum())
+            keys = {x: self._frame[x].to_numpy() for x in KEY_COLUMNS}
+            if process_callback is not None:
+                process_callback(100)
+        else:
+            with stage('file open and decode'):
+                with open(filepath, 'rb') as f:
+                    self._header = f.readline()
+                header = pd.read_csv(io.BytesIO(self._header), encoding='Windows-1252').columns
+            self.columns = list(header[:-1])
+            self.ap_info = header[-1]
+            with stage('csv parse'):
+                frame = _read_csv_chunks(filepath, KEY_COLUMNS, process_callback, cancel_check)
+            keys = {x: frame[x].to_numpy() for x in KEY_COLUMNS}
+            with stage('line index'):
+                line_starts = _line_starts(filepath, cancel_check)
+            if complete_lines_only and len(line_starts) > 2 and not self._ends_with_newline():
+                line_starts = line_starts[:-1]
+                keys = {x: values[:len(line_starts) - 2] for x, values in keys.items()}
+            self._end = int(line_starts[-1])
+            # byte offsets are only usable when every line past the header is a data row
+            if len(line_starts) - 2 == len(keys['Time (sec)']):
+                self._line_starts = line_starts
+                if use_cache:
+                    with stage('cache store'):
+                        store_index(filepath, self._header, keys, line_starts)
+        self._set_keys(keys)
+
+    def _set_keys(self, keys: dict):
+        self._keys = keys
+        self.time = keys['Time (sec)']
+        self.throttle = keys['Throttle Pos (%)']
+
+    def _file_stat(self) -> tuple:
+        stat = os.stat(self.filepath)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def is_current(self) -> bool:
+        """True when the csv has not changed since it was read"""
+        try:
+            return self._file_stat() == self._stat
+        except OSError:
+            return False
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.filepath, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the key channels, line index and frame, memory mapped cache columns are not counted"""
+        derived_bytes = sum(x.nbytes for x in self._derived_values.values())
+        if self._frame is not None:
+            return self._frame_bytes + derived_bytes
+        line_bytes = self._line_starts.nbytes if self._line_starts is not None else 0
+        return sum(x.nbytes for x in self._keys.values()) + line_bytes + derived_bytes
+
+    def set_derived(self, channels: list):
+        """Add the derived.DerivedChannels whose channels are all in the log, replacing any added before
+
+        Derived channels are listed in columns after the csv channels and may use derived channels listed before them
+        """
+        columns = [x for x in self.columns if x not in self.derived]
+        self.derived = {}
+        self._derived_values = {}
+        for channel in channels:
+            if channel.name in columns or channel.name in self.derived:
+                continue
+            sources = channel.bind(columns + list(self.derived))
+            if sources is not None:
+                self.derived[channel.name] = (channel, sources)
+        self.columns = columns + list(self.derived)
+
+    def csv_channels(self, names: list) -> list:
+        """csv channels needed for names, derived channels are replaced by the channels they are computed from"""
+        result = []
+        for name in names:
+            todo = self.csv_channels(self.derived[name][1]) if name in self.derived else [name]
+            result += [x for x in todo if x not in result]
+        return result
+
+    def evaluate_derived(self, name: str, start: int, stop: int, column: Callable) -> np.ndarray:
+        """Returns rows [start, stop) of a derived channel, evaluated once per range and kept
+
+        column(name) returns the rows of a csv channel
+        """
+        key = (name, start, stop)
+        if key not in self._derived_values:
+            channel, sources = self.derived[name]
+            self._derived_values[key] = channel.evaluate(
+                sources, lambda x: self.evaluate_derived(x, start, stop, column) if x in self.derived else column(x))
+        return self._derived_values[key]
+
+    def column(self, name: str, start: int = 0, stop: int = None) -> np.ndarray:
+        """Returns rows [start, stop) of a channel"""
+        if stop is None:
+            stop = len(self)
+        if name in self.derived:
+            sources = [x for x in self.csv_channels([name]) if x not in KEY_COLUMNS]
+            if (name, start, stop) in self._derived_values or self._frame is not None or not sources:
+                return self.evaluate_derived(name, start, stop, lambda x: self.column(x, start, stop))
+            # read every source channel with one parse
+            rows = self.read_rows(sources, start, stop)
+            return self.evaluate_derived(name, start, stop,
+                                         lambda x: rows[x].to_numpy() if x in rows else self.column(x, start, stop))
+        if self._frame is not None:
+            return self._frame[name].to_numpy()[start:stop]
+        if name in KEY_COLUMNS:
+            return self._keys[name][start:stop]
+        return self.read_rows([name], start, stop)[name].to_numpy()
+
+    def _compacted(self, frame: pd.DataFrame) -> pd.DataFrame:
+        if not self.compact:
+            return frame
+        with stage('compact'):
+            frame, saved = compact_frame(frame)
+        self.memory_saved += saved
+        return frame
+
+    def read_rows(self, columns: list, start: int, stop: int) -> pd.DataFrame:
+        """Parses rows [start, stop) of the given channels from the csv"""
+        return self._compacted(self._parse_rows(columns, start, stop))
+
+    def _parse_rows(self, columns: list, start: int, stop: int) -> pd.DataFrame:
+        with stage('channel read'):
+            if self._line_starts is not None:
+                # seek straight to the rows instead of tokenizing the file up to them
+                with open(self.filepath, 'rb') as f:
+                    f.seek(self._line_starts[start + 1])
+                    body = f.read(self._line_starts[stop + 1] - self._line_starts[start + 1])
+                return pd.read_csv(io.BytesIO(self._header + body), encoding='Windows-1252', usecols=columns)
+            return pd.read_csv(self.filepath, encoding='Windows-1252', usecols=columns,
+                               skiprows=range(1, start + 1), nrows=stop - start)
+
+    def read_pull_rows(self, bounds: np.ndarray, columns: list) -> pd.DataFrame:
+        """Reads the rows of every [start, stop) range in bounds with a single parse, stacked in order"""
+        derived = [x for x in columns if x in self.derived]
+        if derived:
+            return self._read_derived_rows(bounds, columns, derived)
+        if self._frame is not None:
+            return self._frame[columns].iloc[bounds_index(bounds)]
+        if self._line_starts is not None:
+            parts = [self._header]
+            with stage('channel read'):
+                with open(self.filepath, 'rb') as f:
+                    for start, stop in bounds:
+                        f.seek(self._line_starts[start + 1])
+                        parts.append(f.read(self._line_starts[stop + 1] - self._line_starts[start + 1]))
+                frame = pd.read_csv(io.BytesIO(b''.join(parts)), encoding='Windows-1252', usecols=columns)
+            return self._compacted(frame)
+        return self._compacted(pd.concat([self._parse_rows(columns, start, stop) for start, stop in bounds],
+                                         ignore_index=True))
+
+    def _read_derived_rows(self, bounds: np.ndarray, columns: list, derived: list) -> pd.DataFrame:
+        """read_pull_rows for columns including derived channels, evaluated range by range over one parse"""
+        needed = [x for x in columns if x not in self.derived]
+        needed += [x for x in self.csv_channels(derived) if x not in needed]
+        frame = self.read_pull_rows(bounds, needed).reset_index(drop=True)
+        lengths = bounds[:, 1] - bounds[:, 0]
+        offsets = np.cumsum(lengths) - lengths
+        values = {x: [] for x in derived}
+        for (start, stop), offset, length in zip(bounds, offsets, lengths):
+            def rows(x, offset=offset, length=length):
+                return frame[x].to_numpy()[offset:offset + length]
+            for name in derived:
+                values[name].append(self.evaluate_derived(name, int(start), int(stop), rows))
+        frame = frame.assign(**{x: np.concatenate(v) if v else np.empty(0) for x, v in values.items()})
+        return frame[columns]
+
+    def refresh(self) -> int:
+        """Parses rows appended to the csv since it was last read, returns the number of new rows
+
+        Only complete lines are parsed, a partially written last line is picked up by a later refresh
+        """
+        if self._frame is not None:
+            raise ValueError('Datalogs loaded from the cache cannot be refreshed')
+        size = os.path.getsize(self.filepath)
+        if size <= self._end:
+            return 0
+        with open(self.filepath, 'rb') as f:
+            f.seek(self._end)
+            body = f.read(size - self._end)
+        body = body[:body.rfind(b'\n') + 1]
+        if not body:
+            return 0
+        new = pd.read_csv(io.BytesIO(self._header + body), encoding='Windows-1252', usecols=KEY_COLUMNS)
+        if self._line_starts is not None:
+            starts = np.flatnonzero(np.frombuffer(body, dtype=np.uint8) == ord('\n')) + (self._end + 1)
+            if len(starts) == len(new):
+                self._line_starts = np.concatenate((self._line_starts, starts))
+            else:
+                self._line_starts = None
+        self._end += len(body)
+        self._stat = self._file_stat()
+        self._set_keys({x: np.concatenate((self._keys[x], new[x].to_numpy())) for x in KEY_COLUMNS})
+        return len(new)
+
+
+class Pull:
+    """Rows [start, stop) of a Datalog, each channel is read and kept the first time it is requested"""
+    def __init__(self, datalog: Datalog, start: int, stop: int):
+        self.datalog = datalog
+        self.start = int(start)
+        self.stop = int(stop)
+        self._channels = {}
+
+    @property
+    def columns(self) -> list:
+        return self.datalog.columns
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the channels read so far, views of columns the datalog holds are counted there"""
+        return sum(x.memory_usage(index=False) for name, x in self._channels.items() if name not in self.datalog._frame_held)
+
+    def __getitem__(self, name: str) -> pd.Series:
+        if name in self.datalog.derived:
+            # kept by the datalog, computed from the channels this pull holds
+            read_pull_channels([self], [name])
+            values = self.datalog.evaluate_derived(name, self.start, self.stop, lambda x: self[x].to_numpy())
+            return pd.Series(values, name=name)
+        if name not in self._channels:
+            self._channels[name] = pd.Series(self.datalog.column(name, self.start, self.stop), name=name)
+        return self._channels[name]
+
+    def extend(self, stop: int):
+        """Grow the pull to end at row stop, channels already read only read the new rows"""
+        stop = int(stop)
+        if stop <= self.stop:
+            return
+        for name, values in self._channels.items():
+            new_values = self.datalog.column(name, self.stop, stop)
+            self._channels[name] = pd.Series(np.concatenate((values.to_numpy(), new_values)), name=name)
+        self.stop = stop
+
+
+def parse_column_name(col: str) -> dict:
+    """Splits a channel name like 'Boost (psi)' into {'name': 'Boost', 'unit': 'psi'}, unit is None when absent"""
+    if col.endswith(')') and '(' in col:
+        unit_start = col.index('(')
+        return {
+            'name': col[:(unit_start - 1)],
+            'unit': col[unit_start:].strip('()')
+        }
+    return {
+        'name': col,
+        'unit': None
+    }
+
+def rpm_column(columns: list):
+    """Returns the first channel named RPM, None when there is none"""
+    for col in columns:
+        if parse_column_name(col)['name'] == 'RPM':
+            return col
+    return None
+
+def find_pull_bounds(time_values: np.ndarray, throttle: np.ndarray, min_throttle: float, time_filter: float) -> np.ndarray:
+    """Returns an (n, 2) int array of [start, stop) row ranges for each pull
+
+    Arguments:\n
+    time_values : np.ndarray -- Time (sec) channel of the datalog\n
+    throttle : np.ndarray -- Throttle Pos (%) channel of the datalog\n
+    min_throttle : float -- identify pulls when throttle pos >= this value\n
+    time_filter : float -- omit pulls whose duration <= than this number
+    """
+    with stage('pull detection'):
+        is_pull = np.asarray(throttle) >= min_throttle
+        # run edges from the padded mask, rising edges are starts and falling edges are stops
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], is_pull, [False])).view(np.int8)))
+        bounds = edges.reshape(-1, 2)
+        time_values = np.asarray(time_values)
+        durations = time_values[bounds[:, 1] - 1] - time_values[bounds[:, 0]]
+        return bounds[durations > time_filter]
+
+class PullTracker:
+    """Incremental find_pull_bounds for datalogs that grow while being read
+
+    Feed it the key channels after each refresh, the run of throttle >= min_throttle still open
+    at the end of the fed rows is carried over so a pull spanning two refreshes is not split
+    """
+    def __init__(self, min_throttle: float, time_filter: float):
+        self.min_throttle = min_throttle
+        self.time_filter = time_filter
+        self._closed = []
+        self._run_start = None
+        self._rows = 0
+        self._time = np.zeros(0)
+
+    def feed(self, time_values: np.ndarray, throttle: np.ndarray):
+        """Process rows past the ones already fed, time_values and throttle hold every row of the log so far"""
+        new_mask = np.asarray(throttle[self._rows:]) >= self.min_throttle
+        in_run = self._run_start is not None
+        edges = np.flatnonzero(np.diff(np.concatenate(([in_run], new_mask)).view(np.int8))) + self._rows
+        if in_run:
+            edges = np.concatenate(([self._run_start], edges))
+        if len(edges) % 2:
+            self._run_start = int(edges[-1])
+            edges = edges[:-1]
+        else:
+            self._run_start = None
+        bounds = edges.reshape(-1, 2)
+        durations = time_values[bounds[:, 1] - 1] - time_values[bounds[:, 0]]
+        self._closed.extend(bounds[durations > self.time_filter].tolist())
+        self._rows = len(throttle)
+        self._time = time_values
+
+    def bounds(self) -> np.ndarray:
+        """Returns (n, 2) [start, stop) rows of every pull so far, including the open run once it passes the time filter"""
+        result = list(self._closed)
+        if self._run_start is not None:
+            if self._time[self._rows - 1] - self._time[self._run_start] > self.time_filter:
+                result.append([self._run_start, self._rows])
+        return np.array(result, dtype=np.int64).reshape(-1, 2)
+
+class PullDetector:
+    """find_pull_bounds for any threshold and time filter over key channels kept in memory
+
+    The throttle mask only changes at the distinct throttle values so the runs of throttle >= threshold
+    are found once per distinct value and cached, applying a time filter is then a mask over the run durations
+    """
+    MAX_CACHED = 256
+
+    def __init__(self, time_values: np.ndarray, throttle: np.ndarray):
+        self.time = np.asarray(time_values, dtype=float)
+        self.throttle = np.asarray(throttle, dtype=float)
+        self._levels = np.unique(self.throttle[~np.isnan(self.throttle)])
+        self._runs = {}
+
+    def runs(self, min_throttle: float) -> tuple:
+        """Returns (bounds, durations) of every run of throttle >= min_throttle before the time filter"""
+        # every threshold between two distinct throttle values gives the same mask
+        i = np.searchsorted(self._levels, min_throttle)
+        level = self._levels[i] if i < len(self._levels) else np.inf
+        if level not in self._runs:
+            if len(self._runs) >= self.MAX_CACHED:
+                del self._runs[next(iter(self._runs))]
+            bounds = find_pull_bounds(self.time, self.throttle, level, -np.inf)
+            durations = self.time[bounds[:, 1] - 1] - self.time[bounds[:, 0]]
+            self._runs[level] = (bounds, durations)
+        return self._runs[level]
+
+    def bounds(self, min_throttle: float, time_filter: float) -> np.ndarray:
+        """Same result as find_pull_bounds on the kept channels"""
+        bounds, durations = self.runs(min_throttle)
+        return bounds[durations > time_filter]
+
+    def preview(self, min_throttle: float, time_filter: float) -> tuple:
+        """Returns (number of pulls, total pull duration in sec) for a setting"""
+        bounds, durations = self.runs(min_throttle)
+        kept = durations[durations > time_filter]
+        return len(kept), float(kept.sum())
+
+
 def get_pulls(df: pd.DataFrame, min_throttle: float, time_filter: float):
     """Takes a DataFrame of a datalog and returns a list of DataFrames for each pull in the log
 
+    The pulls are row slices of df, which is not modified
+
     Arguments:\n
     df : pd.DataFrame -- DataFrame of the datalog\n
     min_throttle : float -- identify pulls when throttle pos >= this value\n
     time_filter : float -- omit pulls whose duration <= than this number
     """
-    # Aggregate by throttle pos and split by groups into list
-    df['is pull'] = df['Throttle Pos (%)'] >= min_throttle
-    df['g'] = df['is pull'].ne(df['is pull'].shift()).cumsum()
-    df = df.loc[df['is pull'], :]
-    pulls = df.groupby('g')
-    pulls = [pulls.get_group(x) for x in pulls.groups]
-    pulls = [x.reset_index(drop=True) for x in pulls]
-    # Omit pulls whose length is less than time filter
-    result = []
-    for pull in pulls:
-        startrow = pull.iloc[0]
-        endrow = pull.iloc[-1]
-        if (endrow['Time (sec)'] - startrow['Time (sec)']) > time_filter:
-            result.append(pull)
-    # Remove helper cols
-    result = [x.drop(['is pull', 'g'], axis=1) for x in result]
-    return result
+    bounds = find_pull_bounds(df['Time (sec)'].to_numpy(), df['Throttle Pos (%)'].to_numpy(), min_throttle, time_filter)
+    return [df.iloc[start:stop] for start, stop in bounds]
+
+def bounds_index(bounds: np.ndarray) -> np.ndarray:
+    """Returns the row numbers covered by [start, stop) bounds, in order"""
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+    lengths = bounds[:, 1] - bounds[:, 0]
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(bounds[:, 0] - offsets, lengths)
+
+def get_pull_info(pulls: list, stats: bool = False) -> dict:
+    """Accepts a list of pull DataFrames or Pulls and returns a dict
 
-def get_pull_info(pulls: list[pd.DataFrame]) -> dict:
-    """Accepts a list of pull DataFrames and returns a dict
+    Keyword Arguments:\n
+    stats : bool -- also add a 'stats' DataFrame per pull of every channel's PULL_STATS, see get_pull_stats
     """
     result = {}
-    for i in range(len(pulls)):
-        pull = pulls[i]
-        startrow = pull.iloc[0]
-        endrow = pull.iloc[-1]
-        result[i + 1] = {
-            'start': startrow['Time (sec)'],
-            'duration': endrow['Time (sec)'] - startrow['Time (sec)']
-        }
+    with stage('pull info'):
+        for i in range(len(pulls)):
+            pull = pulls[i]
+            if isinstance(pull, Pull):
+                # read the bounds straight from the key channel rather than building a Series
+                start = pull.datalog.time[pull.start]
+                end = pull.datalog.time[pull.stop - 1]
+            else:
+                start = pull['Time (sec)'].iloc[0]
+                end = pull['Time (sec)'].iloc[-1]
+            result[i + 1] = {
+                'start': start,
+                'duration': end - start
+            }
+    if stats and result:
+        table = get_pull_stats(pulls)
+        for i in result:
+            result[i]['stats'] = table.loc[i].unstack()[PULL_STATS]
     return result
 
-def time_test(df):
-    start = time.time()
-    pull_rows = np.where(df['Throttle Pos (%)'] >= 50, True, False)
-    end = time.time()
-    print(f'np.where: {end - start}')
-    start = time.time()
-    pull_rows2 = df['Throttle Pos (%)'] >= 50
-    end = time.time()
-    print(f'row operation: {end - start}')
\ No newline at end of file
+def _stacked_pull_rows(pulls: list, columns: list = None) -> tuple:
+    """Returns (values, columns, lengths) with the rows of every pull stacked into one float array"""
+    if columns is None:
+        columns = [x for x in pulls[0].columns if x != 'Time (sec)']
+    lengths = np.array([len(x) for x in pulls], dtype=np.int64)
+    datalog = pulls[0].datalog if isinstance(pulls[0], Pull) else None
+    if datalog is not None and all(isinstance(x, Pull) and x.datalog is datalog for x in pulls):
+        bounds = np.array([[x.start, x.stop] for x in pulls], dtype=np.int64)
+        frame = datalog.read_pull_rows(bounds, columns)
+    else:
+        frame = pd.concat([x[columns] if isinstance(x, pd.DataFrame) else pd.DataFrame({c: x[c] for c in columns})
+                           for x in pulls], ignore_index=True)
+    frame = frame[columns]
+    text_columns = [x for x, dtype in frame.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+    if text_columns:
+        # text channels have no meaningful stats
+        frame = frame.assign(**{x: np.nan for x in text_columns})
+    return frame.to_numpy(dtype=float), columns, lengths
+
+def get_pull_stats(pulls: list, columns: list = None) -> pd.DataFrame:
+    """Returns min, max, mean and value at peak RPM of each channel for every pull
+
+    Computed in one vectorized pass over the stacked pull rows with ufunc reduceat, NaNs are ignored.
+    The result is indexed by pull number from 1 with (channel, stat) columns, stats are PULL_STATS.
+    at peak RPM is NaN when the log has no RPM channel.
+
+    Arguments:\n
+    pulls : list -- pull DataFrames or Pulls\n
+    Keyword Arguments:\n
+    columns : list -- channels to summarize, defaults to every channel but Time (sec)
+    """
+    with stage('pull stats'):
+        if not pulls:
+            return pd.DataFrame(columns=pd.MultiIndex.from_product([columns or [], PULL_STATS]))
+        values, columns, lengths = _stacked_pull_rows(pulls, columns)
+        offsets = np.cumsum(lengths) - lengths
+        valid = ~np.isnan(values)
+        counts = np.add.reduceat(valid, offsets, axis=0)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), offsets, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        # fmin/fmax skip NaN unless the whole pull is NaN
+        mins = np.fmin.reduceat(values, offsets, axis=0)
+        maxs = np.fmax.reduceat(values, offsets, axis=0)
+        rpm_col = rpm_column(columns)
+        if rpm_col is not None:
+            rpm_i = columns.index(rpm_col)
+            rpm = values[:, rpm_i]
+            segment = np.repeat(np.arange(len(lengths)), lengths)
+            at_peak = rpm == np.repeat(maxs[:, rpm_i], lengths)
+            # first row of each pull that hits its peak RPM
+            peak_segments, first = np.unique(segment[at_peak], return_index=True)
+            at_peak_rpm = np.full(maxs.shape, np.nan)
+            at_peak_rpm[peak_segments] = values[np.flatnonzero(at_peak)[first]]
+        else:
+            at_peak_rpm = np.full(maxs.shape, np.nan)
+        table = np.stack((mins, maxs, means, at_peak_rpm), axis=2).reshape(len(lengths), -1)
+        return pd.DataFrame(table, index=pd.RangeIndex(1, len(lengths) + 1),
+                            columns=pd.MultiIndex.from_product([columns, PULL_STATS]))
+
+def read_pull_channels(pulls: list, columns: list):
+    """Read the given channels of Pulls that have not read them yet, with one parse per datalog"""
+    by_datalog = {}
+    for pull in pulls:
+        # key channels are already in memory, derived channels are computed from csv channels
+        needed = [x for x in pull.datalog.csv_channels(columns) if x not in KEY_COLUMNS]
+        missing = [x for x in needed if x not in pull._channels]
+        if missing:
+            by_datalog.setdefault(id(pull.datalog), (needed, []))[1].append(pull)
+    for needed, group in by_datalog.values():
+        datalog = group[0].datalog
+        missing = [x for x in needed if any(x not in pull._channels for pull in group)]
+        bounds = np.array([[x.start, x.stop] for x in group], dtype=np.int64)
+        frame = datalog.read_pull_rows(bounds, missing)
+        offset = 0
+        for pull in group:
+            rows = frame.iloc[offset:offset + len(pull)]
+            offset += len(pull)
+            for col in missing:
+                if col not in pull._channels:
+                    pull._channels[col] = pd.Series(rows[col].to_numpy(), name=col)
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, x_min: float, x_max: float, pixels: int) -> tuple:
+    """Reduces a curve to the points needed to draw [x_min, x_max] at the given pixel width
+
+    The visible rows are split into one bin per pixel and the min and max of each bin are kept in row order,
+    so spikes survive decimation. Returns the visible rows untouched when they already fit in 2 points per pixel.
+    One row on either side of the range is kept so the curve runs to the edge of the axes.
+
+    Arguments:\n
+    x : np.ndarray -- ascending x values\n
+    y : np.ndarray -- y values\n
+    x_min, x_max : float -- visible x range\n
+    pixels : int -- width of the visible range in pixels
+    """
+    start = max(int(np.searchsorted(x, x_min, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side='right')) + 1, len(x))
+    x = x[start:stop]
+    y = y[start:stop]
+    bins = max(int(pixels), 1)
+    if len(x) <= 2 * bins:
+        return x, y
+    width = len(x) // bins
+    body = bins * width
+    y_body = np.asarray(y[:body], dtype=float).reshape(bins, width)
+    # NaN gaps would win argmin/argmax, push them to the other extreme instead
+    nan_mask = np.isnan(y_body)
+    lows = np.where(nan_mask, np.inf, y_body).argmin(axis=1)
+    highs = np.where(nan_mask, -np.inf, y_body).argmax(axis=1)
+    offsets = np.arange(bins) * width
+    idx = np.sort(np.concatenate((lows + offsets, highs + offsets, [0, len(x) - 1], np.arange(body, len(x)))))
+    idx = idx[np.concatenate(([True], np.diff(idx) > 0))]
+    return x[idx], y[idx]
+
+def load_datalog(filepath: str, min_throttle: float, time_filter: float, tail: bool = False, compact: bool = False,
+                 process_callback: Callable = None, cancel_check: Callable = None) -> list:
+    """Reads the key channels of a datalog and finds its pulls, returns [datalog, ap_info, pulls, pull_info]
+
+    datalog is a Datalog and pulls are Pulls, so other channels are only read once they are plotted.
+    Pass tail for logs still being written, the cache is skipped and the Datalog can be refreshed.
+    Pass compact to keep channels read later in compact dtypes, see Datalog.
+    Meant to be run through file_opener.QtRunner, progress is reported as 0-90 for reading and 90-100 for pull detection
+    """
+    def read_progress(percent: int):
+        if process_callback is not None:
+            process_callback(int(percent * 0.9))
+
+    datalog = Datalog(filepath, process_callback=read_progress, cancel_check=cancel_check,
+                      use_cache=not tail, complete_lines_only=tail, compact=compact)
+    if cancel_check is not None and cancel_check():
+        raise LoadCancelled('Datalog load cancelled')
+    bounds = find_pull_bounds(datalog.time, datalog.throttle, min_throttle, time_filter)
+    pulls = [Pull(datalog, start, stop) for start, stop in bounds]
+    pull_info = get_pull_info(pulls)
+    if process_callback is not None:
+        process_callback(100)
+    return [datalog, datalog.ap_info, pulls, pull_info]
@@ -0,0 +1,223 @@
+import glob
+import math
+import os
+import time
+from PyQt5.QtCore import Qt, QThreadPool
+from PyQt5.QtWidgets import (QDialog, QFileDialog, QGroupBox, QHBoxLayout, QLabel, QLineEdit, QProgressBar, QPushButton,
+        QTableWidget, QTableWidgetItem, QVBoxLayout)
+from error_dialog import BetterExceptionDialog
+from file_opener import QtRunner
+from lib import LoadCancelled
+from pull_library import DEFAULT_LIBRARY, PullLibrary, ingest_logs, parse_query
+from widgets import ErrorMsg
+import profiling
+
+# rows shown for a query, refine the query to see others
+QUERY_LIMIT = 1000
+
+
+class LibraryWindow(QDialog):
+    """Window to add logs to the pull library, query it and plot any matching pull
+
+    Arguments:\n
+    min_throttle : float -- throttle threshold logs are added with\n
+    time_filter : float -- time filter logs are added with\n
+    Keyword Arguments:\n
+    library_path : str -- library database, defaults to DEFAULT_LIBRARY\n
+    log_dir : str -- directory the add dialogs start in\n
+    derived : list -- derived.DerivedChannels added to opened pulls\n
+    backend : str -- plot_window backend of opened pulls\n
+    plot_store : plot_window.PullPlotStore -- store shared with other pull windows, one is made on first plot by default
+    """
+    def __init__(self, min_throttle: float, time_filter: float, library_path: str = DEFAULT_LIBRARY, log_dir: str = '',
+                 derived: list = None, backend: str = 'matplotlib', plot_store=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Pull Library')
+        self.min_throttle = min_throttle
+        self.time_filter = time_filter
+        self.library_path = library_path
+        self.log_dir = log_dir
+        self.derived = derived or []
+        self.backend = backend
+        self.plot_store = plot_store
+        self.library = PullLibrary(library_path)
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+        self.result = None
+        self.create_main_layout()
+        self.update_counts()
+
+    def create_main_layout(self):
+        main_layout = QVBoxLayout()
+        add_box = QGroupBox('Logs')
+        add_box_layout = QVBoxLayout()
+        self.counts_label = QLabel()
+        self.counts_label.setToolTip(self.library_path)
+        settings_label = QLabel(f'Logs are added with throttle threshold {self.min_throttle:g} and time filter '
+                                f'{self.time_filter:g}, unchanged logs are skipped')
+        self.add_files_button = QPushButton('Add Logs')
+        self.add_files_button.clicked.connect(self.add_files_button_pressed)
+        self.add_dir_button = QPushButton('Add Folder')
+        self.add_dir_button.setToolTip('Add every csv in a folder and its subfolders')
+        self.add_dir_button.clicked.connect(self.add_dir_button_pressed)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_button_pressed)
+        self.cancel_button.setDisabled(True)
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.add_files_button)
+        buttons_layout.addWidget(self.add_dir_button)
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+        add_box_layout.addWidget(self.counts_label)
+        add_box_layout.addWidget(settings_label)
+        add_box_layout.addLayout(buttons_layout)
+        add_box_layout.addLayout(progress_layout)
+        add_box.setLayout(add_box_layout)
+
+        query_box = QGroupBox('Find Pulls')
+        query_box_layout = QVBoxLayout()
+        self.query_input = QLineEdit()
+        self.query_input.setPlaceholderText('RPM max > 6500 and Feedback Knock min < -2 and duration > 3')
+        self.query_input.setToolTip('Conditions joined by and, each <channel> [min|max|mean|at peak RPM] <op> <number>,\n'
+                                    'the stat defaults to max, start and duration filter on the pull itself')
+        self.query_input.returnPressed.connect(self.query_button_pressed)
+        query_button = QPushButton('Search')
+        query_button.clicked.connect(self.query_button_pressed)
+        query_layout = QHBoxLayout()
+        query_layout.addWidget(self.query_input)
+        query_layout.addWidget(query_button)
+        self.query_label = QLabel()
+        self.result_table = QTableWidget()
+        self.result_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.result_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.result_table.verticalHeader().setVisible(False)
+        self.result_table.setToolTip('Double click a pull to plot it')
+        self.result_table.doubleClicked.connect(self.result_activated)
+        query_box_layout.addLayout(query_layout)
+        query_box_layout.addWidget(self.query_label)
+        query_box_layout.addWidget(self.result_table)
+        query_box.setLayout(query_box_layout)
+
+        main_layout.addWidget(add_box)
+        main_layout.addWidget(query_box)
+        self.setLayout(main_layout)
+        self.resize(900, 600)
+
+    def update_counts(self):
+        logs, pulls = self.library.counts()
+        self.counts_label.setText(f'{pulls} pulls from {logs} logs in the library')
+
+    def add_files_button_pressed(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, 'Add Logs', self.log_dir, 'CSV (*.csv)')
+        self.add_logs(paths)
+
+    def add_dir_button_pressed(self):
+        log_dir = QFileDialog.getExistingDirectory(self, 'Add Folder', self.log_dir)
+        if bool(log_dir):
+            self.add_logs(sorted(glob.glob(os.path.join(log_dir, '**', '*.csv'), recursive=True)))
+
+    def add_logs(self, paths: list):
+        """Add logs on a worker thread, each log is read in a process pool"""
+        if not paths or self.worker is not None:
+            return
+        self.log_dir = os.path.dirname(paths[0])
+        self.worker = QtRunner(ingest_logs, self.library_path, [os.path.abspath(x) for x in paths],
+                               self.min_throttle, self.time_filter)
+        self.worker.signals.progress.connect(self.progress_bar.setValue)
+        self.worker.signals.result.connect(self.add_finished)
+        self.worker.signals.error.connect(self.add_failed)
+        self.worker.signals.finished.connect(self.add_done)
+        self.progress_bar.setValue(0)
+        self.add_files_button.setDisabled(True)
+        self.add_dir_button.setDisabled(True)
+        self.cancel_button.setDisabled(False)
+        self.thread_pool.start(self.worker)
+
+    def cancel_button_pressed(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def add_finished(self, counts: dict):
+        self.query_label.setText(f'{counts["added"]} logs added, {counts["skipped"]} unchanged, {counts["failed"]} failed')
+
+    def add_failed(self, error: tuple):
+        e, tb = error
+        if isinstance(e, LoadCancelled):
+            self.progress_bar.setValue(0)
+            return
+        BetterExceptionDialog(e, tb, parent=self).exec_()
+
+    def add_done(self):
+        self.worker = None
+        self.add_files_button.setDisabled(False)
+        self.add_dir_button.setDisabled(False)
+        self.cancel_button.setDisabled(True)
+        self.update_counts()
+
+    def query_button_pressed(self):
+        try:
+            conditions = parse_query(self.query_input.text())
+        except ValueError as e:
+            ErrorMsg('Invalid query.', infotext=str(e), parent=self).exec_()
+            return
+        start = time.perf_counter()
+        self.result = self.library.query(conditions, limit=QUERY_LIMIT + 1)
+        elapsed = time.perf_counter() - start
+        more = len(self.result) > QUERY_LIMIT
+        self.result = self.result.iloc[:QUERY_LIMIT]
+        shown = f'first {QUERY_LIMIT}' if more else str(len(self.result))
+        self.query_label.setText(f'{shown} pulls found in {elapsed * 1000:.1f} ms')
+        self.fill_table()
+
+    def fill_table(self):
+        headers = ['Log', 'Pull', 'Start (sec)', 'Duration (sec)'] + list(self.result.columns[6:])
+        self.result_table.setSortingEnabled(False)
+        self.result_table.clear()
+        self.result_table.setColumnCount(len(headers))
+        self.result_table.setHorizontalHeaderLabels(headers)
+        self.result_table.setRowCount(len(self.result))
+        for row, values in enumerate(self.result.itertuples(index=False)):
+            log_item = QTableWidgetItem(os.path.basename(values.path))
+            log_item.setToolTip(f'{values.path}\n{values.ap_info}')
+            log_item.setData(Qt.UserRole, int(values.id))
+            self.result_table.setItem(row, 0, log_item)
+            for col, value in enumerate([values.pull, values.start, values.duration, *values[6:]], start=1):
+                item = QTableWidgetItem()
+                # numbers as data so columns sort numerically
+                if col == 1:
+                    item.setData(Qt.DisplayRole, int(value))
+                elif value is not None and not math.isnan(value):
+                    item.setData(Qt.DisplayRole, round(float(value), 2))
+                self.result_table.setItem(row, col, item)
+        self.result_table.setSortingEnabled(True)
+        self.result_table.resizeColumnsToContents()
+
+    def result_activated(self, index):
+        """Plot the double clicked pull in a non modal window, only its log is read"""
+        from plot_window import PullPlot, PullPlotStore
+        log_item = self.result_table.item(index.row(), 0)
+        pull_number = self.result_table.item(index.row(), 1).data(Qt.DisplayRole)
+        try:
+            pull = self.library.open_pull(log_item.data(Qt.UserRole))
+        except (OSError, ValueError) as e:
+            ErrorMsg('Could not open pull.', infotext=str(e), parent=self).exec_()
+            return
+        pull.datalog.set_derived(self.derived)
+        if self.plot_store is None:
+            self.plot_store = PullPlotStore()
+        # parented to the main window so plots stay open when the library is closed
+        parent = self.parentWidget() or self
+        with profiling.stage('PullPlot construction'):
+            plot = PullPlot(pull, f'{log_item.text()} Pull {pull_number}', parent=parent, backend=self.backend,
+                            store=self.plot_store)
+        plot.setAttribute(Qt.WA_DeleteOnClose)
+        plot.show()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+        super().closeEvent(event)
@@ -0,0 +1,106 @@
+import numpy as np
+from lib import KEY_COLUMNS, Pull, read_pull_channels, rpm_column
+
+"""
+Resampling one channel of pulls from any number of logs onto a common grid so they can be overlaid, i.e.
+    cache = ResampleCache()
+    grid = cache.grid(pulls, ALIGN_RPM)
+    curves = cache.resample(pulls, 'Boost (psi)', ALIGN_RPM, grid)
+Pulls are aligned on time from their start or on RPM. Every uncached curve is interpolated in a single
+np.interp call over the stacked pulls, and curves are cached per (pull, channel, alignment, grid).
+"""
+
+ALIGN_TIME = 'Time from pull start (sec)'
+ALIGN_RPM = 'RPM'
+ALIGNMENTS = [ALIGN_TIME, ALIGN_RPM]
+GRID_POINTS = 500
+MAX_CACHED = 1024
+
+
+def align_values(pull, align: str) -> np.ndarray:
+    """Returns the non decreasing x values of a pull for an alignment, NaN where they are unknown
+
+    RPM is made non decreasing with a running max so dips during a shift do not fold the curve back
+    """
+    if align == ALIGN_TIME:
+        time_values = np.asarray(pull['Time (sec)'], dtype=float)
+        return time_values - time_values[0]
+    if align != ALIGN_RPM:
+        raise ValueError(f'Unknown alignment {align}')
+    col = rpm_column(pull.columns)
+    if col is None:
+        raise KeyError('Datalog has no RPM channel')
+    return np.fmax.accumulate(np.asarray(pull[col], dtype=float))
+
+
+def interp_many(x_list: list, y_list: list, grid: np.ndarray) -> np.ndarray:
+    """Interpolates every (x, y) curve onto grid with one np.interp call, returns an (n, len(grid)) array
+
+    Each x must be non decreasing, grid points outside a curve's x range are NaN
+    """
+    result = np.full((len(x_list), len(grid)), np.nan)
+    curves = []
+    for i, (x, y) in enumerate(zip(x_list, y_list)):
+        keep = ~np.isnan(x)
+        if keep.sum() > 1:
+            curves.append((i, x[keep], np.asarray(y, dtype=float)[keep]))
+    if not curves:
+        return result
+    lows = np.array([x[0] for i, x, y in curves])
+    highs = np.array([x[-1] for i, x, y in curves])
+    # shift each curve past the previous one so the stacked x values stay sorted
+    shift = max(highs.max(), grid[-1]) - min(lows.min(), grid[0]) + 1.0
+    offsets = shift * np.arange(len(curves))
+    xp = np.concatenate([x + offset for (i, x, y), offset in zip(curves, offsets)])
+    fp = np.concatenate([y for i, x, y in curves])
+    values = np.interp((grid[None, :] + offsets[:, None]).ravel(), xp, fp).reshape(len(curves), len(grid))
+    values[(grid[None, :] < lows[:, None]) | (grid[None, :] > highs[:, None])] = np.nan
+    result[[i for i, x, y in curves]] = values
+    return result
+
+
+class ResampleCache:
+    """Resampled curves of pulls keyed by (pull, channel, alignment, grid)
+
+    Cached pulls are kept referenced so their ids stay unique, pulls that grew are resampled again
+    """
+    def __init__(self, max_cached: int = MAX_CACHED):
+        self.max_cached = max_cached
+        self._x = {}
+        self._curves = {}
+
+    def _store(self, cache: dict, key: tuple, value):
+        if len(cache) >= self.max_cached:
+            del cache[next(iter(cache))]
+        cache[key] = value
+
+    def x_values(self, pull, align: str) -> np.ndarray:
+        key = (id(pull), len(pull), align)
+        if key not in self._x:
+            self._store(self._x, key, (pull, align_values(pull, align)))
+        return self._x[key][1]
+
+    def grid(self, pulls: list, align: str, points: int = GRID_POINTS) -> np.ndarray:
+        """Evenly spaced grid covering the x range of every pull"""
+        x_list = [self.x_values(x, align) for x in pulls]
+        lows = [np.nanmin(x) for x in x_list if not np.isnan(x).all()]
+        highs = [np.nanmax(x) for x in x_list if not np.isnan(x).all()]
+        if not lows:
+            return np.zeros(0)
+        return np.linspace(min(lows), max(highs), points)
+
+    def resample(self, pulls: list, channel: str, align: str, grid: np.ndarray) -> np.ndarray:
+        """Returns an (n, len(grid)) array of channel resampled onto grid for each pull"""
+        grid_key = (grid[0], grid[-1], len(grid)) if len(grid) else ()
+        keys = [(id(x), len(x), channel, align, grid_key) for x in pulls]
+        missing = [(key, pull) for key, pull in zip(keys, pulls) if key not in self._curves]
+        if missing:
+            missing_pulls = [pull for key, pull in missing]
+            # pull DataFrames already hold their channels
+            read_pull_channels([x for x in missing_pulls if isinstance(x, Pull)],
+                               [channel] if channel not in KEY_COLUMNS else [])
+            values = interp_many([self.x_values(x, align) for x in missing_pulls],
+                                 [x[channel] for x in missing_pulls], grid)
+            for (key, pull), curve in zip(missing, values):
+                self._store(self._curves, key, (pull, curve))
+        return np.array([self._curves[key][1] for key in keys]).reshape(len(pulls), len(grid))
@@ -0,0 +1,178 @@
+from typing import Callable, Iterable
+import numpy as np
+import pyqtgraph as pg
+from matplotlib.colors import to_hex
+from lib import parse_column_name
+
+"""
+pyqtgraph implementation of the MultiPlotFigure interface for interactive work on dense logs.
+Curves are peak downsampled to the view and clipped to the visible x range by pyqtgraph itself,
+and everything is drawn by Qt's raster engine so no GPU or OpenGL is needed.
+Use the matplotlib MultiPlotFigure for publication quality figures and export.
+"""
+
+# software rendering only, antialiasing off keeps dense curves cheap to paint
+pg.setConfigOptions(useOpenGL=False, antialias=False, background='w', foreground='k')
+
+
+def float_array(values: Iterable[float]) -> np.ndarray:
+    """values as an array, float32 and float64 are kept as they are so shared arrays are not copied"""
+    values = np.asarray(values)
+    return values if values.dtype.kind == 'f' else values.astype(float)
+
+
+class PgPlotFigure(pg.PlotWidget):
+    """Same curve, axis and y limit methods as MultiPlotFigure drawn with pyqtgraph
+
+    The first unit goes on the LH axis, the second on the RH axis and further units on extra RH axes.
+    Each axis is a ViewBox sharing the x range of the LH one
+    """
+    def __init__(self, title: str = '', colors: list = None, parent=None):
+        super().__init__(parent=parent, title=title)
+        self.title = title
+        self.colors = [to_hex(x) for x in colors or ['b', 'r']]
+        self.plot_item = self.getPlotItem()
+        self.plot_item.setLabel('bottom', 'Time (sec)')
+        self.plot_item.showGrid(x=False, y=False)
+        self.legend = self.plot_item.addLegend(offset=(10, 10))
+        self._limits_listener = None
+        self.view_boxes = [self.plot_item.getViewBox()]
+        self.axis_items = [self.plot_item.getAxis('left')]
+        self.add_view_box()
+        self._plot_refs = []
+        self._plot_data = []
+        self._plot_texts = []
+        self._unit_axes = {}
+        self.plot_item.getViewBox().sigResized.connect(self.update_views)
+
+    def add_view_box(self):
+        """Add a RH axis with its own ViewBox sharing the LH x range"""
+        view_box = pg.ViewBox()
+        if len(self.view_boxes) == 1:
+            axis = self.plot_item.getAxis('right')
+            self.plot_item.showAxis('right')
+        else:
+            axis = pg.AxisItem('right')
+            self.plot_item.layout.addItem(axis, 2, len(self.view_boxes) + 1)
+        self.plot_item.scene().addItem(view_box)
+        axis.linkToView(view_box)
+        view_box.setXLink(self.plot_item)
+        self.view_boxes.append(view_box)
+        self.axis_items.append(axis)
+        if self._limits_listener is not None:
+            view_box.sigRangeChanged.connect(self._limits_changed)
+        self.update_views()
+
+    def update_views(self):
+        """Keep the RH ViewBoxes over the LH one"""
+        rect = self.plot_item.getViewBox().sceneBoundingRect()
+        for view_box in self.view_boxes[1:]:
+            view_box.setGeometry(rect)
+            view_box.linkedViewChanged(self.plot_item.getViewBox(), view_box.XAxis)
+
+    @property
+    def axes_count(self) -> int:
+        return len(self.view_boxes)
+
+    def unit_axis(self, unit: str) -> int:
+        """Return the axis index of a unit, taking the next free axis or adding a RH axis"""
+        if unit in self._unit_axes:
+            return self._unit_axes[unit]
+        used = set(self._unit_axes.values())
+        free = [i for i in range(len(self.view_boxes)) if i not in used]
+        if not free:
+            self.add_view_box()
+            free = [len(self.view_boxes) - 1]
+        self._unit_axes[unit] = free[0]
+        self.axis_items[free[0]].show()
+        return free[0]
+
+    def axis_label(self, axis: int) -> str:
+        """y label of an axis, the channel name for a single curve and the unit when curves share it"""
+        texts = [text for (curve, i), text in zip(self._plot_refs, self._plot_texts) if curve is not None and i == axis]
+        if len(texts) == 1:
+            return texts[0]
+        unit = [u for u, i in self._unit_axes.items() if i == axis]
+        return unit[0] if unit else ''
+
+    def plot_index(self, xdata: Iterable[float], ydata: Iterable[float], fig_num: int, y_text: str = '',
+                   legend_text: str = '', unit: str = None):
+        """Add curve to figure by index, see MultiPlotFigure.plot_index"""
+        if unit is None:
+            unit = parse_column_name(y_text)['unit'] or y_text
+        while len(self._plot_refs) <= fig_num:
+            self._plot_refs.append((None, None))
+            self._plot_data.append(None)
+            self._plot_texts.append('')
+        curve, axis = self._plot_refs[fig_num]
+        if curve is None:
+            axis = self.unit_axis(unit)
+            xdata = float_array(xdata)
+            curve = pg.PlotDataItem(pen=pg.mkPen(self.colors[fig_num % len(self.colors)]))
+            # pyqtgraph decimates to the view width and skips points outside the x range
+            curve.setDownsampling(auto=True, method='peak')
+            curve.setClipToView(True)
+            self.view_boxes[axis].addItem(curve)
+            self._plot_refs[fig_num] = (curve, axis)
+            self._plot_texts[fig_num] = y_text
+        else:
+            xdata = self._plot_data[fig_num][0] if xdata is None else float_array(xdata)
+        ydata = float_array(ydata)
+        self._plot_data[fig_num] = (xdata, ydata)
+        curve.setData(xdata, ydata)
+        self.axis_items[axis].setLabel(self.axis_label(axis))
+        if bool(legend_text) and curve.name() != legend_text:
+            self.legend.removeItem(curve)
+            curve.opts['name'] = legend_text
+            self.legend.addItem(curve, legend_text)
+
+    def clear_plot(self, fig_num: int):
+        """Remove curve from figure at given index, -1 removes every curve"""
+        indices = range(len(self._plot_refs)) if fig_num == -1 else [fig_num]
+        for i in indices:
+            curve, axis = self._plot_refs[i]
+            if curve is None:
+                continue
+            self.legend.removeItem(curve)
+            self.view_boxes[axis].removeItem(curve)
+            self._plot_refs[i] = (None, None)
+            self._plot_data[i] = None
+            if all(x != axis for c, x in self._plot_refs):
+                # free the axis for the next unit
+                self._unit_axes = {u: x for u, x in self._unit_axes.items() if x != axis}
+                self.axis_items[axis].setLabel('')
+                if axis > 1:
+                    self.axis_items[axis].hide()
+            else:
+                self.axis_items[axis].setLabel(self.axis_label(axis))
+        for view_box in self.view_boxes:
+            view_box.enableAutoRange(axis=pg.ViewBox.YAxis)
+
+    def get_ylim(self, axis: int) -> tuple:
+        return tuple(self.view_boxes[axis].viewRange()[1])
+
+    def set_ylim(self, axis: int, bottom: float, top: float):
+        self.view_boxes[axis].setYRange(bottom, top, padding=0)
+
+    def get_xlim(self) -> tuple:
+        return tuple(self.plot_item.viewRange()[0])
+
+    def set_xlim(self, left: float, right: float):
+        self.plot_item.setXRange(left, right, padding=0)
+
+    def request_draw(self, curves_only: bool = False):
+        """pyqtgraph repaints on its own, kept for the MultiPlotFigure interface"""
+        self.update()
+
+    def connect_limits_changed(self, fn: Callable):
+        """Call fn whenever the view limits of any axis change"""
+        self._limits_listener = fn
+        for view_box in self.view_boxes:
+            view_box.sigRangeChanged.connect(self._limits_changed)
+
+    def _limits_changed(self, *args):
+        self._limits_listener()
+
+    def create_toolbar(self, parent=None):
+        """pyqtgraph pans and zooms with the mouse and exports from its context menu, there is no toolbar"""
+        return None
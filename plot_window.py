@@ -0,0 +1,783 @@
+import importlib.util
+import math
+from types import MappingProxyType
+from typing import Callable, Iterable, Union
+import matplotlib
+matplotlib.use('Qt5Agg')
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QCheckBox, QComboBox, QDialog, QFormLayout, QGroupBox, QHBoxLayout, QLabel, QListWidget,
+        QListWidgetItem, QPushButton, QSizePolicy, QVBoxLayout, QWidget)
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
+from lib import Pull, minmax_decimate, parse_column_name, rpm_column
+from figure_export import (LEGEND_BEST_CURVES, PLOT_COLORS, add_offset_axis, fit_extra_axes, legend_axes, setup_axes,
+        style_axes)
+from overlay import ALIGN_RPM, ALIGNMENTS, ResampleCache
+from widgets import BetterScrollArea, DoubleLineEdit
+import profiling
+
+CURVE_COLORS = PLOT_COLORS
+# matplotlib for publication quality figures, pyqtgraph for smooth pan and zoom on dense logs
+PLOT_BACKENDS = ['matplotlib', 'pyqtgraph']
+
+
+def available_backends() -> list:
+    """Plot backends that can be used here, pyqtgraph is optional"""
+    return [x for x in PLOT_BACKENDS if x != 'pyqtgraph' or importlib.util.find_spec('pyqtgraph') is not None]
+
+
+def create_figure(title: str = '', backend: str = 'matplotlib'):
+    """Return a MultiPlotFigure or a pg_figure.PgPlotFigure, both have the same curve and y limit methods"""
+    if backend == 'pyqtgraph':
+        from pg_figure import PgPlotFigure
+        return PgPlotFigure(title=title, colors=CURVE_COLORS)
+    if backend != 'matplotlib':
+        raise ValueError(f'Unknown plot backend {backend}')
+    return MultiPlotFigure(title=title)
+
+
+class MultiPlotFigure(FigureCanvasQTAgg):
+    """Extension of FigureCanvasQTAgg with shorthand methods to ease dynamic plotting
+
+    Any number of curves can be plotted, curves sharing a unit share a y axis. The first unit goes on the
+    LH axis, the second on the RH axis and further units on extra RH axes offset outward.
+    Curves are min/max decimated to the visible x range and canvas width, and resampled whenever
+    the x limits change (toolbar pan/zoom) or the canvas is resized.
+    Redraws go through request_draw, which merges requests into one draw_idle and blits
+    curve only updates over the background cached at the last full draw. A curve added without
+    changing any axis is drawn alone over a cached image of the other curves, so adding the tenth
+    curve costs about the same as adding the second
+    """
+    def __init__(self, title: str = '', parent=None):
+        fig = Figure()
+        self.title = title
+        super().__init__(fig)
+        self.axes_refs = setup_axes(fig, title)
+        [self.axes, self.axes2] = self.axes_refs
+        self._base_right = fig.subplotpars.right
+        self._plot_refs = []
+        self._plot_data = []
+        self._plot_units = []
+        self._plot_texts = []
+        self._unit_axes = {}
+        self._legend = None
+        self._lod_view = None
+        self._legend_labels = ()
+        self._background = None
+        self._curves_background = None
+        self._blit_pending = False
+        self._blit_added = []
+        self._blit_all = False
+        self.colors = CURVE_COLORS
+        self.connect_lod()
+        self.mpl_connect('resize_event', self.update_lod)
+        self.mpl_connect('draw_event', self.cache_background)
+
+    def connect_lod(self):
+        """Resample curves when x limits change, cla() drops axes callbacks so call this after clearing"""
+        for ax in self.axes_refs:
+            ax.callbacks.connect('xlim_changed', self.update_lod)
+
+    def lod_data(self, fig_num: int) -> tuple:
+        """Return decimated x/y data of curve at fig_num for the current view"""
+        xdata, ydata = self._plot_data[fig_num]
+        x_min, x_max = self.axes.get_xlim()
+        return minmax_decimate(xdata, ydata, x_min, x_max, self.axes.bbox.width)
+
+    def update_lod(self, *args):
+        """Resample every curve for the current x limits and canvas width"""
+        view = (self.axes.get_xlim(), self.axes.bbox.width)
+        if view == self._lod_view:
+            return
+        self._lod_view = view
+        for i in range(len(self._plot_refs)):
+            if self._plot_refs[i] is not None:
+                self._plot_refs[i].set_data(*self.lod_data(i))
+
+    def draw(self):
+        with profiling.stage('figure draw'):
+            super().draw()
+
+    @property
+    def axes_count(self) -> int:
+        return len(self.axes_refs)
+
+    def get_ylim(self, axis: int) -> tuple:
+        return self.axes_refs[axis].get_ylim()
+
+    def set_ylim(self, axis: int, bottom: float, top: float):
+        self.axes_refs[axis].set_ylim(bottom=bottom, top=top)
+        self.request_draw()
+
+    def get_xlim(self) -> tuple:
+        return tuple(self.axes.get_xlim())
+
+    def set_xlim(self, left: float, right: float):
+        self.axes.set_xlim(left, right)
+        self.request_draw()
+
+    def connect_limits_changed(self, fn: Callable):
+        """Call fn after every draw, limits only change through a draw"""
+        self.mpl_connect('draw_event', lambda event: fn())
+
+    def create_toolbar(self, parent=None):
+        """Navigation toolbar for pan, zoom and saving the figure"""
+        toolbar = NavigationToolbar(self, parent)
+        unwanted_btns = ['Subplots']
+        for x in toolbar.actions():
+            if x.text() in unwanted_btns:
+                toolbar.removeAction(x)
+        return toolbar
+
+    def cache_background(self, event=None):
+        """Store the figure without curves for blitting then draw the curves on top"""
+        renderer = self.get_renderer() if event is None else event.renderer
+        # savefig to svg or pdf swaps in another canvas, there is no buffer to cache then
+        on_screen = self.figure.canvas is self
+        self._background = self.copy_from_bbox(self.figure.bbox) if on_screen else None
+        self.draw_curves(renderer)
+        self._curves_background = self.copy_from_bbox(self.figure.bbox) if on_screen else None
+        self.draw_legend(renderer)
+
+    def draw_curves(self, renderer=None):
+        """Draw the animated curves onto the current canvas buffer"""
+        renderer = self.get_renderer() if renderer is None else renderer
+        for line in self._plot_refs:
+            if line is not None:
+                line.draw(renderer)
+
+    def draw_legend(self, renderer=None):
+        if self._legend is not None:
+            self._legend.draw(self.get_renderer() if renderer is None else renderer)
+
+    def request_draw(self, curves_only: bool = False, added=None):
+        """Schedule a redraw, pass curves_only when nothing but curve data or the legend changed since the last draw
+
+        added is a curve that was only added since, it is drawn over the cached image of the other curves
+        """
+        if curves_only and self._background is not None:
+            if added is None:
+                self._blit_all = True
+            else:
+                self._blit_added.append(added)
+            if not self._blit_pending:
+                self._blit_pending = True
+                QTimer.singleShot(0, self.blit_curves)
+        else:
+            # draw_idle merges repeated requests into a single draw
+            self._background = None
+            self._curves_background = None
+            self._blit_added = []
+            self._blit_all = False
+            self.draw_idle()
+
+    def blit_curves(self):
+        """Restore the cached background and redraw only the curves"""
+        self._blit_pending = False
+        added = [x for x in self._blit_added if x in self._plot_refs]
+        self._blit_added = []
+        if self._background is None:
+            # a full draw was requested meanwhile and will draw the curves
+            return
+        if self._blit_all or self._curves_background is None:
+            self.restore_region(self._background)
+            self.draw_curves()
+        else:
+            self.restore_region(self._curves_background)
+            for line in added:
+                line.draw(self.get_renderer())
+        self._blit_all = False
+        self._curves_background = self.copy_from_bbox(self.figure.bbox)
+        self.draw_legend()
+        self.blit(self.figure.bbox)
+
+    def update_legend(self):
+        """Rebuild the legend, only when the curve labels changed"""
+        labels = tuple(x.get_label() for x in self._plot_refs if x is not None)
+        if labels == self._legend_labels:
+            return
+        self._legend_labels = labels
+        if self._legend is not None:
+            self._legend.remove()
+            self._legend = None
+        if any(not x.startswith('_') for x in labels):
+            # finding the best spot gets slow with many curves
+            self._legend = legend_axes(self.axes_refs, loc=0 if len(labels) <= LEGEND_BEST_CURVES else 'upper left')
+            # drawn over the curves with them, so a new label does not need a full draw
+            self._legend.set_animated(True)
+
+    def unit_axis(self, unit: str):
+        """Return the axis of a unit, taking the next free axis or adding an offset RH axis"""
+        if unit in self._unit_axes:
+            return self._unit_axes[unit]
+        used = list(self._unit_axes.values())
+        free = [x for x in self.axes_refs if all(x is not y for y in used)]
+        if free:
+            ax = free[0]
+            ax.set_visible(True)
+        else:
+            ax = add_offset_axis(self.axes_refs)
+            ax.callbacks.connect('xlim_changed', self.update_lod)
+            self.fit_extra_axes()
+        self._unit_axes[unit] = ax
+        return ax
+
+    def fit_extra_axes(self):
+        """Make room on the right for the offset RH axes"""
+        fit_extra_axes(self.figure, self.axes_refs, self._base_right)
+
+    def axis_label(self, ax) -> str:
+        """y label of an axis, the channel name for a single curve and the unit when curves share it"""
+        texts = [text for line, text in zip(self._plot_refs, self._plot_texts) if line is not None and line.axes is ax]
+        if len(texts) == 1:
+            return texts[0]
+        unit = [u for u, x in self._unit_axes.items() if x is ax]
+        return unit[0] if unit else ''
+
+    def plot_index(self, xdata: Iterable[float], ydata: Iterable[float], fig_num: int, y_text: str = '',
+                   legend_text: str = '', unit: str = None):
+        """Add curve to figure by index
+        Arguments:
+        xdata -- x values to plot
+        ydata -- y values to ploy
+        fig_num -- index of the curve, replaces the data of a curve already at that index
+                   and keeps its x values when xdata is None
+        Keyword Arguments:
+        y_text -- y axis title, defaults to empty string
+        legend_text -- nomenclature of curve in the legend, defaults to empty str
+        unit -- curves with the same unit share a y axis, defaults to the unit in y_text or y_text itself
+        """
+        if unit is None:
+            unit = parse_column_name(y_text)['unit'] or y_text
+        while len(self._plot_refs) <= fig_num:
+            self._plot_refs.append(None)
+            self._plot_data.append(None)
+            self._plot_units.append(None)
+            self._plot_texts.append('')
+        added = None
+        if self._plot_refs[fig_num] is None:
+            new_axis = unit not in self._unit_axes
+            current_ax = self.unit_axis(unit)
+            self._plot_data[fig_num] = (np.asarray(xdata), np.asarray(ydata))
+            x_full = self._plot_data[fig_num][0]
+            first = all(x is None for x in self._plot_refs)
+            if first and len(x_full) > 1:
+                # first curve sets the view, decimate over its full range
+                self.axes.set_xlim(x_full[0], x_full[-1])
+            self._lod_view = None
+            color = self.colors[fig_num % len(self.colors)]
+            self._plot_refs[fig_num] = current_ax.plot(*self.lod_data(fig_num), color, animated=True)[0]
+            self._plot_units[fig_num] = unit
+            self._plot_texts[fig_num] = y_text
+            # a curve joining an axis only needs drawing when its limits stay put
+            ylim = current_ax.get_ylim()
+            if current_ax.get_autoscaley_on():
+                current_ax.relim()
+                current_ax.autoscale_view(scalex=False)
+            curves_only = not (first or new_axis) and current_ax.get_ylim() == ylim
+            added = self._plot_refs[fig_num]
+        else:
+            current_ax = self._plot_refs[fig_num].axes
+            old_x = self._plot_data[fig_num][0]
+            new_x = old_x if xdata is None else np.asarray(xdata)
+            self._plot_data[fig_num] = (new_x, np.asarray(ydata))
+            x_min, x_max = self.axes.get_xlim()
+            if len(old_x) and len(new_x) > len(old_x) and x_max >= old_x[-1]:
+                # view was showing the end of a growing curve, keep following it
+                self.axes.set_xlim(x_min, new_x[-1])
+                self._plot_refs[fig_num].set_data(*self.lod_data(fig_num))
+                if current_ax.get_autoscaley_on():
+                    current_ax.relim()
+                    current_ax.autoscale_view(scalex=False)
+                curves_only = False
+            else:
+                self._plot_refs[fig_num].set_data(*self.lod_data(fig_num))
+                curves_only = True
+        y_label = self.axis_label(current_ax)
+        if current_ax.get_ylabel() != y_label:
+            current_ax.set_ylabel(y_label)
+            curves_only = False
+        if bool(legend_text) and self._plot_refs[fig_num].get_label() != legend_text:
+            self._plot_refs[fig_num].set_label(legend_text)
+        # the legend is drawn after the curves so a new label does not need them redrawn
+        self.update_legend()
+        self.request_draw(curves_only, added)
+
+    def clear_plot(self, fig_num: int):
+        """Remove curve from figure at given index, -1 removes every curve"""
+        if fig_num != -1 and sum(x is not None for x in self._plot_refs) <= 1:
+            fig_num = -1
+        if fig_num != -1:
+            # Clear one plot
+            line = self._plot_refs[fig_num]
+            if line is None:
+                return
+            ax = line.axes
+            line.remove()
+            self._plot_refs[fig_num] = None
+            self._plot_data[fig_num] = None
+            self._plot_units[fig_num] = None
+            if not any(x is not None and x.axes is ax for x in self._plot_refs):
+                # free the axis for the next unit
+                self._unit_axes = {u: x for u, x in self._unit_axes.items() if x is not ax}
+                if ax is self.axes or ax is self.axes2:
+                    ax.cla()
+                    self.connect_lod()
+                    if ax is self.axes:
+                        # cla took the legend with it
+                        self._legend = None
+                        style_axes(self.axes, self.title)
+                else:
+                    # cla would reset the offset spine, hide it until another unit needs it
+                    ax.set_ylabel('')
+                    ax.set_visible(False)
+            elif ax.get_ylabel() == self.axis_label(ax):
+                # the axes are unchanged, redraw the remaining curves over the background
+                self._legend_labels = None
+                self.update_legend()
+                self.request_draw(curves_only=True)
+                return
+            else:
+                ax.set_ylabel(self.axis_label(ax))
+        else:
+            # Clear all plots
+            for ax in self.axes_refs[2:]:
+                ax.remove()
+            self.axes_refs = self.axes_refs[:2]
+            for ax in self.axes_refs:
+                ax.cla()
+            self._plot_refs = []
+            self._plot_data = []
+            self._plot_units = []
+            self._plot_texts = []
+            self._unit_axes = {}
+            self._legend = None
+            self.fit_extra_axes()
+            self.connect_lod()
+            style_axes(self.axes, self.title)
+        self._legend_labels = None
+        self.update_legend()
+        self.axes2.yaxis.set_label_position('right')
+        self.request_draw()
+
+
+class PullPlotStore:
+    """Read-only pull arrays and column metadata shared by every PullPlot opened with it
+
+    Each channel is converted to a float array once per pull and marked read-only, float channels (float32
+    in compact mode) are views of the pull itself, so another window on the same pulls adds no copies of the data. Arrays are
+    dropped once the last window using their pull closes. Windows with link_xlim checked zoom together,
+    aligned on the start of their pulls
+    """
+    def __init__(self):
+        self._column_names = {}
+        self._values = {}
+        self._users = {}
+        self._linked = []
+        self._syncing = False
+        self.linked_xlim = None
+
+    def column_names(self, columns: list) -> MappingProxyType:
+        """parse_column_name of every channel but Time (sec), parsed once per set of columns"""
+        key = tuple(columns)
+        if key not in self._column_names:
+            self._column_names[key] = MappingProxyType(
+                {col: MappingProxyType(parse_column_name(col)) for col in columns if col != 'Time (sec)'})
+        return self._column_names[key]
+
+    def values(self, pull: Union[pd.DataFrame, Pull], col: str) -> np.ndarray:
+        """Read-only values of a channel of pull, rebuilt when the pull grew"""
+        key = (id(pull), col)
+        values = self._values.get(key)
+        if values is None or len(values) != len(pull):
+            values = np.asarray(pull[col])
+            if values.dtype.kind != 'f':
+                try:
+                    values = values.astype(float)
+                except (TypeError, ValueError):
+                    # text channels are plotted as categories
+                    pass
+            values = values.view()
+            values.flags.writeable = False
+            if id(pull) in self._users:
+                self._values[key] = values
+        return values
+
+    def acquire(self, pull: Union[pd.DataFrame, Pull]):
+        """Count a window using pull, the pull is held so its id stays unique while arrays are cached"""
+        user = self._users.setdefault(id(pull), [pull, 0])
+        user[1] += 1
+
+    def release(self, pull: Union[pd.DataFrame, Pull]):
+        user = self._users.get(id(pull))
+        if user is None:
+            return
+        user[1] -= 1
+        if user[1] <= 0:
+            del self._users[id(pull)]
+            self._values = {k: v for k, v in self._values.items() if k[0] != id(pull)}
+
+    def link(self, plot):
+        if plot not in self._linked:
+            self._linked.append(plot)
+
+    def unlink(self, plot):
+        if plot in self._linked:
+            self._linked.remove(plot)
+        if not self._linked:
+            self.linked_xlim = None
+
+    def xlim_changed(self, sender, xlim: tuple):
+        """Apply x limits relative to pull start of one linked window to the others"""
+        if self._syncing or sender not in self._linked:
+            return
+        if self.linked_xlim is not None and all(math.isclose(a, b, abs_tol=1e-6) for a, b in zip(xlim, self.linked_xlim)):
+            return
+        self.linked_xlim = xlim
+        self._syncing = True
+        try:
+            for plot in self._linked:
+                if plot is not sender:
+                    plot.set_relative_xlim(xlim)
+        finally:
+            self._syncing = False
+
+
+class PullPlot(QDialog):
+    """Dialog with a figure canvas and list of selectable curves to plot
+
+    Channel arrays and column metadata come from store, pass the same PullPlotStore to every window so
+    they share them. The dialog can be shown non modal
+    """
+    # fig_title: str
+    # x_values: np.ndarray
+    # df: pd.DataFrame or Pull
+    # store: PullPlotStore
+    # col_names: MappingProxyType
+    # active_plots: list
+    # axis_selector: QComboBox
+    # ymin_input: DoubleLineEdit
+    # ymax_input: DoubleLineEdit
+    # link_checkbox: QCheckBox
+    # col_checkboxes: list[QCheckBox]
+    # plot_widget: MultiPlotFigure or PgPlotFigure
+
+    def __init__(self, df: Union[pd.DataFrame, Pull], fig_title: str, parent=None, backend: str = 'matplotlib',
+                 store: PullPlotStore = None):
+        super().__init__(parent)
+        self.fig_title = fig_title
+        self.backend = backend
+        self.setWindowTitle(fig_title)
+        self.store = PullPlotStore() if store is None else store
+        self.df = df
+        self.store.acquire(df)
+        # channels of a Pull are only read from the log once they are checked
+        self.x_values = self.store.values(df, 'Time (sec)')
+        self.col_names = self.store.column_names(df.columns)
+        self.active_plots = []
+        self._shown_ylim = None
+        self.create_main_layout()
+        self.finished.connect(self.plot_finished)
+
+    def create_main_layout(self):
+        """Populate dialog with widgets"""
+        # higher level layout 
+        main_layout = QHBoxLayout()
+        left_highlevel_widget = QWidget()
+        left_highlevel_layout = QVBoxLayout()
+        left_layout = QGroupBox('Curves')
+        left_layout.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Preferred)
+        left_wrap_layout = QVBoxLayout()
+        # scroll area content
+        left_scrollbox_layout = QVBoxLayout()
+        left_scrollbox = BetterScrollArea()
+        scroll_content = QWidget()
+        # populate scroll area content
+        self.col_checkboxes = [QCheckBox(col) for col in self.col_names.keys()]
+        [x.stateChanged.connect(self.curve_checkbox_changed) for x in self.col_checkboxes]
+        [left_scrollbox_layout.addWidget(x) for x in self.col_checkboxes]
+        # finish scroll area setup
+        scroll_content.setLayout(left_scrollbox_layout)
+        left_scrollbox.setWidget(scroll_content)
+        left_wrap_layout.addWidget(left_scrollbox)
+        # left axes options
+        left_opts_widget = QGroupBox('Options')
+        left_opts_layout = QFormLayout()
+        # axis selector
+        self.axis_selector = QComboBox()
+        self.axis_selector.addItems(['LH Axis', 'RH Axis'])
+        left_opts_layout.addRow('Axis', self.axis_selector)
+        # y max input
+        self.ymax_input = DoubleLineEdit(-1000000, 1000000, 3)
+        self.ymax_input.setText('1')
+        left_opts_layout.addRow('Y Max', self.ymax_input)
+        # y min input
+        self.ymin_input = DoubleLineEdit(-1000000, 1000000, 3)
+        self.ymin_input.setText('0')
+        left_opts_layout.addRow('Y Min', self.ymin_input)
+        # x zoom link
+        self.link_checkbox = QCheckBox('Link X Zoom')
+        self.link_checkbox.setToolTip('Pan and zoom together with other linked pulls, aligned on pull start')
+        left_opts_layout.addRow(self.link_checkbox)
+        # finalize left layout
+        left_opts_widget.setLayout(left_opts_layout)
+        left_opts_widget.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
+        left_layout.setLayout(left_wrap_layout)
+        left_layout.updateGeometry()
+        left_highlevel_layout.addWidget(left_layout)
+        left_highlevel_layout.addWidget(left_opts_widget)
+        left_highlevel_widget.setLayout(left_highlevel_layout)
+        left_highlevel_widget.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Preferred)
+        # right plot area
+        right_widget = QWidget()
+        right_layout = QVBoxLayout()
+        self.plot_widget = create_figure(self.fig_title, self.backend)
+        toolbar = self.plot_widget.create_toolbar(self)
+        if toolbar is not None:
+            right_layout.addWidget(toolbar)
+        right_layout.addWidget(self.plot_widget)
+        right_widget.setLayout(right_layout)
+        # finish setting up high level layout
+        main_layout.addWidget(left_highlevel_widget)
+        main_layout.addWidget(right_widget)
+        self.setLayout(main_layout)
+        self.updateGeometry()
+        # bind functions
+        self.axis_selector.activated.connect(self.axis_selector_changed)
+        self.ymin_input.editingFinished.connect(self.ylim_input_changed)
+        self.ymax_input.editingFinished.connect(self.ylim_input_changed)
+        self.link_checkbox.stateChanged.connect(self.link_checkbox_changed)
+        self.plot_widget.connect_limits_changed(self.draw_event_called)
+
+    def plot_finished(self):
+        """Let the store drop arrays no other window uses"""
+        self.store.unlink(self)
+        self.store.release(self.df)
+
+    def refresh_pull(self):
+        """Update plotted curves after the pull grew, used while watching a log that is being written"""
+        self.x_values = self.store.values(self.df, 'Time (sec)')
+        for i, col in enumerate(self.active_plots):
+            if col is not None:
+                self.plot_widget.plot_index(self.x_values, self.store.values(self.df, col), i)
+
+    @property
+    def pull_start(self) -> float:
+        return float(self.x_values[0]) if len(self.x_values) else 0.0
+
+    def set_relative_xlim(self, xlim: tuple):
+        """Set x limits given relative to pull start, used by linked windows"""
+        if any(self.active_plots):
+            self.plot_widget.set_xlim(xlim[0] + self.pull_start, xlim[1] + self.pull_start)
+
+    def link_checkbox_changed(self):
+        if self.link_checkbox.isChecked():
+            self.store.link(self)
+            if self.store.linked_xlim is not None:
+                self.set_relative_xlim(self.store.linked_xlim)
+            else:
+                self.xlim_changed()
+        else:
+            self.store.unlink(self)
+
+    def xlim_changed(self):
+        """Pass the shown x limits on to linked windows"""
+        if self.link_checkbox.isChecked() and any(self.active_plots):
+            left, right = self.plot_widget.get_xlim()
+            self.store.xlim_changed(self, (left - self.pull_start, right - self.pull_start))
+
+    def update_axis_selector(self):
+        """List every y axis of the figure, keeping the selected one when it is still there"""
+        names = ['LH Axis', 'RH Axis'] + [f'RH Axis {i}' for i in range(2, self.plot_widget.axes_count)]
+        if names != [self.axis_selector.itemText(i) for i in range(self.axis_selector.count())]:
+            current = self.axis_selector.currentIndex()
+            self.axis_selector.clear()
+            self.axis_selector.addItems(names)
+            self.axis_selector.setCurrentIndex(current if 0 <= current < len(names) else 0)
+
+    def axis_selector_changed(self):
+        """Update displayed y axis min/max values"""
+        formspec = '{:.2f}'
+        i = self.axis_selector.currentIndex()
+        axis_limits = self.plot_widget.get_ylim(i)
+        self._shown_ylim = axis_limits
+        self.ymax_input.setText(formspec.format(axis_limits[1]))
+        self.ymin_input.setText(formspec.format(axis_limits[0]))
+
+    def ylim_input_changed(self, input_text: str = ''):
+        """Update y axis limits per user input"""
+        # pull user input values
+        self.ymax_input.validate_input()
+        self.ymin_input.validate_input()
+        new_ymax = self.ymax_input.value()
+        new_ymin = self.ymin_input.value()
+        # get axis reference and update limits
+        i = self.axis_selector.currentIndex()
+        self.plot_widget.set_ylim(i, new_ymin, new_ymax)
+
+    def draw_event_called(self, *arg):
+        """Call axis_selector_changed to update displayed axis limits when they were altered by the draw"""
+        i = self.axis_selector.currentIndex()
+        if i >= self.plot_widget.axes_count:
+            self.update_axis_selector()
+            i = self.axis_selector.currentIndex()
+        axis_limits = self.plot_widget.get_ylim(i)
+        if axis_limits != self._shown_ylim:
+            self.axis_selector_changed()
+        self.xlim_changed()
+
+    def curve_checkbox_changed(self):
+        """Update figure when user selects/deselects a variable"""
+        current_widget = self.sender()
+        requested_plot = current_widget.text()
+        if current_widget.isChecked():
+            # Add an additional plot in the first free slot, channels sharing a unit share an axis
+            first = not any(self.active_plots)
+            if None in self.active_plots:
+                plot_index = self.active_plots.index(None)
+                self.active_plots[plot_index] = requested_plot
+            else:
+                plot_index = len(self.active_plots)
+                self.active_plots.append(requested_plot)
+            self.plot_widget.plot_index(self.x_values, self.store.values(self.df, requested_plot), plot_index,
+                                        y_text=requested_plot, legend_text=self.col_names[requested_plot]['name'])
+            if first and self.link_checkbox.isChecked() and self.store.linked_xlim is not None:
+                # the first curve resets the view, keep the zoom of the linked windows instead
+                self.set_relative_xlim(self.store.linked_xlim)
+        elif requested_plot in self.active_plots:
+            # Removing a plot
+            plot_index = self.active_plots.index(requested_plot)
+            self.active_plots[plot_index] = None
+            if not any(self.active_plots):
+                self.active_plots = []
+            self.plot_widget.clear_plot(plot_index)
+        self.update_axis_selector()
+        self.axis_selector_changed()  # update axis limits on change
+
+
+OVERLAY_STYLES = ['-', '--', ':', '-.']
+
+
+class OverlayPlot(QDialog):
+    """Dialog overlaying one channel of pulls picked from several logs, aligned on time from pull start or RPM
+
+    Curves are resampled onto a common grid through a ResampleCache so changing the selection only
+    resamples new pulls, and line artists are reused so redraws stay quick with many curves
+    """
+    def __init__(self, logs: list, parent=None):
+        """logs is a list of (name, pulls) of every log to pick pulls from"""
+        super().__init__(parent)
+        self.setWindowTitle('Overlay Pulls')
+        self.logs = logs
+        self.cache = ResampleCache()
+        self._lines = []
+        self.create_main_layout()
+
+    def create_main_layout(self):
+        main_layout = QHBoxLayout()
+        left_widget = QWidget()
+        left_layout = QVBoxLayout()
+        pulls_box = QGroupBox('Pulls')
+        pulls_box_layout = QVBoxLayout()
+        self.pull_list = QListWidget()
+        for log_i, (name, pulls) in enumerate(self.logs):
+            for pull_i in range(len(pulls)):
+                item = QListWidgetItem(f'{name} Pull {pull_i + 1}')
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Unchecked)
+                item.setData(Qt.UserRole, (log_i, pull_i))
+                self.pull_list.addItem(item)
+        clear_button = QPushButton('Clear')
+        clear_button.clicked.connect(self.clear_button_pressed)
+        pulls_box_layout.addWidget(self.pull_list)
+        pulls_box_layout.addWidget(clear_button)
+        pulls_box.setLayout(pulls_box_layout)
+        opts_box = QGroupBox('Options')
+        opts_box_layout = QFormLayout()
+        self.channel_picker = QComboBox()
+        channels = []
+        for name, pulls in self.logs:
+            if pulls:
+                channels += [x for x in pulls[0].columns if x != 'Time (sec)' and x not in channels]
+        self.channel_picker.addItems(channels)
+        self.align_picker = QComboBox()
+        self.align_picker.addItems(ALIGNMENTS)
+        self.skipped_label = QLabel()
+        opts_box_layout.addRow('Channel', self.channel_picker)
+        opts_box_layout.addRow('Align', self.align_picker)
+        opts_box_layout.addRow(self.skipped_label)
+        opts_box.setLayout(opts_box_layout)
+        opts_box.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
+        left_layout.addWidget(pulls_box)
+        left_layout.addWidget(opts_box)
+        left_widget.setLayout(left_layout)
+        left_widget.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Preferred)
+        right_widget = QWidget()
+        right_layout = QVBoxLayout()
+        self.canvas = FigureCanvasQTAgg(Figure())
+        self.axes = self.canvas.figure.add_subplot(111)
+        self.canvas.figure.tight_layout(pad=3)
+        toolbar = NavigationToolbar(self.canvas, self)
+        right_layout.addWidget(toolbar)
+        right_layout.addWidget(self.canvas)
+        right_widget.setLayout(right_layout)
+        main_layout.addWidget(left_widget)
+        main_layout.addWidget(right_widget)
+        self.setLayout(main_layout)
+        self.pull_list.itemChanged.connect(self.update_curves)
+        self.channel_picker.activated.connect(self.update_curves)
+        self.align_picker.activated.connect(self.update_curves)
+
+    def clear_button_pressed(self):
+        self.pull_list.blockSignals(True)
+        for i in range(self.pull_list.count()):
+            self.pull_list.item(i).setCheckState(Qt.Unchecked)
+        self.pull_list.blockSignals(False)
+        self.update_curves()
+
+    def checked_pulls(self) -> list:
+        """Returns (label, pull) of every checked pull"""
+        result = []
+        for i in range(self.pull_list.count()):
+            item = self.pull_list.item(i)
+            if item.checkState() == Qt.Checked:
+                log_i, pull_i = item.data(Qt.UserRole)
+                result.append((item.text(), self.logs[log_i][1][pull_i]))
+        return result
+
+    def update_curves(self, *args):
+        """Resample the checked pulls onto a common grid and redraw"""
+        channel = self.channel_picker.currentText()
+        align = self.align_picker.currentText()
+        checked = self.checked_pulls()
+        usable = [(label, pull) for label, pull in checked
+                  if channel in pull.columns and (align != ALIGN_RPM or rpm_column(pull.columns) is not None)]
+        skipped = len(checked) - len(usable)
+        self.skipped_label.setText(f'{skipped} pulls lack {channel} or RPM' if skipped else '')
+        with profiling.stage('overlay resample'):
+            pulls = [pull for label, pull in usable]
+            grid = self.cache.grid(pulls, align) if pulls else np.zeros(0)
+            curves = self.cache.resample(pulls, channel, align, grid) if len(grid) else np.zeros((0, 0))
+        # reuse line artists, only add or remove the difference
+        while len(self._lines) > len(usable):
+            self._lines.pop().remove()
+        while len(self._lines) < len(usable):
+            # the color cycle repeats every 10 curves, vary the line style so curves stay distinct
+            style = OVERLAY_STYLES[len(self._lines) // 10 % len(OVERLAY_STYLES)]
+            self._lines.append(self.axes.plot([], [], linestyle=style)[0])
+        for line, (label, pull), curve in zip(self._lines, usable, curves):
+            line.set_data(grid, curve)
+            line.set_label(label)
+        self.axes.set_xlabel(align)
+        self.axes.set_ylabel(channel)
+        self.axes.relim()
+        self.axes.autoscale_view()
+        legend = self.axes.get_legend()
+        if legend is not None:
+            legend.remove()
+        if usable:
+            self.axes.legend(loc=0, fontsize='small', ncol=max(1, len(usable) // 12 + 1))
+        self.canvas.draw_idle()
+
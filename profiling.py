@@ -0,0 +1,126 @@
+import cProfile
+import functools
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+from logging.handlers import RotatingFileHandler
+from typing import Callable
+
+"""
+Lightweight timing of pipeline stages, i.e.
+    with stage('csv parse'):
+        ...
+Disabled by default, stage() then returns a shared no-op context so instrumented code costs next to nothing.
+After enable() each stage logs its wall time and the change in allocated memory blocks to a rotating log
+and calls every listener with (name, seconds, blocks). profiled() wraps one run of a function with
+cProfile and tracemalloc and dumps both for offline inspection.
+"""
+
+LOG_DIR = os.path.join(os.path.expanduser('~'), '.csv_reader')
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 3
+
+logger = logging.getLogger('csv_reader.timing')
+_enabled = False
+_listeners = []
+_null_stage = nullcontext()
+
+
+class _Stage:
+    """Times one pass through a pipeline stage"""
+    __slots__ = ('name', 'start', 'blocks')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, sys.getallocatedblocks() - self.blocks)
+        return False
+
+
+def stage(name: str):
+    """Context manager timing a pipeline stage, a no-op unless timing is enabled"""
+    if not _enabled:
+        return _null_stage
+    return _Stage(name)
+
+
+def record(name: str, seconds: float, blocks: int = 0):
+    """Log a timing measured outside of stage() and pass it to the listeners"""
+    if not _enabled:
+        return
+    logger.info('%s %.6f s %+d blocks', name, seconds, blocks)
+    for listener in list(_listeners):
+        listener(name, seconds, blocks)
+
+
+def enable(log_dir: str = LOG_DIR):
+    """Turn on stage timing and log timings to a rotating file in log_dir"""
+    global _enabled
+    if not logger.handlers:
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(log_dir, 'stage_timings.log'), maxBytes=LOG_MAX_BYTES,
+                                          backupCount=LOG_BACKUPS, encoding='utf-8')
+        except OSError:
+            handler = logging.NullHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(threadName)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    _enabled = True
+
+
+def disable():
+    """Turn off stage timing"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def add_listener(fn: Callable):
+    """Call fn(name, seconds, blocks) after every timed stage, fn may be called from worker threads"""
+    _listeners.append(fn)
+
+
+def remove_listener(fn: Callable):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def profiled(fn: Callable, dump_dir: str) -> Callable:
+    """Wrap fn so one call runs under cProfile and tracemalloc
+
+    Writes <dump_dir>/profile_<time>.prof (open with pstats or snakeviz) and
+    <dump_dir>/profile_<time>.tracemalloc (load with tracemalloc.Snapshot.load)
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        os.makedirs(dump_dir, exist_ok=True)
+        prefix = os.path.join(dump_dir, time.strftime('profile_%Y%m%d_%H%M%S'))
+        profiler = cProfile.Profile()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profiler.dump_stats(prefix + '.prof')
+            tracemalloc.take_snapshot().dump(prefix + '.tracemalloc')
+            if started_tracing:
+                tracemalloc.stop()
+            logger.info('profile written to %s.prof', prefix)
+    return wrapper
@@ -0,0 +1,347 @@
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+from typing import Callable
+import numpy as np
+import pandas as pd
+from lib import CHUNK_ROWS, KEY_COLUMNS, Datalog, LoadCancelled, Pull, compact_frame, get_pull_info, load_datalog
+
+"""
+Export of the pulls of a log for analysis without the raw log, i.e.
+    python pull_export.py log.csv -o log.parquet -c "Boost (psi)" "Engine Speed (RPM)" -p 1-3,7
+Every pull, or the chosen ones, is written with the chosen channels after Time (sec) and Throttle Pos (%) and a
+Pull column holding the pull number in the log. Pulls are read and written CHUNK_ROWS rows at a time so memory
+use does not grow with the export. Parquet and Arrow IPC files keep ap_info and the pull settings in their
+metadata and need pyarrow, the trimmed csv keeps the layout of a log with ap_info as the last header.
+load_pull_export reads any of them back as load_datalog does, taking the pulls from the Pull column instead of
+finding them again.
+"""
+
+# format: file suffix, parquet and arrow need pyarrow
+DATA_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.pulls.csv'}
+PULL_COLUMN = 'Pull'
+METADATA_KEY = b'csv_reader'
+EXPORT_VERSION = 1
+
+
+def available_data_formats() -> list:
+    """Export formats that can be written here, pyarrow is optional"""
+    has_arrow = importlib.util.find_spec('pyarrow') is not None
+    return [x for x in DATA_FORMATS if x == 'csv' or has_arrow]
+
+
+def data_format(filepath: str) -> str:
+    """Export format of a file from its suffix, None for anything else"""
+    for fmt, suffix in DATA_FORMATS.items():
+        if filepath.lower().endswith(suffix):
+            return fmt
+    return None
+
+
+def is_pull_export(filepath: str) -> bool:
+    return data_format(filepath) is not None
+
+
+def parse_pull_selection(text: str, count: int) -> list:
+    """Indices of the pulls in a selection like '1-3, 7', counted from 1, empty or 'all' selects every pull"""
+    text = text.strip().lower()
+    if text in ('', 'all'):
+        return list(range(count))
+    selected = []
+    for part in text.split(','):
+        first, sep, last = part.strip().partition('-')
+        try:
+            first = int(first)
+            last = int(last) if sep else first
+        except ValueError:
+            raise ValueError(f'Invalid pull selection {part.strip()}, use numbers and ranges like 1-3, 7') from None
+        if not 1 <= first <= last <= count:
+            raise ValueError(f'Pulls {part.strip()} are not in 1-{count}')
+        selected += [x - 1 for x in range(first, last + 1) if x - 1 not in selected]
+    return selected
+
+
+def _pull_frames(pulls: list, columns: list, chunk_rows: int):
+    """Yields the rows of each pull, consecutive Pulls of one Datalog are read up to chunk_rows rows per parse"""
+    i = 0
+    while i < len(pulls):
+        pull = pulls[i]
+        if not isinstance(pull, Pull):
+            yield pd.DataFrame({x: np.asarray(pull[x]) for x in columns})
+            i += 1
+            continue
+        group = [pull]
+        rows = len(pull)
+        while (i + len(group) < len(pulls) and isinstance(pulls[i + len(group)], Pull)
+               and pulls[i + len(group)].datalog is pull.datalog and rows + len(pulls[i + len(group)]) <= chunk_rows):
+            rows += len(pulls[i + len(group)])
+            group.append(pulls[i + len(group)])
+        bounds = np.array([[x.start, x.stop] for x in group], dtype=np.int64)
+        frame = pull.datalog.read_pull_rows(bounds, columns).reset_index(drop=True)
+        offset = 0
+        for x in group:
+            yield frame.iloc[offset:offset + len(x)][columns].reset_index(drop=True)
+            offset += len(x)
+        i += len(group)
+
+
+def _is_text(values: pd.Series) -> bool:
+    return not pd.api.types.is_numeric_dtype(values.dtype)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Text of a channel, numbers as their shortest repr so a chunk parsed as numbers reads as logged, i.e. 1 not 1.0"""
+    if _is_text(values):
+        return values.astype('string')
+    return pd.Series([None if np.isnan(x) else np.format_float_positional(x, trim='-')
+                      for x in values.to_numpy(dtype=np.float64)], index=values.index, dtype='string')
+
+
+def _normalized(frame: pd.DataFrame, text_columns: set, number: int) -> pd.DataFrame:
+    """The rows of pull number with text_columns and columns holding text as text and every other column as float64"""
+    frame = frame.assign(**{x: _as_text(frame[x]) if x in text_columns or _is_text(frame[x])
+                            else frame[x].astype(np.float64) for x in frame.columns})
+    frame.insert(0, PULL_COLUMN, np.full(len(frame), number, dtype=np.int32))
+    return frame
+
+
+class _ArrowWriter:
+    """Writes pulls to one parquet or Arrow IPC file, channels are float64 until a chunk holds text
+
+    A chunk can parse a channel as numbers that is text elsewhere in the log. The first chunk with text in a
+    column written as numbers so far widens it to string, rewriting the rows already written from the file
+    itself, so the log is only parsed once
+    """
+    def __init__(self, path: str, fmt: str, columns: list, metadata: dict):
+        self.path = path
+        self.fmt = fmt
+        self.columns = columns
+        self.metadata = metadata
+        self.text_columns = set()
+        self.writer = self._open()
+
+    def _open(self):
+        import pyarrow as pa
+        fields = [pa.field(PULL_COLUMN, pa.int32())]
+        fields += [pa.field(x, pa.string() if x in self.text_columns else pa.float64()) for x in self.columns]
+        self.schema = pa.schema(fields, metadata={METADATA_KEY: json.dumps(self.metadata).encode('utf-8')})
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        return pa.ipc.new_file(self.path, self.schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    def _write_table(self, frame: pd.DataFrame):
+        import pyarrow as pa
+        self.writer.write_table(pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+
+    def _written_frames(self, path: str):
+        """Yields the frames of a file written by this writer one batch at a time"""
+        import pyarrow as pa
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches():
+                yield batch.to_pandas()
+            return
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pandas()
+
+    def _widen(self, columns: set):
+        """Reopen the file with columns as text, copying over the rows written so far"""
+        self.writer.close()
+        self.text_columns |= columns
+        narrow_path = self.path + '.narrow'
+        os.replace(self.path, narrow_path)
+        try:
+            self.writer = self._open()
+            for frame in self._written_frames(narrow_path):
+                self._write_table(frame.assign(**{x: _as_text(frame[x]) for x in columns}))
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(narrow_path)
+
+    def write(self, frame: pd.DataFrame, number: int):
+        widened = {x for x in self.columns if x not in self.text_columns and _is_text(frame[x])}
+        if widened:
+            self._widen(widened)
+        self._write_table(_normalized(frame, self.text_columns, number))
+
+    def close(self):
+        self.writer.close()
+
+
+class _CsvWriter:
+    """Writes frames to a csv laid out like a log, ap_info is the header of an empty last column"""
+    def __init__(self, path: str, ap_info: str):
+        self.ap_info = ap_info
+        self.file = open(path, 'w', encoding='Windows-1252', newline='')
+        self.header = True
+
+    def write(self, frame: pd.DataFrame, number: int):
+        frame = _normalized(frame, set(), number)
+        frame.assign(**{self.ap_info: ''}).to_csv(self.file, header=self.header, index=False, lineterminator='\n')
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+def export_pull_data(pulls: list, channels: list, out_path: str, fmt: str = None, ap_info: str = '',
+                     numbers: list = None, source: str = '', min_throttle: float = None, time_filter: float = None,
+                     chunk_rows: int = CHUNK_ROWS, process_callback: Callable = None, cancel_check: Callable = None) -> str:
+    """Write the rows of pulls to out_path, returns out_path, runs through file_opener.QtRunner
+
+    Time (sec) and Throttle Pos (%) are always written so the export can be loaded like a log.
+    The file is written under a temporary name and only replaces out_path once complete
+
+    Arguments:\n
+    pulls : list -- Pulls or pull DataFrames to write\n
+    channels : list -- channels to write, derived channels are written as values\n
+    out_path : str -- file to write\n
+    Keyword Arguments:\n
+    fmt : str -- one of DATA_FORMATS, defaults to the format of out_path's suffix\n
+    ap_info : str -- accessport info of the log\n
+    numbers : list -- pull number of each pull in the log, defaults to 1 to len(pulls)\n
+    source : str -- log the pulls were found in, kept in parquet and arrow metadata\n
+    min_throttle : float -- throttle threshold the pulls were found with, kept in metadata\n
+    time_filter : float -- time filter the pulls were found with, kept in metadata\n
+    chunk_rows : int -- rows read at a time, bounds memory use
+    """
+    fmt = fmt or data_format(out_path)
+    if fmt not in DATA_FORMATS:
+        raise ValueError(f'Unknown export format {fmt}, use one of {", ".join(DATA_FORMATS)}')
+    if fmt not in available_data_formats():
+        raise ValueError(f'{fmt} export needs pyarrow, pip install pyarrow or export to csv')
+    if not pulls:
+        raise ValueError('No pulls to export')
+    numbers = list(range(1, len(pulls) + 1)) if numbers is None else list(numbers)
+    columns = KEY_COLUMNS + [x for x in channels if x not in KEY_COLUMNS]
+    missing = [x for x in columns if x not in pulls[0].columns]
+    if missing:
+        raise ValueError(f'Channels not in the log: {", ".join(missing)}')
+    total_rows = sum(len(x) for x in pulls)
+    progress = {'rows': 0, 'reported': -1}
+
+    def frames():
+        for frame in _pull_frames(pulls, columns, chunk_rows):
+            yield frame
+            progress['rows'] += len(frame)
+            if cancel_check is not None and cancel_check():
+                raise LoadCancelled('Pull export cancelled')
+            percent = int(100 * progress['rows'] / total_rows)
+            if process_callback is not None and percent != progress['reported']:
+                process_callback(percent)
+                progress['reported'] = percent
+
+    tmp_path = out_path + '.tmp'
+    writer = None
+    try:
+        if fmt == 'csv':
+            writer = _CsvWriter(tmp_path, ap_info)
+        else:
+            metadata = {'version': EXPORT_VERSION, 'ap_info': ap_info, 'source': source,
+                        'min_throttle': min_throttle, 'time_filter': time_filter}
+            writer = _ArrowWriter(tmp_path, fmt, columns, metadata)
+        for frame, number in zip(frames(), numbers):
+            writer.write(frame, number)
+        writer.close()
+    except BaseException:
+        if writer is not None:
+            with contextlib.suppress(Exception):
+                writer.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def read_pull_export(filepath: str) -> tuple:
+    """Returns (frame, ap_info, metadata) of an export, frame includes the Pull column"""
+    fmt = data_format(filepath)
+    if fmt == 'csv':
+        frame = pd.read_csv(filepath, encoding='Windows-1252')
+        ap_info = frame.columns[-1]
+        return frame.iloc[:, :-1], ap_info, {'ap_info': ap_info}
+    if fmt is None:
+        raise ValueError(f'{filepath} is not a pull export, expected a {", ".join(DATA_FORMATS.values())} file')
+    if fmt not in available_data_formats():
+        raise ValueError(f'Reading {fmt} exports needs pyarrow, pip install pyarrow')
+    import pyarrow as pa
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(filepath)
+    else:
+        with pa.memory_map(filepath) as source:
+            table = pa.ipc.open_file(source).read_all()
+    metadata = table.schema.metadata or {}
+    if METADATA_KEY not in metadata:
+        raise ValueError(f'{filepath} was not written by pull_export')
+    metadata = json.loads(metadata[METADATA_KEY])
+    return table.to_pandas(), metadata['ap_info'], metadata
+
+
+def load_pull_export(filepath: str, compact: bool = False, process_callback: Callable = None,
+                     cancel_check: Callable = None) -> list:
+    """Reads an export written by export_pull_data, returns [datalog, ap_info, pulls, pull_info] like lib.load_datalog
+
+    Pulls are the runs of the Pull column, numbered from 1 in the order they were written.
+    Pass compact to keep channels in compact dtypes, see lib.compact_frame
+    """
+    frame, ap_info, metadata = read_pull_export(filepath)
+    if cancel_check is not None and cancel_check():
+        raise LoadCancelled('Pull export load cancelled')
+    missing = [x for x in [PULL_COLUMN] + KEY_COLUMNS if x not in frame.columns]
+    if missing:
+        raise ValueError(f'{filepath} lacks {", ".join(missing)}')
+    numbers = frame[PULL_COLUMN].to_numpy()
+    starts = np.flatnonzero(np.diff(numbers, prepend=np.nan) != 0)
+    bounds = np.column_stack((starts, np.append(starts[1:], len(numbers))))
+    frame = frame.drop(columns=PULL_COLUMN)
+    if compact:
+        frame, saved = compact_frame(frame)
+    datalog = Datalog(filepath, use_cache=False, loaded=(frame, ap_info))
+    if compact:
+        datalog.memory_saved = saved
+    pulls = [Pull(datalog, start, stop) for start, stop in bounds]
+    pull_info = get_pull_info(pulls)
+    if process_callback is not None:
+        process_callback(100)
+    return [datalog, ap_info, pulls, pull_info]
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Export the pulls of a log to parquet, arrow or a trimmed csv')
+    parser.add_argument('log', help='datalog csv file')
+    parser.add_argument('-o', '--output', required=True,
+                        help=f'file to write, the format follows its suffix ({", ".join(DATA_FORMATS.values())})')
+    parser.add_argument('-c', '--channels', nargs='+', help='channels to export, defaults to every channel')
+    parser.add_argument('-p', '--pulls', default='all', help='pulls to export i.e. 1-3,7, defaults to all')
+    parser.add_argument('-t', '--throttle', type=float, default=50.0, help='identify pulls when throttle pos >= this value')
+    parser.add_argument('--time-filter', type=float, default=0.5, help='omit pulls whose duration <= this number')
+    args = parser.parse_args(argv)
+    if data_format(args.output) is None:
+        parser.error(f'output must end with one of {", ".join(DATA_FORMATS.values())}')
+
+    def report(percent: int):
+        print(f'\r{percent}%', end='', file=sys.stderr, flush=True)
+
+    try:
+        datalog, ap_info, pulls, pull_info = load_datalog(args.log, args.throttle, args.time_filter)
+        selected = parse_pull_selection(args.pulls, len(pulls))
+        export_pull_data([pulls[i] for i in selected], args.channels or datalog.columns, args.output,
+                         ap_info=ap_info, numbers=[i + 1 for i in selected], source=os.path.abspath(args.log),
+                         min_throttle=args.throttle, time_filter=args.time_filter, process_callback=report)
+    except (OSError, KeyError, ValueError) as e:
+        print(f'\nExport failed: {e}', file=sys.stderr)
+        return 1
+    print(f'\nWrote {len(selected)} pulls to {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable
+import numpy as np
+import pandas as pd
+from batch import expand_paths
+from lib import Datalog, LoadCancelled, Pull, get_pull_info, get_pull_stats, get_pulls, parse_column_name, read_datalog
+from profiling import LOG_DIR
+
+"""
+Library of the pulls in any number of logs kept in an indexed SQLite database, i.e.
+    python pull_library.py add "G:/Cobb/Logs/**/*.csv" --throttle 50 --time-filter 0.5
+    python pull_library.py query "RPM max > 6500" "Feedback Knock max > 2"
+Logs are read with read_datalog and get_pulls in a process pool, storing the row bounds of every pull and
+the min, max, mean and value at peak RPM of each channel. Logs whose size, mtime and pull settings have not
+changed since they were added are skipped. Queries only touch the database, opening a match reads just its log.
+"""
+
+DEFAULT_LIBRARY = os.path.join(LOG_DIR, 'pull_library.sqlite')
+LIBRARY_VERSION = 1
+STAT_FIELDS = {'min': 'min', 'max': 'max', 'mean': 'mean', 'at peak rpm': 'at_peak_rpm'}
+PULL_FIELDS = {'start': 'start', 'duration': 'duration'}
+OPERATORS = ['<=', '>=', '!=', '<', '>', '=']
+QUERY_COLUMNS = ['id', 'path', 'pull', 'start', 'duration', 'ap_info']
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    min_throttle REAL NOT NULL,
+    time_filter REAL NOT NULL,
+    ap_info TEXT,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pulls (
+    id INTEGER PRIMARY KEY,
+    log_id INTEGER NOT NULL REFERENCES logs(id) ON DELETE CASCADE,
+    number INTEGER NOT NULL,
+    start_row INTEGER NOT NULL,
+    stop_row INTEGER NOT NULL,
+    start REAL,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    pull_id INTEGER NOT NULL REFERENCES pulls(id) ON DELETE CASCADE,
+    channel TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    unit TEXT COLLATE NOCASE,
+    min REAL,
+    max REAL,
+    mean REAL,
+    at_peak_rpm REAL
+);
+CREATE INDEX IF NOT EXISTS pulls_log ON pulls(log_id);
+CREATE INDEX IF NOT EXISTS pulls_duration ON pulls(duration);
+CREATE INDEX IF NOT EXISTS stats_pull ON stats(pull_id, name);
+CREATE INDEX IF NOT EXISTS stats_min ON stats(name, min);
+CREATE INDEX IF NOT EXISTS stats_max ON stats(name, max);
+CREATE INDEX IF NOT EXISTS stats_mean ON stats(name, mean);
+CREATE INDEX IF NOT EXISTS stats_at_peak_rpm ON stats(name, at_peak_rpm);
+"""
+CONDITION = re.compile(r'^\s*(?P<channel>.+?)\s*(?:\s(?P<stat>min|max|mean|at peak rpm))?\s*'
+                       r'(?P<op><=|>=|!=|<|>|=)\s*(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)\s*$', re.IGNORECASE)
+
+
+def parse_condition(text: str) -> dict:
+    """Parse a filter like 'RPM max > 6500', 'Boost (psi) mean >= 15' or 'duration > 3'
+
+    The stat is one of min, max, mean or at peak RPM and defaults to max, start and duration filter on the pull itself
+    """
+    match = CONDITION.match(text)
+    if match is None:
+        raise ValueError(f'Expected <channel> [min|max|mean|at peak RPM] <op> <number>, got {text.strip()}')
+    channel = match.group('channel').strip()
+    stat = (match.group('stat') or 'max').lower()
+    if channel.lower() in PULL_FIELDS and match.group('stat') is None:
+        return {'field': PULL_FIELDS[channel.lower()], 'op': match.group('op'), 'value': float(match.group('value'))}
+    col_name = parse_column_name(channel)
+    return {
+        'name': col_name['name'].strip(),
+        'unit': col_name['unit'],
+        'field': STAT_FIELDS[stat],
+        'op': match.group('op'),
+        'value': float(match.group('value'))
+    }
+
+
+def parse_query(text: str) -> list:
+    """Split a query into conditions joined by 'and', i.e. 'RPM max > 6500 and Feedback Knock max > 2'"""
+    return [parse_condition(x) for x in re.split(r'\s+and\s+', text.strip(), flags=re.IGNORECASE) if x.strip()]
+
+
+def summarize_pulls(filepath: str, min_throttle: float, time_filter: float, use_cache: bool = True) -> dict:
+    """Read one datalog and return its identity, pull bounds and per channel stats for the library"""
+    stat = os.stat(filepath)
+    df, ap_info = read_datalog(filepath, use_cache=use_cache)
+    pulls = get_pulls(df, min_throttle, time_filter)
+    pull_info = get_pull_info(pulls)
+    stats = get_pull_stats(pulls)
+    rows = []
+    for i, pull in enumerate(pulls, start=1):
+        start_row = df.index.get_loc(pull.index[0])
+        rows.append((i, start_row, start_row + len(pull), float(pull_info[i]['start']), float(pull_info[i]['duration'])))
+    channel_stats = []
+    channels = list(dict.fromkeys(x for x, s in stats.columns))
+    for channel in channels:
+        col_name = parse_column_name(channel)
+        values = stats[channel].to_numpy(dtype=float)
+        for i in np.flatnonzero(~np.isnan(values).all(axis=1)):
+            # NaN becomes NULL in SQLite
+            channel_stats.append((int(i) + 1, channel, col_name['name'], col_name['unit'], *values[i].tolist()))
+    return {
+        'path': filepath,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'ap_info': ap_info,
+        'pulls': rows,
+        'stats': channel_stats
+    }
+
+
+class PullLibrary:
+    """SQLite database of the pulls and pull stats of many logs
+
+    Arguments:\n
+    path : str -- database file, created on first use, defaults to DEFAULT_LIBRARY
+    """
+    def __init__(self, path: str = DEFAULT_LIBRARY):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        # readers see the last commit while a long ingest writes
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, LIBRARY_VERSION):
+            raise ValueError(f'{path} is a version {version} library, expected {LIBRARY_VERSION}')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f'PRAGMA user_version = {LIBRARY_VERSION}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_current(self, filepath: str, min_throttle: float, time_filter: float) -> bool:
+        """True when the log was added with the same settings and has not changed since"""
+        row = self.connection.execute('SELECT size, mtime_ns, min_throttle, time_filter FROM logs WHERE path = ?',
+                                      (os.path.abspath(filepath),)).fetchone()
+        if row is None:
+            return False
+        stat = os.stat(filepath)
+        return row == (stat.st_size, stat.st_mtime_ns, min_throttle, time_filter)
+
+    def store(self, summary: dict, min_throttle: float, time_filter: float):
+        """Replace the pulls of a log with a summary from summarize_pulls"""
+        path = os.path.abspath(summary['path'])
+        with self.connection:
+            self.connection.execute('DELETE FROM logs WHERE path = ?', (path,))
+            log_id = self.connection.execute(
+                'INSERT INTO logs (path, size, mtime_ns, min_throttle, time_filter, ap_info, added) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, summary['size'], summary['mtime_ns'], min_throttle, time_filter, summary['ap_info'], time.time())
+            ).lastrowid
+            pull_ids = {}
+            for number, start_row, stop_row, start, duration in summary['pulls']:
+                pull_ids[number] = self.connection.execute(
+                    'INSERT INTO pulls (log_id, number, start_row, stop_row, start, duration) VALUES (?, ?, ?, ?, ?, ?)',
+                    (log_id, number, start_row, stop_row, start, duration)
+                ).lastrowid
+            self.connection.executemany(
+                'INSERT INTO stats (pull_id, channel, name, unit, min, max, mean, at_peak_rpm) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(pull_ids[x[0]], *x[1:]) for x in summary['stats']]
+            )
+
+    def prune(self) -> int:
+        """Remove logs that no longer exist, returns how many were removed"""
+        paths = [x for x, in self.connection.execute('SELECT path FROM logs') if not os.path.isfile(x)]
+        with self.connection:
+            self.connection.executemany('DELETE FROM logs WHERE path = ?', [(x,) for x in paths])
+        return len(paths)
+
+    def counts(self) -> tuple:
+        """Returns (logs, pulls) in the library"""
+        logs = self.connection.execute('SELECT COUNT(*) FROM logs').fetchone()[0]
+        pulls = self.connection.execute('SELECT COUNT(*) FROM pulls').fetchone()[0]
+        return logs, pulls
+
+    def channels(self) -> list:
+        """Channel names in the library, without units"""
+        return [x for x, in self.connection.execute('SELECT DISTINCT name FROM stats ORDER BY name')]
+
+    def query(self, conditions: list, limit: int = None) -> pd.DataFrame:
+        """Returns the pulls matching every condition from parse_condition
+
+        Each channel condition is answered from a (name, stat) index, columns are QUERY_COLUMNS
+        plus the compared value of every channel condition
+        """
+        where = []
+        values = []
+        # one result column per compared channel and stat
+        selects = {}
+        for condition in conditions:
+            if condition['op'] not in OPERATORS:
+                raise ValueError(f'Unknown operator {condition["op"]}')
+            if 'name' not in condition:
+                where.append(f'pulls.{condition["field"]} {condition["op"]} ?')
+                values.append(condition['value'])
+                continue
+            field = condition['field']
+            if field not in STAT_FIELDS.values():
+                raise ValueError(f'Unknown stat {field}')
+            unit_clause = '' if condition['unit'] is None else ' AND unit = ?'
+            unit_value = [] if condition['unit'] is None else [condition['unit']]
+            where.append(f'pulls.id IN (SELECT pull_id FROM stats WHERE name = ?{unit_clause} AND {field} {condition["op"]} ?)')
+            values += [condition['name'], *unit_value, condition['value']]
+            stat = [k for k, v in STAT_FIELDS.items() if v == field][0]
+            selects[f'{condition["name"]} {stat}'] = (
+                f'(SELECT {field} FROM stats WHERE pull_id = pulls.id AND name = ?{unit_clause} LIMIT 1)',
+                [condition['name'], *unit_value])
+        sql = ('SELECT pulls.id, logs.path, pulls.number, pulls.start, pulls.duration, logs.ap_info'
+               + ''.join(f', {x}' for x, v in selects.values())
+               + ' FROM pulls JOIN logs ON logs.id = pulls.log_id'
+               + (' WHERE ' + ' AND '.join(where) if where else '')
+               + ' ORDER BY logs.path, pulls.number')
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        select_values = [x for sql_part, v in selects.values() for x in v]
+        rows = self.connection.execute(sql, select_values + values).fetchall()
+        return pd.DataFrame(rows, columns=QUERY_COLUMNS + list(selects))
+
+    def open_pull(self, pull_id: int) -> Pull:
+        """Returns a Pull of a library pull, reading only its log
+
+        Raises ValueError when the log is gone or changed since it was added
+        """
+        row = self.connection.execute(
+            'SELECT logs.path, logs.size, logs.mtime_ns, pulls.start_row, pulls.stop_row FROM pulls '
+            'JOIN logs ON logs.id = pulls.log_id WHERE pulls.id = ?', (pull_id,)).fetchone()
+        if row is None:
+            raise ValueError(f'No pull {pull_id} in the library')
+        path, size, mtime_ns, start_row, stop_row = row
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise ValueError(f'{path} no longer exists')
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            raise ValueError(f'{path} changed since it was added to the library, add it again')
+        return Pull(Datalog(path), start_row, stop_row)
+
+
+def ingest_logs(library_path: str, paths: list, min_throttle: float, time_filter: float, jobs: int = None,
+                use_cache: bool = True, report: Callable = None, process_callback: Callable = None,
+                cancel_check: Callable = None) -> dict:
+    """Add logs to a library in a process pool, skipping logs already added unchanged with the same settings
+
+    Returns counts of 'added', 'skipped' and 'failed' logs. report(filepath, error) is called per processed log,
+    error is None on success. Runs through file_opener.QtRunner, which passes process_callback and cancel_check
+    """
+    counts = {'added': 0, 'skipped': 0, 'failed': 0}
+    with PullLibrary(library_path) as library:
+        todo = []
+        for path in paths:
+            if library.is_current(path, min_throttle, time_filter):
+                counts['skipped'] += 1
+            else:
+                todo.append(path)
+        if not todo:
+            if process_callback is not None:
+                process_callback(100)
+            return counts
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(summarize_pulls, x, min_throttle, time_filter, use_cache): x for x in todo}
+            for done, future in enumerate(as_completed(futures), start=1):
+                if cancel_check is not None and cancel_check():
+                    for x in futures:
+                        x.cancel()
+                    raise LoadCancelled('Library update cancelled')
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    counts['failed'] += 1
+                    if report is not None:
+                        report(futures[future], e)
+                else:
+                    # only the parent writes, SQLite allows one writer at a time
+                    library.store(summary, min_throttle, time_filter)
+                    counts['added'] += 1
+                    if report is not None:
+                        report(futures[future], None)
+                if process_callback is not None:
+                    process_callback(int(100 * done / len(futures)))
+    return counts
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Index the pulls of many datalogs and query them')
+    parser.add_argument('--db', default=DEFAULT_LIBRARY, help=f'library database, defaults to {DEFAULT_LIBRARY}')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='add or update datalogs, unchanged logs are skipped')
+    add.add_argument('logs', nargs='+', help='datalog csv files or glob patterns')
+    add.add_argument('-t', '--throttle', type=float, default=50.0, help='identify pulls when throttle pos >= this value')
+    add.add_argument('--time-filter', type=float, default=0.5, help='omit pulls whose duration <= this number')
+    add.add_argument('-j', '--jobs', type=int, default=None, help='worker processes, defaults to cpu count')
+    add.add_argument('--no-cache', action='store_true', help='do not read or write the sidecar column cache')
+    query = commands.add_parser('query', help='list pulls matching every condition')
+    query.add_argument('conditions', nargs='*', help='i.e. "RPM max > 6500" "Feedback Knock max > 2" "duration > 3"')
+    query.add_argument('-o', '--output', default='-', help='csv output file, defaults to stdout')
+    query.add_argument('--limit', type=int, default=None, help='at most this many pulls')
+    commands.add_parser('prune', help='remove logs that no longer exist')
+    commands.add_parser('channels', help='list channel names in the library')
+    args = parser.parse_args(argv)
+
+    if args.command == 'add':
+        files, unmatched = expand_paths(args.logs)
+        files = [os.path.abspath(x) for x in files]
+        for pattern in unmatched:
+            print(f'{pattern}: no such datalog', file=sys.stderr)
+        if not files:
+            print('No datalogs matched', file=sys.stderr)
+            return 2
+
+        def report(filepath: str, error: Exception):
+            print(f'{filepath}: {"added" if error is None else f"failed, {error!r}"}', file=sys.stderr)
+
+        counts = ingest_logs(args.db, files, args.throttle, args.time_filter, jobs=args.jobs,
+                             use_cache=not args.no_cache, report=report)
+        print(f'{counts["added"]} added, {counts["skipped"]} unchanged, {counts["failed"]} failed', file=sys.stderr)
+        return 1 if counts['failed'] or unmatched else 0
+    with PullLibrary(args.db) as library:
+        if args.command == 'prune':
+            print(f'Removed {library.prune()} logs', file=sys.stderr)
+        elif args.command == 'channels':
+            print('\n'.join(library.channels()))
+        else:
+            try:
+                conditions = [parse_condition(x) for x in args.conditions]
+            except ValueError as e:
+                parser.error(str(e))
+            start = time.perf_counter()
+            result = library.query(conditions, limit=args.limit)
+            elapsed = time.perf_counter() - start
+            result.to_csv(sys.stdout if args.output == '-' else args.output, index=False, lineterminator='\n')
+            print(f'{len(result)} pulls in {elapsed * 1000:.1f} ms', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
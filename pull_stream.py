@@ -0,0 +1,289 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+from typing import Callable
+import numpy as np
+import pandas as pd
+from lib import CHUNK_ROWS, LoadCancelled
+
+"""
+Out of core pull detection over logs of any size, i.e.
+    python pull_stream.py part1.csv part2.csv part3.csv -o endurance_pulls --chunk-rows 50000
+The logs are read in order as one continuous session, CHUNK_ROWS rows at a time, and the run of
+throttle >= threshold open at the end of a chunk or file is carried into the next one. Only the rows of
+pulls are kept, appended to one file per pull as they are read, so memory use is set by the chunk
+size no matter how large the logs are. Rows are stored with Time (sec) as float64 and every other channel
+as float32, about 7 significant digits, which holds logged values in less space than their csv text.
+Read the result back with PullStore.
+"""
+
+MANIFEST = 'manifest.json'
+STORE_VERSION = 2
+PULL_SUFFIX = '.rows'
+
+
+def spill_dtypes(columns: list) -> list:
+    """dtype each channel is stored with, time keeps float64 so long sessions keep their resolution"""
+    return ['<f8' if x == 'Time (sec)' else '<f4' for x in columns]
+
+
+def record_dtype(columns: list, dtypes: list) -> np.dtype:
+    """dtype of one stored row"""
+    return np.dtype([(x, dtype) for x, dtype in zip(columns, dtypes)])
+
+
+class PullStream:
+    """Finds pulls in rows fed chunk by chunk and spills their rows to a PullStore directory
+
+    Rows of the open run go straight to disk, its file is kept if the run passes the time filter
+    once it ends and removed otherwise. Call discard if feeding stops early, it closes and removes the open file
+
+    Arguments:\n
+    out_dir : str -- store directory, must be new, empty or a pull store, which is replaced\n
+    columns : list -- channels of every fed row\n
+    min_throttle : float -- identify pulls when throttle pos >= this value\n
+    time_filter : float -- omit pulls whose duration <= this number
+    """
+    def __init__(self, out_dir: str, columns: list, min_throttle: float, time_filter: float):
+        self.out_dir = out_dir
+        self.columns = list(columns)
+        self.min_throttle = min_throttle
+        self.time_filter = time_filter
+        self.time_index = self.columns.index('Time (sec)')
+        self.throttle_index = self.columns.index('Throttle Pos (%)')
+        self.dtypes = spill_dtypes(self.columns)
+        self.record_dtype = record_dtype(self.columns, self.dtypes)
+        self.pulls = []
+        self.rows = 0
+        self._open = None
+        if os.path.isdir(out_dir) and os.listdir(out_dir):
+            # only ever replace a previous pull store, never a folder of logs passed by mistake
+            if not os.path.isfile(os.path.join(out_dir, MANIFEST)):
+                raise ValueError(f'{out_dir} is not empty and is not a pull store, pick a new or empty directory')
+            shutil.rmtree(out_dir)
+        os.makedirs(out_dir, exist_ok=True)
+
+    def feed(self, values: np.ndarray, source: str = None):
+        """Process the next rows, values is a float (rows, channels) array in the order of columns"""
+        is_pull = values[:, self.throttle_index] >= self.min_throttle
+        in_run = self._open is not None
+        edges = np.flatnonzero(np.diff(np.concatenate(([in_run], is_pull)).view(np.int8)))
+        if in_run:
+            edges = np.concatenate(([0], edges))
+        for i in range(0, len(edges), 2):
+            start = int(edges[i])
+            stop = int(edges[i + 1]) if i + 1 < len(edges) else len(values)
+            if self._open is None:
+                self._start_pull(values[start, self.time_index], self.rows + start, source)
+            if stop > start:
+                self._append(values[start:stop], source)
+            if i + 1 < len(edges):
+                self._end_pull()
+        self.rows += len(values)
+
+    def _start_pull(self, start_time: float, start_row: int, source: str):
+        path = os.path.join(self.out_dir, f'pull_{len(self.pulls) + 1:04d}{PULL_SUFFIX}')
+        self._open = {
+            'file': os.path.basename(path),
+            'handle': open(path, 'wb'),
+            'start_row': start_row,
+            'rows': 0,
+            'start': float(start_time),
+            'end': float(start_time),
+            'sources': []
+        }
+
+    def _append(self, values: np.ndarray, source: str):
+        pull = self._open
+        rows = np.empty(len(values), dtype=self.record_dtype)
+        for i, name in enumerate(self.columns):
+            rows[name] = values[:, i]
+        pull['handle'].write(rows.tobytes())
+        pull['rows'] += len(values)
+        pull['end'] = float(values[-1, self.time_index])
+        if source is not None and source not in pull['sources']:
+            pull['sources'].append(source)
+
+    def _end_pull(self):
+        pull = self._open
+        self._open = None
+        pull['handle'].close()
+        duration = pull['end'] - pull['start']
+        if duration > self.time_filter:
+            self.pulls.append({
+                'file': pull['file'],
+                'start_row': pull['start_row'],
+                'stop_row': pull['start_row'] + pull['rows'],
+                'rows': pull['rows'],
+                'start': pull['start'],
+                'duration': duration,
+                'sources': pull['sources']
+            })
+        else:
+            os.remove(os.path.join(self.out_dir, pull['file']))
+
+    def discard(self):
+        """Close and remove the file of the open run, for a stream that stops before close"""
+        pull = self._open
+        self._open = None
+        if pull is not None:
+            pull['handle'].close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.out_dir, pull['file']))
+
+    def close(self, ap_info: str = '', sources: list = None):
+        """End the open run and write the manifest"""
+        if self._open is not None:
+            self._end_pull()
+        manifest = {
+            'version': STORE_VERSION,
+            'columns': self.columns,
+            'dtypes': self.dtypes,
+            'ap_info': ap_info,
+            'sources': sources or [],
+            'min_throttle': self.min_throttle,
+            'time_filter': self.time_filter,
+            'rows': self.rows,
+            'pulls': self.pulls
+        }
+        # manifest goes last so an interrupted run is never read as a store
+        with open(os.path.join(self.out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+
+
+def _numeric_values(chunk: pd.DataFrame) -> np.ndarray:
+    """Chunk as a float array, text channels become NaN"""
+    text_columns = [x for x, dtype in chunk.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+    if text_columns:
+        chunk = chunk.assign(**{x: pd.to_numeric(chunk[x], errors='coerce') for x in text_columns})
+    return chunk.to_numpy(dtype=float)
+
+
+def stream_pulls(filepaths: list, out_dir: str, min_throttle: float, time_filter: float, chunk_rows: int = CHUNK_ROWS,
+                 process_callback: Callable = None, cancel_check: Callable = None) -> str:
+    """Find the pulls of logs read in order as one session and write their rows to a PullStore at out_dir
+
+    Every log must have the same channels. When a log's Time (sec) starts over, it is shifted to continue
+    one sample interval after the previous log so pull durations and times stay continuous across logs.
+    Text channels are stored as NaN. Returns out_dir, runs through file_opener.QtRunner
+
+    Arguments:\n
+    filepaths : list -- datalog csv files in session order\n
+    out_dir : str -- store directory, must be new, empty or a pull store, which is replaced\n
+    min_throttle : float -- identify pulls when throttle pos >= this value\n
+    time_filter : float -- omit pulls whose duration <= this number\n
+    Keyword Arguments:\n
+    chunk_rows : int -- rows parsed at a time, bounds memory use
+    """
+    total_size = sum(os.path.getsize(x) for x in filepaths)
+    done_size = 0
+    stream = None
+    header = None
+    ap_info = None
+    time_offset = 0.0
+    last_time = None
+    step = 0.0
+    try:
+        for filepath in filepaths:
+            # binary handle so tell() reports how far the parser has read
+            with open(filepath, 'rb') as f:
+                check_restart = last_time is not None
+                for chunk in pd.read_csv(f, encoding='Windows-1252', chunksize=chunk_rows):
+                    if stream is None:
+                        header = list(chunk.columns[:-1])
+                        ap_info = chunk.columns[-1]
+                        stream = PullStream(out_dir, header, min_throttle, time_filter)
+                    if list(chunk.columns[:-1]) != header:
+                        raise ValueError(f'{filepath} has different channels than {filepaths[0]}')
+                    values = _numeric_values(chunk.iloc[:, :-1])
+                    if not len(values):
+                        continue
+                    time_values = values[:, stream.time_index]
+                    if check_restart and time_values[0] + time_offset <= last_time:
+                        # the log restarted its clock, continue one sample interval after the previous log
+                        time_offset = last_time + step - time_values[0]
+                    check_restart = False
+                    time_values += time_offset
+                    if len(values) > 1:
+                        step = time_values[-1] - time_values[-2]
+                    last_time = time_values[-1]
+                    stream.feed(values, source=filepath)
+                    if cancel_check is not None and cancel_check():
+                        raise LoadCancelled('Pull stream cancelled')
+                    if process_callback is not None and total_size > 0:
+                        process_callback(int(100 * (done_size + f.tell()) / total_size))
+            done_size += os.path.getsize(filepath)
+    except BaseException:
+        if stream is not None:
+            stream.discard()
+        raise
+    if stream is None:
+        raise ValueError('No rows in the given logs')
+    stream.close(ap_info, sources=list(filepaths))
+    return out_dir
+
+
+class PullStore:
+    """Pulls written by stream_pulls, each pull is a memory mapped DataFrame read on first use
+
+    Arguments:\n
+    directory : str -- store directory
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != STORE_VERSION:
+            raise ValueError(f'{directory} is not a version {STORE_VERSION} pull store')
+        self.columns = self.manifest['columns']
+        self.ap_info = self.manifest['ap_info']
+        self.record_dtype = record_dtype(self.columns, self.manifest['dtypes'])
+
+    def __len__(self) -> int:
+        return len(self.manifest['pulls'])
+
+    def pull(self, i: int) -> pd.DataFrame:
+        """Rows of pull i, counted from 0"""
+        info = self.manifest['pulls'][i]
+        values = np.memmap(os.path.join(self.directory, info['file']), dtype=self.record_dtype, mode='r',
+                           shape=(info['rows'],))
+        return pd.DataFrame({x: values[x] for x in self.columns}, copy=False)
+
+    def pulls(self) -> list:
+        return [self.pull(i) for i in range(len(self))]
+
+    def pull_info(self) -> dict:
+        """Same layout as lib.get_pull_info, read from the manifest"""
+        return {i + 1: {'start': x['start'], 'duration': x['duration']} for i, x in enumerate(self.manifest['pulls'])}
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Find the pulls of logs of any size with bounded memory')
+    parser.add_argument('logs', nargs='+', help='datalog csv files, read in the given order as one session')
+    parser.add_argument('-o', '--output', required=True, help='pull store directory, must be new, empty or a pull store, which is replaced')
+    parser.add_argument('-t', '--throttle', type=float, default=50.0, help='identify pulls when throttle pos >= this value')
+    parser.add_argument('--time-filter', type=float, default=0.5, help='omit pulls whose duration <= this number')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help=f'rows parsed at a time, defaults to {CHUNK_ROWS}')
+    args = parser.parse_args(argv)
+    if args.chunk_rows < 1:
+        parser.error('chunk rows must be positive')
+
+    def report(percent: int):
+        print(f'\r{percent}%', end='', file=sys.stderr, flush=True)
+
+    try:
+        stream_pulls(args.logs, args.output, args.throttle, args.time_filter, chunk_rows=args.chunk_rows,
+                     process_callback=report)
+    except (OSError, KeyError, ValueError) as e:
+        print(f'\nStream failed: {e}', file=sys.stderr)
+        return 1
+    store = PullStore(args.output)
+    print(f'\nWrote {len(store)} pulls to {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
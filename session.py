@@ -0,0 +1,97 @@
+"""
+Logs kept open in one session of the GUI, i.e.
+    session = LogSession(budget_mb=1024)
+    session.add(SessionLog(path, 50, 0.5))
+Each log holds its Datalog, pulls and detection settings. Once the logs held in memory pass the budget the
+least recently used ones are unloaded, keeping their path and settings so they can be loaded again.
+Reloads are fast since lib.Datalog reads them back from the sidecar cache or index.
+"""
+
+DEFAULT_BUDGET_MB = 1024
+
+
+class SessionLog:
+    """A log open in the session, datalog is None once it has been unloaded"""
+    def __init__(self, filepath: str, min_throttle: float, time_filter: float, tail: bool = False):
+        self.filepath = filepath
+        self.min_throttle = min_throttle
+        self.time_filter = time_filter
+        self.tail = tail
+        self.unload()
+
+    def unload(self):
+        """Drop the parsed log, keeping what is needed to load it again"""
+        self.datalog = None
+        self.ap_info = None
+        self.pulls = []
+        self.pull_info = {}
+        self.pull_stats = None
+        self.detector = None
+        self.tracker = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.datalog is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the parsed log"""
+        if not self.loaded:
+            return 0
+        detector_bytes = 0 if self.detector is None else self.detector.time.nbytes + self.detector.throttle.nbytes
+        return self.datalog.nbytes + sum(x.nbytes for x in self.pulls) + detector_bytes
+
+
+class LogSession:
+    """Open logs in the order they were opened, unloading the least recently used past a memory budget"""
+    def __init__(self, budget_mb: float = DEFAULT_BUDGET_MB):
+        self.budget = int(budget_mb * 2 ** 20)
+        self._logs = {}
+        self._recent = []
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def __contains__(self, filepath: str) -> bool:
+        return filepath in self._logs
+
+    def logs(self) -> list:
+        return list(self._logs.values())
+
+    def get(self, filepath: str) -> SessionLog:
+        """Return the log of filepath, None when it is not open"""
+        return self._logs.get(filepath)
+
+    def add(self, log: SessionLog) -> list:
+        """Open log, replacing an open log of the same file, returns the logs unloaded to make room"""
+        self._logs[log.filepath] = log
+        return self.touch(log.filepath)
+
+    def touch(self, filepath: str) -> list:
+        """Mark a log as the most recently used, returns the logs unloaded to stay within the budget"""
+        if filepath in self._recent:
+            self._recent.remove(filepath)
+        self._recent.append(filepath)
+        return self.evict()
+
+    def remove(self, filepath: str):
+        self._logs.pop(filepath, None)
+        if filepath in self._recent:
+            self._recent.remove(filepath)
+
+    def nbytes(self) -> int:
+        return sum(x.nbytes for x in self._logs.values())
+
+    def evict(self) -> list:
+        """Unload least recently used logs until the session fits the budget, the most recent log is kept"""
+        unloaded = []
+        total = self.nbytes()
+        for filepath in self._recent[:-1]:
+            if total <= self.budget:
+                break
+            log = self._logs[filepath]
+            if log.loaded:
+                total -= log.nbytes
+                log.unload()
+                unloaded.append(log)
+        return unloaded
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from lib import get_pull_stats, parse_column_name
+
+
+def compute_pull_stats(pulls: list, process_callback=None, cancel_check=None) -> pd.DataFrame:
+    """get_pull_stats wrapper for file_opener.QtRunner"""
+    return get_pull_stats(pulls)
+
+
+class PullStatsModel(QAbstractTableModel):
+    """Table of start, duration and per channel stats of every pull, backed by one numpy array
+
+    Sorting reorders a row index with numpy so it stays instant for hundreds of pulls and channels
+    """
+    def __init__(self, pull_info: dict, stats: pd.DataFrame, parent=None):
+        super().__init__(parent)
+        numbers = np.array(list(pull_info.keys()), dtype=float)
+        starts = np.array([x['start'] for x in pull_info.values()], dtype=float)
+        durations = np.array([x['duration'] for x in pull_info.values()], dtype=float)
+        stats = stats.reindex(index=list(pull_info.keys()))
+        self._values = np.column_stack((numbers, starts, durations, stats.to_numpy(dtype=float)))
+        self._order = np.arange(len(numbers))
+        self._headers = ['Pull', 'Start (sec)', 'Duration (sec)']
+        self._tooltips = list(self._headers)
+        for col, stat in stats.columns:
+            col_name = parse_column_name(col)
+            unit = f' ({col_name["unit"]})' if col_name['unit'] is not None else ''
+            self._headers.append(f'{col_name["name"]} {stat}{unit}')
+            self._tooltips.append(f'{stat} of {col}')
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            value = self._values[self._order[index.row()], index.column()]
+            if np.isnan(value):
+                return ''
+            if index.column() == 0:
+                return str(int(value))
+            return f'{value:.2f}'
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section: int, orientation: int, role: int = Qt.DisplayRole):
+        if orientation != Qt.Horizontal:
+            return None
+        if role == Qt.DisplayRole:
+            return self._headers[section]
+        if role == Qt.ToolTipRole:
+            return self._tooltips[section]
+        return None
+
+    def sort(self, column: int, order: int = Qt.AscendingOrder):
+        """Sort rows by column, empty cells always go last"""
+        keys = self._values[:, column]
+        if order == Qt.DescendingOrder:
+            keys = -keys
+        self.layoutAboutToBeChanged.emit()
+        # argsort puts NaN last in both directions since only the sign flips
+        self._order = np.argsort(keys, kind='stable')
+        self.layoutChanged.emit()
+
+    def pull_number(self, row: int) -> int:
+        """Pull number shown in a view row"""
+        return int(self._values[self._order[row], 0])
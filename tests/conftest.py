@@ -0,0 +1,24 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# modules live at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def text_blanks_log(tmp_path) -> str:
+    """Log with two pulls and a text channel that has blank cells"""
+    rows = 2000
+    df = pd.DataFrame({
+        'Time (sec)': np.arange(rows) * 0.05,
+        'Throttle Pos (%)': np.where((np.arange(rows) // 500) % 2 == 1, 90.0, 10.0),
+        'Boost (psi)': np.round(np.random.default_rng(0).random(rows) * 20, 3),
+        'Mode (x)': np.array(['A', 'B', None, 'C'], dtype=object)[np.arange(rows) % 4]
+    })
+    df['AP Info:[x]'] = ''
+    path = str(tmp_path / 'blanks.csv')
+    df.to_csv(path, index=False)
+    return path
@@ -0,0 +1,25 @@
+import os
+import batch
+import pull_library
+
+
+def test_exit_codes(text_blanks_log, tmp_path, capsys):
+    output = str(tmp_path / 'pulls.csv')
+    assert batch.main([text_blanks_log, '-o', output, '-j', '1']) == 0
+    missing = str(tmp_path / 'missing.csv')
+    assert batch.main([text_blanks_log, missing, '-o', output, '-j', '1']) == 1
+    assert f'{missing}: no such datalog' in capsys.readouterr().err
+    assert batch.main([missing, str(tmp_path / 'none_*.csv'), '-o', output]) == 2
+
+
+def test_expand_paths(text_blanks_log, tmp_path):
+    pattern = os.path.join(tmp_path, '*.csv')
+    files, unmatched = batch.expand_paths([pattern, text_blanks_log, str(tmp_path / 'x.csv')])
+    assert files == [text_blanks_log]
+    assert unmatched == [str(tmp_path / 'x.csv')]
+
+
+def test_library_add_counts_missing_logs(text_blanks_log, tmp_path):
+    db = str(tmp_path / 'library.sqlite')
+    assert pull_library.main(['--db', db, 'add', text_blanks_log, '-j', '1']) == 0
+    assert pull_library.main(['--db', db, 'add', text_blanks_log, str(tmp_path / 'x.csv'), '-j', '1']) == 1
@@ -0,0 +1,41 @@
+import pytest
+import lib
+from benchmarks import bench
+from benchmarks.synth_log import AP_INFO, write_log
+
+NON_QT_STAGES = [x for x in bench.STAGES if x not in bench.QT_STAGES]
+
+
+@pytest.fixture
+def synth_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, 'DATA_DIR', str(tmp_path))
+    return bench.log_path(3000, 30, 3)
+
+
+def test_synthetic_log_has_requested_size_and_pulls(synth_log):
+    df, ap_info = lib.read_datalog(synth_log, use_cache=False)
+    assert df.shape == (3000, 30)
+    assert ap_info == AP_INFO
+    assert len(lib.get_pulls(df, 50, 0.5)) == 3
+
+
+def test_synthetic_log_is_repeatable(tmp_path):
+    first = write_log(str(tmp_path / 'a.csv'), 500, 12, 2, seed=3)
+    second = write_log(str(tmp_path / 'b.csv'), 500, 12, 2, seed=3)
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+
+
+@pytest.mark.parametrize('stage', NON_QT_STAGES)
+def test_stage_runs(synth_log, stage):
+    measured = bench.run_stage(stage, synth_log, 2)
+    assert len(measured['times']) == 2 and all(x >= 0 for x in measured['times'])
+
+
+def test_compare_counts_regressions_beyond_tolerance():
+    base = {'stage': 'get_pulls', 'rows': 10, 'channels': 5, 'pulls': 1, 'median_s': 1.0, 'rows_per_s': 10.0,
+            'mb_per_s': None, 'peak_rss_mb': None, 'stage_rss_mb': None}
+    slower = dict(base, median_s=1.05)
+    assert bench.compare([slower], [base], 0.1) == 0
+    assert bench.compare([dict(base, median_s=1.2)], [base], 0.1) == 1
+    assert bench.compare([dict(base, rows=20, median_s=9.0)], [base], 0.1) == 0
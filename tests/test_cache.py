@@ -0,0 +1,18 @@
+from datalog_cache import clear_cache
+from lib import Datalog, read_datalog
+
+
+def test_cache_keeps_blank_text_cells(text_blanks_log):
+    clear_cache(text_blanks_log)
+    parsed, ap_info = read_datalog(text_blanks_log)
+    cached, cached_ap_info = read_datalog(text_blanks_log)
+    assert cached['Mode (x)'].isna().sum() == len(cached) // 4
+    assert parsed.equals(cached)
+    assert cached_ap_info == ap_info
+
+
+def test_cached_datalog_counts_text_columns(text_blanks_log):
+    clear_cache(text_blanks_log)
+    read_datalog(text_blanks_log)
+    datalog = Datalog(text_blanks_log)
+    assert datalog.nbytes == datalog._frame[['Mode (x)']].memory_usage(index=False, deep=True).sum()
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip('PyQt5')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'matplotlib')
+
+
+def test_start_tab_loads_without_heavy_imports():
+    # a fresh interpreter, the test session has imported pandas already
+    code = (
+        'import os, sys\n'
+        'os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")\n'
+        'from PyQt5.QtWidgets import QApplication\n'
+        'import csv_reader\n'
+        'app = QApplication([])\n'
+        'window = csv_reader.WidgetGallery()\n'
+        f'print(",".join(x for x in {HEAVY_MODULES!r} if x in sys.modules))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60, cwd=REPO_DIR)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
@@ -0,0 +1,17 @@
+import pandas as pd
+from lib import load_datalog, read_datalog
+
+
+def test_compact_text_with_blanks(text_blanks_log):
+    df, _ = read_datalog(text_blanks_log, use_cache=False, compact=True)
+    plain, _ = read_datalog(text_blanks_log, use_cache=False)
+    assert isinstance(df['Mode (x)'].dtype, pd.CategoricalDtype)
+    assert df['Mode (x)'].isna().equals(plain['Mode (x)'].isna())
+    assert (df['Mode (x)'].astype(object)[plain['Mode (x)'].notna()] == plain['Mode (x)'].dropna()).all()
+
+
+def test_compact_pull_text_with_blanks(text_blanks_log):
+    datalog, ap_info, pulls, pull_info = load_datalog(text_blanks_log, 50, 0.5, compact=True)
+    values = pulls[0]['Mode (x)']
+    assert values.isna().sum() == len(values) // 4
+    assert set(values.dropna()) == {'A', 'B', 'C'}
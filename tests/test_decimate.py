@@ -0,0 +1,33 @@
+import numpy as np
+from lib import minmax_decimate
+
+
+def test_decimation_keeps_spikes_and_edges():
+    x = np.arange(100000) * 0.01
+    y = np.sin(x)
+    y[12345] = 50.0
+    y[67890] = -50.0
+    xs, ys = minmax_decimate(x, y, x[0], x[-1], 800)
+    assert len(xs) <= 2 * 800 + 2 + 100000 % 800
+    assert np.all(np.diff(xs) > 0)
+    assert ys.max() == 50.0 and ys.min() == -50.0
+    assert xs[0] == x[0] and xs[-1] == x[-1]
+
+
+def test_decimation_of_visible_range():
+    x = np.arange(10000.0)
+    y = np.arange(10000.0)
+    xs, ys = minmax_decimate(x, y, 2000, 3000, 100)
+    # one row either side of the range so the curve runs to the edges
+    assert xs[0] == 1999 and xs[-1] == 3001
+    xs, ys = minmax_decimate(x, y, 2000, 2050, 100)
+    np.testing.assert_array_equal(xs, np.arange(1999, 2052))
+
+
+def test_nan_gaps_do_not_hide_extremes():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[::2] = np.nan
+    y[501] = 7.0
+    xs, ys = minmax_decimate(x, y, 0, 999, 10)
+    assert np.nanmax(ys) == 7.0
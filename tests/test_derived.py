@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+from derived import DerivedChannel, smooth
+
+
+def test_smooth_skips_missing_samples():
+    result = smooth(np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0]), 2)
+    assert np.allclose(result, [1.0, 1.5, 2.0, 4.0, 4.5, 5.5])
+    assert np.isnan(smooth(np.array([1.0, np.nan, np.nan]), 2)[2])
+
+
+def test_chained_comparison_rejected():
+    with pytest.raises(ValueError):
+        DerivedChannel('In Range', '0 < [A] < 5')
+    channel = DerivedChannel('In Range', '(0 < [A]) & ([A] < 5)')
+    assert list(channel.evaluate(['A'], lambda x: np.array([-1.0, 2.0, 7.0]))) == [0.0, 1.0, 0.0]
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+import lib
+from datalog_cache import clear_cache
+from figure_export import export_pulls, main, plot_curves
+
+
+def test_export_reads_channels_once(text_blanks_log, tmp_path, monkeypatch):
+    clear_cache(text_blanks_log)
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(text_blanks_log, 50, 0.5)
+    calls = {'read_pull_rows': 0, 'column': 0}
+    for name in calls:
+        def counted(self, *args, name=name, fn=getattr(lib.Datalog, name)):
+            # key channels are in memory, only count reads of the csv
+            if name != 'column' or args[0] not in lib.KEY_COLUMNS:
+                calls[name] += 1
+            return fn(self, *args)
+        monkeypatch.setattr(lib.Datalog, name, counted)
+    written = export_pulls(pulls, ['Boost (psi)'], str(tmp_path), name='blanks', jobs=1)
+    assert written == [str(tmp_path / f'blanks_pull{i + 1}.png') for i in range(len(pulls))]
+    assert all(os.path.getsize(x) > 0 for x in written)
+    assert calls == {'read_pull_rows': 1, 'column': 0}
+
+
+def test_export_cancel(text_blanks_log, tmp_path):
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(text_blanks_log, 50, 0.5)
+    with pytest.raises(lib.LoadCancelled):
+        export_pulls(pulls, ['Boost (psi)'], str(tmp_path), jobs=1, cancel_check=lambda: True)
+
+
+def test_plot_curves_one_axis_per_unit():
+    x = np.arange(10.0)
+    curves = [('Boost (psi)', x), ('RPM (RPM)', x), ('Target Boost (psi)', x), ('Feedback Knock (°)', x),
+              ('Gear', x)]
+    axes_refs = plot_curves(Figure(), 'Pull 1', x, curves)
+    assert [x.get_ylabel() for x in axes_refs] == ['psi', 'RPM (RPM)', 'Feedback Knock (°)', 'Gear']
+    assert [len(x.lines) for x in axes_refs] == [2, 1, 1, 1]
+
+
+def test_cli_exports_many_channels(text_blanks_log, tmp_path):
+    out_dir = str(tmp_path / 'figures')
+    args = [text_blanks_log, '-o', out_dir, '-j', '1', '-c', 'Boost (psi)', '-c', 'Throttle Pos (%)',
+            '-d', 'Boost Error (psi) = [Boost] - 18', '-c', 'Boost Error (psi)']
+    assert main(args) == 0
+    assert sorted(os.listdir(out_dir)) == ['blanks_pull1.png', 'blanks_pull2.png']
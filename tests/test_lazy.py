@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from datalog_cache import clear_cache, load_index
+from lib import Datalog, Pull, read_datalog
+
+
+def test_channels_read_on_demand_match_full_read(text_blanks_log):
+    clear_cache(text_blanks_log)
+    df, ap_info = read_datalog(text_blanks_log, use_cache=False)
+    datalog = Datalog(text_blanks_log)
+    assert datalog.columns == list(df.columns)
+    assert datalog.ap_info == ap_info
+    np.testing.assert_array_equal(datalog.time, df['Time (sec)'])
+    np.testing.assert_array_equal(datalog.throttle, df['Throttle Pos (%)'])
+    np.testing.assert_array_equal(datalog.column('Boost (psi)', 500, 1000), df['Boost (psi)'][500:1000])
+    bounds = np.array([[0, 10], [1500, 1510]])
+    rows = datalog.read_pull_rows(bounds, ['Boost (psi)', 'Mode (x)'])
+    expected = pd.concat([df.iloc[0:10], df.iloc[1500:1510]], ignore_index=True)[['Boost (psi)', 'Mode (x)']]
+    assert rows.reset_index(drop=True).equals(expected)
+    pull = Pull(datalog, 1500, 2000)
+    assert list(pull['Mode (x)'].iloc[:4].fillna('')) == ['A', 'B', '', 'C']
+
+
+def test_reopen_uses_index(text_blanks_log):
+    clear_cache(text_blanks_log)
+    Datalog(text_blanks_log)
+    assert load_index(text_blanks_log) is not None
+    df, ap_info = read_datalog(text_blanks_log, use_cache=False)
+    datalog = Datalog(text_blanks_log)
+    np.testing.assert_array_equal(datalog.column('Boost (psi)', 1990, 2000), df['Boost (psi)'][1990:])
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from overlay import ALIGN_RPM, ALIGN_TIME, ResampleCache, align_values, interp_many
+
+
+def test_interp_many_matches_interp_per_curve():
+    rng = np.random.default_rng(4)
+    x_list = [np.sort(rng.random(50)) * 10 + i for i in range(5)]
+    y_list = [rng.random(50) for i in range(5)]
+    grid = np.linspace(0, 15, 200)
+    values = interp_many(x_list, y_list, grid)
+    for x, y, row in zip(x_list, y_list, values):
+        inside = (grid >= x[0]) & (grid <= x[-1])
+        np.testing.assert_allclose(row[inside], np.interp(grid[inside], x, y))
+        assert np.isnan(row[~inside]).all()
+
+
+def test_resample_aligns_on_time_and_rpm():
+    pulls = [pd.DataFrame({'Time (sec)': np.arange(20) * 0.125 + start, 'RPM (RPM)': 3000 + np.arange(20) * 100.0,
+                           'Boost (psi)': np.arange(20) * scale}) for start, scale in ((5.0, 1.0), (40.0, 2.0))]
+    pulls[0].loc[10, 'RPM (RPM)'] = 3500
+    # a dip during a shift does not fold the RPM axis back
+    assert np.all(np.diff(align_values(pulls[0], ALIGN_RPM)) >= 0)
+    cache = ResampleCache()
+    grid = cache.grid(pulls, ALIGN_TIME)
+    assert grid[0] == 0 and grid[-1] == 2.375
+    curves = cache.resample(pulls, 'Boost (psi)', ALIGN_TIME, grid)
+    np.testing.assert_allclose(curves[1], 2 * curves[0])
+    cache.resample(pulls, 'Boost (psi)', ALIGN_TIME, grid)
+    assert len(cache._curves) == 2
+    grid = cache.grid(pulls, ALIGN_RPM)
+    curves = cache.resample(pulls, 'Boost (psi)', ALIGN_RPM, grid)
+    assert curves.shape == (2, len(grid))
+    np.testing.assert_allclose(curves[1, -1], 38.0)
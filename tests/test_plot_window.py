@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('PyQt5')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+from plot_window import MultiPlotFigure, PullPlotStore, available_backends, create_figure  # noqa: E402
+
+app = QApplication.instance() or QApplication([])
+X = np.linspace(0, 10, 200)
+
+
+def test_each_unit_gets_its_own_axis():
+    figure = MultiPlotFigure('Pull')
+    figure.plot_index(X, X, 0, 'Boost (psi)', 'Boost (psi)')
+    figure.plot_index(X, X / 2, 1, 'Boost Target (psi)', 'Boost Target (psi)')
+    figure.plot_index(X, X * 10, 2, 'Throttle Pos (%)', 'Throttle Pos (%)')
+    figure.plot_index(X, X * 600, 3, 'RPM (RPM)', 'RPM (RPM)')
+    figure.plot_index(X, -X, 4, 'Ignition Timing (deg)', 'Ignition Timing (deg)')
+    assert figure.axes_count == 4
+    lines = figure._plot_refs
+    assert lines[0].axes is lines[1].axes is figure.axes
+    assert len({id(x.axes) for x in lines}) == 4
+    # curves sharing an axis are labelled by unit, a lone curve by its channel
+    assert figure.axes.get_ylabel() == 'psi'
+    assert lines[2].axes.get_ylabel() == 'Throttle Pos (%)'
+    figure.draw()
+
+
+def test_cleared_unit_frees_its_axis():
+    figure = MultiPlotFigure('Pull')
+    figure.plot_index(X, X, 0, 'Boost (psi)', 'Boost (psi)')
+    figure.plot_index(X, X * 10, 1, 'Throttle Pos (%)', 'Throttle Pos (%)')
+    figure.plot_index(X, X * 600, 2, 'RPM (RPM)', 'RPM (RPM)')
+    rpm_axis = figure._plot_refs[2].axes
+    figure.clear_plot(2)
+    assert not rpm_axis.get_visible()
+    figure.plot_index(X, -X, 3, 'Ignition Timing (deg)', 'Ignition Timing (deg)')
+    assert figure._plot_refs[3].axes is rpm_axis and rpm_axis.get_visible()
+    assert figure.axes_count == 3
+    figure.clear_plot(-1)
+    assert figure.axes_count == 2 and figure._plot_refs == []
+
+
+def drawn_figure(monkeypatch) -> tuple:
+    """Figure with two psi curves after a full draw, returns it and a list counting later full draw requests"""
+    figure = MultiPlotFigure('Pull')
+    figure.resize(640, 480)
+    figure.plot_index(X, X, 0, 'Boost (psi)', 'Boost (psi)')
+    figure.plot_index(X, X / 2, 1, 'Boost Target (psi)', 'Boost Target (psi)')
+    figure.draw()
+    full_draws = []
+    monkeypatch.setattr(figure, 'draw_idle', lambda: full_draws.append(1))
+    return figure, full_draws
+
+
+def test_curve_on_an_unchanged_axis_is_blitted(monkeypatch):
+    figure, full_draws = drawn_figure(monkeypatch)
+    assert figure._background is not None
+    figure.plot_index(X, X / 4, 2, 'Wastegate (psi)', 'Wastegate (psi)')
+    assert full_draws == []
+    assert figure._blit_pending and figure._blit_added == [figure._plot_refs[2]]
+    blits = []
+    monkeypatch.setattr(figure, 'blit', blits.append)
+    figure.blit_curves()
+    assert len(blits) == 1 and not figure._blit_pending and figure._blit_added == []
+
+
+def test_new_axis_requests_one_full_draw(monkeypatch):
+    figure, full_draws = drawn_figure(monkeypatch)
+    figure.plot_index(X, X * 10, 2, 'Throttle Pos (%)', 'Throttle Pos (%)')
+    assert full_draws == [1] and figure._background is None
+    # curve updates before that draw join the merged draw_idle instead of blitting
+    figure.plot_index(None, X * 5, 2, 'Throttle Pos (%)', 'Throttle Pos (%)')
+    assert full_draws == [1, 1] and not figure._blit_pending
+
+
+def test_pull_plot_store_shares_read_only_arrays():
+    pull = pd.DataFrame({'Time (sec)': X, 'Boost (psi)': X.astype(np.float32), 'Gear (x)': np.arange(len(X))})
+    store = PullPlotStore()
+    store.acquire(pull)
+    store.acquire(pull)
+    boost = store.values(pull, 'Boost (psi)')
+    assert store.values(pull, 'Boost (psi)') is boost
+    assert np.shares_memory(boost, pull['Boost (psi)'].to_numpy())
+    assert not boost.flags.writeable
+    with pytest.raises(ValueError):
+        boost[0] = 1
+    assert store.values(pull, 'Gear (x)').dtype == float
+    assert list(store.column_names(list(pull.columns))) == ['Boost (psi)', 'Gear (x)']
+    store.release(pull)
+    assert store.values(pull, 'Boost (psi)') is boost
+    store.release(pull)
+    assert store._values == {} and store._users == {}
+
+
+def test_linked_windows_follow_relative_xlim():
+    class Window:
+        def __init__(self):
+            self.xlim = None
+
+        def set_relative_xlim(self, xlim):
+            self.xlim = xlim
+    store = PullPlotStore()
+    first, second, unlinked = Window(), Window(), Window()
+    store.link(first)
+    store.link(second)
+    store.xlim_changed(first, (1.0, 2.0))
+    assert second.xlim == (1.0, 2.0) and first.xlim is None and unlinked.xlim is None
+    store.xlim_changed(unlinked, (3.0, 4.0))
+    assert second.xlim == (1.0, 2.0)
+    store.unlink(first)
+    store.unlink(second)
+    assert store.linked_xlim is None
+
+
+@pytest.mark.parametrize('backend', ['matplotlib', 'pyqtgraph'])
+def test_backends_share_the_figure_interface(backend):
+    if backend not in available_backends():
+        pytest.skip(f'{backend} is not installed')
+    figure = create_figure('Pull', backend)
+    figure.plot_index(X, X, 0, 'Boost (psi)', 'Boost (psi)')
+    figure.plot_index(X, X / 2, 1, 'Boost Target (psi)', 'Boost Target (psi)')
+    figure.plot_index(X, X * 10, 2, 'Throttle Pos (%)', 'Throttle Pos (%)')
+    figure.plot_index(X, X * 600, 3, 'RPM (RPM)', 'RPM (RPM)')
+    assert figure.axes_count == 3
+    figure.set_ylim(1, -5.0, 150.0)
+    assert figure.get_ylim(1) == pytest.approx((-5.0, 150.0))
+    figure.set_xlim(2.0, 4.0)
+    assert figure.get_xlim() == pytest.approx((2.0, 4.0))
+    figure.plot_index(None, X * 5, 2, 'Throttle Pos (%)', 'Throttle Pos (%)')
+    figure.clear_plot(3)
+    figure.clear_plot(-1)
+    figure.plot_index(X, X, 0, 'Boost (psi)', 'Boost (psi)')
+    assert figure.axes_count >= 2
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_figure('Pull', 'gnuplot')
@@ -0,0 +1,61 @@
+import os
+import pstats
+import tracemalloc
+import pytest
+import profiling
+
+
+@pytest.fixture
+def timings(tmp_path):
+    """Enable timing with a listener collecting every record, disable it afterwards"""
+    seen = []
+
+    def listener(name, seconds, blocks):
+        seen.append((name, seconds, blocks))
+    profiling.enable(str(tmp_path))
+    profiling.add_listener(listener)
+    yield seen
+    profiling.remove_listener(listener)
+    profiling.disable()
+
+
+def test_stage_is_a_no_op_when_disabled():
+    seen = []
+
+    def listener(*args):
+        seen.append(args)
+    profiling.add_listener(listener)
+    try:
+        assert not profiling.is_enabled()
+        with profiling.stage('parse'):
+            pass
+        profiling.record('parse', 1.0)
+    finally:
+        profiling.remove_listener(listener)
+    assert seen == []
+
+
+def test_enabled_stages_reach_listeners(timings):
+    with profiling.stage('parse'):
+        sum(range(1000))
+    profiling.record('draw', 0.25, 3)
+    assert [x[0] for x in timings] == ['parse', 'draw']
+    assert timings[0][1] >= 0
+    assert timings[1] == ('draw', 0.25, 3)
+
+
+def test_stage_records_when_the_body_raises(timings):
+    with pytest.raises(KeyError):
+        with profiling.stage('trim'):
+            raise KeyError('x')
+    assert [x[0] for x in timings] == ['trim']
+
+
+def test_profiled_dumps_profile_and_snapshot(tmp_path):
+    wrapped = profiling.profiled(lambda x: [x] * 100, str(tmp_path))
+    assert wrapped(1) == [1] * 100
+    dumps = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(x)[1] for x in dumps] == ['.prof', '.tracemalloc']
+    pstats.Stats(str(tmp_path / dumps[0]))
+    tracemalloc.Snapshot.load(str(tmp_path / dumps[1]))
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import lib
+from datalog_cache import clear_cache
+from pull_export import DATA_FORMATS, available_data_formats, export_pull_data, load_pull_export
+
+pytestmark = pytest.mark.skipif('parquet' not in available_data_formats(), reason='needs pyarrow')
+
+
+def test_export_text_in_later_chunk(tmp_path):
+    rows = 400
+    df = pd.DataFrame({'Time (sec)': np.arange(rows) * 0.05, 'Throttle Pos (%)': 90.0,
+                       'Mode (x)': [str(x) for x in range(rows - 1)] + ['Sport']})
+    df['AP Info:[x]'] = ''
+    path = str(tmp_path / 'mixed.csv')
+    df.to_csv(path, index=False)
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(path, 50, 0.5)
+    # split the pull so its first part parses Mode as numbers and the second as text
+    parts = [lib.Pull(datalog, 0, 200), lib.Pull(datalog, 200, rows)]
+    for fmt in ('parquet', 'arrow'):
+        out_path = str(tmp_path / f'mixed.{fmt}')
+        export_pull_data(parts, ['Mode (x)'], out_path, ap_info=ap_info, chunk_rows=200)
+        loaded = load_pull_export(out_path)[2]
+        assert list(loaded[1]['Mode (x)'])[-1] == 'Sport'
+        assert list(loaded[0]['Mode (x)'])[:2] == ['0', '1']
+
+
+def test_export_failure_keeps_error(text_blanks_log, tmp_path, monkeypatch):
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(text_blanks_log, 50, 0.5)
+
+    def fail(*args):
+        raise OSError('disk gone')
+    monkeypatch.setattr(lib.Datalog, 'read_pull_rows', fail)
+    out_path = str(tmp_path / 'z.parquet')
+    with pytest.raises(OSError, match='disk gone'):
+        export_pull_data(pulls, ['Boost (psi)'], out_path)
+    assert not any(x.startswith('z.parquet') for x in os.listdir(tmp_path))
+
+
+def test_loaded_export_counts_frame(text_blanks_log, tmp_path):
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(text_blanks_log, 50, 0.5)
+    out_path = str(tmp_path / 'pulls.parquet')
+    export_pull_data(pulls, ['Boost (psi)', 'Mode (x)'], out_path, ap_info=ap_info)
+    datalog, ap_info, pulls, pull_info = load_pull_export(out_path)
+    frame_bytes = datalog._frame.memory_usage(index=False, deep=True).sum()
+    assert datalog.nbytes == frame_bytes
+    # pull channels are views of the frame so they are not counted twice
+    pulls[0]['Mode (x)']
+    assert pulls[0].nbytes == 0
+
+
+def test_export_parses_log_once(text_blanks_log, tmp_path, monkeypatch):
+    clear_cache(text_blanks_log)
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(text_blanks_log, 50, 0.5)
+    parses = []
+    read_pull_rows = lib.Datalog.read_pull_rows
+    monkeypatch.setattr(lib.Datalog, 'read_pull_rows', lambda self, *args: parses.append(1) or read_pull_rows(self, *args))
+    for fmt in ('parquet', 'arrow', 'csv'):
+        parses.clear()
+        out_path = str(tmp_path / f'blanks{DATA_FORMATS[fmt]}')
+        export_pull_data(pulls, ['Boost (psi)', 'Mode (x)'], out_path, ap_info=ap_info)
+        assert len(parses) == 1
+        loaded = load_pull_export(out_path)[2]
+        assert list(loaded[0]['Mode (x)'].iloc[:4].fillna('')) == ['A', 'B', '', 'C']
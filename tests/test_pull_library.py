@@ -0,0 +1,40 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from lib import get_pull_stats, get_pulls, read_datalog
+from pull_library import PullLibrary, ingest_logs, parse_condition, parse_query
+
+
+def test_query_matches_pull_stats(text_blanks_log, tmp_path):
+    copy = str(tmp_path / 'copy.csv')
+    shutil.copy(text_blanks_log, copy)
+    db = str(tmp_path / 'library.sqlite')
+    assert ingest_logs(db, [text_blanks_log, copy], 50, 0.5, jobs=1) == {'added': 2, 'skipped': 0, 'failed': 0}
+    assert ingest_logs(db, [text_blanks_log, copy], 50, 0.5, jobs=1)['skipped'] == 2
+    df, ap_info = read_datalog(text_blanks_log)
+    stats = get_pull_stats(get_pulls(df, 50, 0.5))
+    boost_max = stats[('Boost (psi)', 'max')]
+    threshold = float(boost_max.min())
+    with PullLibrary(db) as library:
+        assert library.counts() == (2, 4)
+        result = library.query(parse_query(f'Boost max > {threshold} and duration > 1'))
+        expected = [i for i, x in boost_max.items() if x > threshold]
+        assert result['pull'].tolist() == expected * 2
+        np.testing.assert_allclose(result['Boost max'], [boost_max[i] for i in expected] * 2)
+        assert len(library.query(parse_query('Boost (bar) max > 0'))) == 0
+        first = library.query([])['id'].iloc[0]
+        pull = library.open_pull(int(first))
+        np.testing.assert_array_equal(pull['Boost (psi)'], get_pulls(df, 50, 0.5)[0]['Boost (psi)'])
+        os.remove(copy)
+        assert library.prune() == 1
+        assert library.counts() == (1, 2)
+
+
+def test_parse_condition():
+    assert parse_condition('Feedback Knock min < -2') == {'name': 'Feedback Knock', 'unit': None, 'field': 'min',
+                                                         'op': '<', 'value': -2.0}
+    assert parse_condition('Boost (psi) at peak RPM >= 15')['field'] == 'at_peak_rpm'
+    assert parse_condition('duration > 3') == {'field': 'duration', 'op': '>', 'value': 3.0}
+    with pytest.raises(ValueError):
+        parse_condition('RPM is high')
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import lib
+import pull_stream
+from pull_stream import PullStore, stream_pulls
+
+
+def test_stream_replaces_only_pull_stores(text_blanks_log, tmp_path):
+    logs_dir = tmp_path / 'logs'
+    logs_dir.mkdir()
+    (logs_dir / 'keep.csv').write_text('x')
+    with pytest.raises(ValueError):
+        stream_pulls([text_blanks_log], str(logs_dir), 50, 0.5)
+    assert os.listdir(logs_dir) == ['keep.csv']
+    out_dir = str(tmp_path / 'store')
+    stream_pulls([text_blanks_log], out_dir, 50, 0.5)
+    stream_pulls([text_blanks_log], out_dir, 50, 0.5)
+    assert len(PullStore(out_dir)) == 2
+
+
+def test_store_is_smaller_than_its_rows_as_csv(text_blanks_log, tmp_path):
+    out_dir = str(tmp_path / 'store')
+    stream_pulls([text_blanks_log], out_dir, 50, 0.5)
+    store = PullStore(out_dir)
+    log = pd.read_csv(text_blanks_log).iloc[:, :-1]
+    datalog, ap_info, pulls, pull_info = lib.load_datalog(text_blanks_log, 50, 0.5)
+    csv_bytes = 0
+    for i, pull in enumerate(pulls):
+        rows = log.iloc[pull.start:pull.stop]
+        csv_bytes += len(rows.to_csv(index=False, header=False))
+        stored = store.pull(i)
+        assert stored['Time (sec)'].dtype == np.float64
+        np.testing.assert_array_equal(stored['Time (sec)'], rows['Time (sec)'])
+        np.testing.assert_allclose(stored['Boost (psi)'], rows['Boost (psi)'], rtol=1e-6)
+    store_bytes = sum(os.path.getsize(os.path.join(out_dir, x['file'])) for x in store.manifest['pulls'])
+    assert store_bytes < csv_bytes
+
+
+def test_cancel_closes_and_removes_open_pull(text_blanks_log, tmp_path, monkeypatch):
+    handles = []
+
+    def tracked_open(*args, **kwargs):
+        handles.append(open(*args, **kwargs))
+        return handles[-1]
+    monkeypatch.setattr(pull_stream, 'open', tracked_open, raising=False)
+    out_dir = str(tmp_path / 'store')
+    # the first chunk ends inside the first pull
+    with pytest.raises(lib.LoadCancelled):
+        stream_pulls([text_blanks_log], out_dir, 50, 0.5, chunk_rows=600, cancel_check=lambda: True)
+    assert handles and all(x.closed for x in handles)
+    assert os.listdir(out_dir) == []
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lib import find_pull_bounds, get_pulls
+
+
+def reference_pulls(df: pd.DataFrame, min_throttle: float, time_filter: float) -> list:
+    """The groupby loop find_pull_bounds replaced"""
+    df = df.copy()
+    df['is pull'] = df['Throttle Pos (%)'] >= min_throttle
+    df['g'] = df['is pull'].ne(df['is pull'].shift()).cumsum()
+    df = df.loc[df['is pull'], :]
+    groups = df.groupby('g')
+    result = []
+    for pull in (groups.get_group(x) for x in groups.groups):
+        if pull['Time (sec)'].iloc[-1] - pull['Time (sec)'].iloc[0] > time_filter:
+            result.append(pull.drop(['is pull', 'g'], axis=1))
+    return result
+
+
+@pytest.fixture
+def random_log() -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    # runs of random length and level so pulls of every duration come up
+    levels = rng.integers(0, 101, 400).astype(float)
+    throttle = np.repeat(levels, rng.integers(1, 60, len(levels)))
+    return pd.DataFrame({'Time (sec)': np.arange(len(throttle)) * 0.05, 'Throttle Pos (%)': throttle,
+                         'Boost (psi)': rng.random(len(throttle))})
+
+
+@pytest.mark.parametrize('min_throttle, time_filter', [(50, 0.5), (1, 0), (99, 1.0), (100, 0.2), (30, 2.5)])
+def test_bounds_match_groupby_loop(random_log, min_throttle, time_filter):
+    expected = reference_pulls(random_log, min_throttle, time_filter)
+    bounds = find_pull_bounds(random_log['Time (sec)'].to_numpy(), random_log['Throttle Pos (%)'].to_numpy(),
+                              min_throttle, time_filter)
+    assert [(x.index[0], x.index[-1] + 1) for x in expected] == [tuple(x) for x in bounds]
+    pulls = get_pulls(random_log, min_throttle, time_filter)
+    assert len(pulls) == len(expected)
+    assert all(x.equals(y) for x, y in zip(pulls, expected))
+
+
+def test_pulls_at_log_edges():
+    throttle = np.array([90.0, 90, 90, 10, 10, 90, 90, 90])
+    bounds = find_pull_bounds(np.arange(len(throttle)) * 1.0, throttle, 50, 0.5)
+    assert bounds.tolist() == [[0, 3], [5, 8]]
@@ -0,0 +1,37 @@
+import os
+import time
+import pytest
+import lib
+
+pytest.importorskip('PyQt5')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt5.QtCore import QThreadPool  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+
+@pytest.fixture
+def window(text_blanks_log):
+    import csv_reader
+    app = QApplication.instance() or QApplication([])
+    window = csv_reader.WidgetGallery()
+    window.datalogfile = text_blanks_log
+    window.load_finished(lib.load_datalog(text_blanks_log, 50, 0.5))
+    yield window
+    QThreadPool.globalInstance().waitForDone()
+    window.close()
+    app.processEvents()
+
+
+def test_slider_steps_redetect_from_memory(window):
+    datalog = window.datalog
+    assert len(window.pulls) == 2
+    # a keyboard or wheel step changes the value without pressing the slider
+    window.throttle_slider.setValue(5)
+    assert len(window.pulls) == 2
+    assert window.redetect_timer.isActive()
+    deadline = time.perf_counter() + 5
+    while window.redetect_timer.isActive() and time.perf_counter() < deadline:
+        QApplication.processEvents()
+    QApplication.processEvents()
+    assert [(x.start, x.stop) for x in window.pulls] == [(0, len(datalog))]
+    assert window.datalog is datalog and window.pulls[0].datalog is datalog
@@ -0,0 +1,37 @@
+import shutil
+from lib import load_datalog
+from session import LogSession, SessionLog
+
+
+def open_log(path: str) -> SessionLog:
+    log = SessionLog(path, 50, 0.5)
+    log.datalog, log.ap_info, log.pulls, log.pull_info = load_datalog(path, 50, 0.5)
+    log.pulls[0]['Boost (psi)']
+    return log
+
+
+def test_least_recently_used_logs_are_unloaded(text_blanks_log, tmp_path):
+    paths = [text_blanks_log]
+    for name in ('b.csv', 'c.csv'):
+        paths.append(str(tmp_path / name))
+        shutil.copy(text_blanks_log, paths[-1])
+    log_bytes = open_log(paths[0]).nbytes
+    assert log_bytes > 0
+    # room for two logs
+    session = LogSession(budget_mb=2.5 * log_bytes / 2 ** 20)
+    a, b, c = [open_log(x) for x in paths]
+    assert session.add(a) == [] and session.add(b) == []
+    session.touch(a.filepath)
+    assert session.add(c) == [b]
+    assert not b.loaded and a.loaded and c.loaded
+    assert session.nbytes() == a.nbytes + c.nbytes
+    assert b.filepath in session and b.min_throttle == 50
+    session.remove(a.filepath)
+    assert a.filepath not in session and len(session) == 2
+
+
+def test_most_recent_log_is_kept_over_budget(text_blanks_log):
+    session = LogSession(budget_mb=0)
+    log = open_log(text_blanks_log)
+    assert session.add(log) == []
+    assert log.loaded
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from lib import PULL_STATS, get_pull_info, get_pulls, get_pull_stats
+
+
+def test_stats_match_per_pull_pandas():
+    rng = np.random.default_rng(3)
+    rows = 3000
+    df = pd.DataFrame({
+        'Time (sec)': np.arange(rows) * 0.05,
+        'Throttle Pos (%)': np.where((np.arange(rows) // 400) % 2 == 1, 95.0, 5.0),
+        'RPM (RPM)': np.round(rng.random(rows) * 7000),
+        'Boost (psi)': rng.random(rows) * 20
+    })
+    df.loc[rng.choice(rows, 300, replace=False), 'Boost (psi)'] = np.nan
+    pulls = get_pulls(df, 50, 0.5)
+    stats = get_pull_stats(pulls)
+    assert list(stats.index) == list(range(1, len(pulls) + 1))
+    for i, pull in enumerate(pulls, start=1):
+        peak_row = pull['RPM (RPM)'].idxmax()
+        for col in ['Throttle Pos (%)', 'RPM (RPM)', 'Boost (psi)']:
+            expected = [pull[col].min(), pull[col].max(), pull[col].mean(), pull.loc[peak_row, col]]
+            np.testing.assert_allclose(stats.loc[i, col][PULL_STATS].to_numpy(dtype=float), expected, equal_nan=True)
+    info = get_pull_info(pulls, stats=True)
+    assert info[1]['stats'].loc['Boost (psi)', 'max'] == stats.loc[1, ('Boost (psi)', 'max')]
+
+
+def test_stats_without_rpm_or_pulls():
+    df = pd.DataFrame({'Time (sec)': np.arange(10.0), 'Throttle Pos (%)': 90.0, 'Boost (psi)': np.arange(10.0)})
+    stats = get_pull_stats(get_pulls(df, 50, 0.5))
+    assert stats.loc[1, ('Boost (psi)', 'mean')] == 4.5
+    assert np.isnan(stats.loc[1, ('Boost (psi)', 'at peak RPM')])
+    assert get_pull_stats([], ['Boost (psi)']).empty
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from lib import PullTracker, find_pull_bounds, load_datalog, read_datalog
+
+
+def test_tracker_matches_full_detection():
+    rng = np.random.default_rng(2)
+    throttle = np.repeat(rng.integers(0, 101, 300).astype(float), rng.integers(1, 40, 300))
+    time_values = np.arange(len(throttle)) * 0.05
+    tracker = PullTracker(50, 0.5)
+    for stop in sorted(set(rng.integers(1, len(throttle), 40).tolist())) + [len(throttle)]:
+        tracker.feed(time_values[:stop], throttle[:stop])
+        np.testing.assert_array_equal(tracker.bounds(), find_pull_bounds(time_values[:stop], throttle[:stop], 50, 0.5))
+
+
+def test_refresh_reads_appended_rows(text_blanks_log, tmp_path):
+    with open(text_blanks_log, 'rb') as f:
+        lines = f.read().split(b'\n')
+    path = str(tmp_path / 'growing.csv')
+    # half of a row still being written
+    with open(path, 'wb') as f:
+        f.write(b'\n'.join(lines[:751]) + b'\n' + lines[751][:5])
+    datalog, ap_info, pulls, pull_info = load_datalog(path, 50, 0.5, tail=True)
+    assert len(datalog) == 750
+    tracker = PullTracker(50, 0.5)
+    tracker.feed(datalog.time, datalog.throttle)
+    assert tracker.bounds().tolist() == [[500, 750]]
+    with open(path, 'ab') as f:
+        f.write(lines[751][5:] + b'\n' + b'\n'.join(lines[752:]))
+    assert datalog.refresh() == 1250
+    tracker.feed(datalog.time, datalog.throttle)
+    df, ap_info = read_datalog(text_blanks_log, use_cache=False)
+    np.testing.assert_array_equal(tracker.bounds(), find_pull_bounds(df['Time (sec)'], df['Throttle Pos (%)'], 50, 0.5))
+    np.testing.assert_array_equal(datalog.column('Boost (psi)', 740, 760), df['Boost (psi)'][740:760])
+    assert pd.Series(datalog.column('Mode (x)', 1996, 2000)).fillna('').tolist() == ['A', 'B', '', 'C']
@@ -0,0 +1,36 @@
+import pytest
+import lib
+from datalog_cache import clear_cache
+
+pytest.importorskip('PyQt5')
+from file_opener import QtRunner  # noqa: E402
+
+
+def run_worker(fn, *args, cancel: bool = False, **kwargs) -> dict:
+    """Run a QtRunner in this thread, returns the emitted signals"""
+    emitted = {'progress': [], 'result': [], 'error': [], 'finished': 0}
+    worker = QtRunner(fn, *args, **kwargs)
+    worker.signals.progress.connect(emitted['progress'].append)
+    worker.signals.result.connect(emitted['result'].append)
+    worker.signals.error.connect(emitted['error'].append)
+    worker.signals.finished.connect(lambda: emitted.update(finished=emitted['finished'] + 1))
+    if cancel:
+        worker.cancel()
+    worker.run()
+    return emitted
+
+
+def test_load_reports_progress_and_result(text_blanks_log):
+    clear_cache(text_blanks_log)
+    emitted = run_worker(lib.load_datalog, text_blanks_log, 50, 0.5)
+    assert emitted['error'] == [] and emitted['finished'] == 1
+    datalog, ap_info, pulls, pull_info = emitted['result'][0]
+    assert len(pulls) == 2
+    assert emitted['progress'] == sorted(emitted['progress']) and emitted['progress'][-1] == 100
+
+
+def test_cancelled_load_emits_load_cancelled(text_blanks_log):
+    clear_cache(text_blanks_log)
+    emitted = run_worker(lib.load_datalog, text_blanks_log, 50, 0.5, cancel=True)
+    assert emitted['result'] == [] and emitted['finished'] == 1
+    assert isinstance(emitted['error'][0][0], lib.LoadCancelled)
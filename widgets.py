@@ -0,0 +1,72 @@
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QDoubleValidator
+from PyQt5.QtWidgets import QLineEdit, QMessageBox, QScrollArea
+
+
+class DoubleLineEdit(QLineEdit):
+    """Extends QLineEdit to make it more aesthetic and easier to retreive data"""
+    def __init__(self, lower: float, upper: float, decimals: int, parent=None):
+        """Initialize instance
+        Arguments:
+        lower -- float, min acceptible value
+        upper -- float, max acceptible value
+        decimals -- int, number of decimals to allow
+        """
+        super().__init__(parent)
+        self.double_validator = QDoubleValidator(lower, upper, decimals)
+        self.setValidator(self.double_validator)
+
+    def validate_input(self):
+        """Validate input and update displayed value"""
+        if self.text() != '':
+            try:
+                value = float(self.text())
+            except ValueError:
+                value = 0
+            finally:
+                # Update extremas to int if no decimal is required
+                lower = self.double_validator.bottom()
+                if lower.is_integer():
+                    lower = int(lower)
+                upper = self.double_validator.top()
+                if upper.is_integer():
+                    upper = int(upper)
+                # Update displayed value to respective limit if input is out of bounds
+                if value > upper:
+                    self.setText(str(upper))
+                elif value < lower:
+                    self.setText(str(lower))
+
+    def value(self) -> float:
+        """Return user input as float"""
+        try:
+            return float(self.text())
+        except ValueError:
+            return 0
+
+
+class ErrorMsg(QMessageBox):
+    """Extends QMessageBox to make error message display easier"""
+    def __init__(self, msgtext: str, infotext: str = '', parent=None):
+        """Initialize
+        Arguments:
+        msgtext -- str, error message title
+        Keyword arguments:
+        infotext -- str, informative text to display, defaults to empty str
+        """
+        super().__init__(parent)
+        self.setIcon(QMessageBox.Critical)
+        self.setWindowTitle('Error')
+        self.setText(msgtext)
+        if bool(infotext):
+            self.setInformativeText(infotext)
+        self.setStandardButtons(QMessageBox.Ok)
+
+
+class BetterScrollArea(QScrollArea):
+    """Override QScrollArea size hint to make it not suck"""
+    def sizeHint(self) -> QSize:
+        """Provide a size hint that accounts for vertical scroll bar width"""
+        hint = super().sizeHint()
+        bar_width = self.verticalScrollBar().sizeHint().width()
+        return QSize(hint.width() + bar_width, hint.height())